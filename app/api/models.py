@@ -4,7 +4,7 @@ Pydantic models for WhatsApp Gas Consumption API.
 """
 from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class GasConsumptionData(BaseModel):
@@ -41,3 +41,47 @@ class WhatsAppResponse(BaseModel):
     """
     status: str
     message: str
+
+
+class BatchRecipientRequest(BaseModel):
+    """
+    One recipient of a batch send: phone number and its own report.
+    Lower priority values are sent first (0 = overdue bill, 5 = regular).
+    """
+    phone_number: str
+    message: str
+    priority: int = Field(5, ge=0, le=9)
+
+
+class BatchSendRequest(BaseModel):
+    """
+    Request model for enqueueing a batch of WhatsApp reports.
+    """
+    recipients: List[BatchRecipientRequest] = Field(..., min_length=1)
+
+
+class BatchJobResponse(BaseModel):
+    """
+    Response model returned when a batch job is enqueued, with where to
+    follow it.
+    """
+    job_id: str
+    status: str
+    total: int
+    status_url: str
+    events_url: str
+
+
+class IngestJobResponse(BaseModel):
+    """
+    Response model returned when a workbook upload is accepted for processing.
+    """
+    job_id: str
+    status: str
+
+
+class OutboxResolveRequest(BaseModel):
+    """
+    Operator decision on a delivery interrupted before confirmation.
+    """
+    delivered: bool = Field(..., description="Whether the report is already in the chat")
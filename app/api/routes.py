@@ -3,20 +3,30 @@ API routes for WhatsApp Gas Consumption FastAPI backend.
 """
 
 import asyncio
-import platform
-import threading
-from concurrent.futures import Future
-from typing import Any, Dict
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-import pandas as pd  # type: ignore
-from fastapi import APIRouter, File, HTTPException, Query, UploadFile
+from fastapi import APIRouter, File, Header, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from app.services.excel_service import ExcelService
-from app.services.json_utils import format_message_with_styles
-from app.services.whatsapp_automation import send_whatsapp_with_playwright
+from app.api.models import BatchJobResponse, BatchSendRequest, IngestJobResponse, OutboxResolveRequest
+from app.services.accounts import account_router
+from app.services.automation_loop import automation_loop
+from app.services.batch_sender import batch_manager
+from app.services.ingest_jobs import STATUS_DONE, STATUS_FAILED, ingest_jobs, parse_workbook
+from app.services.log import get_logger
+from app.services.metrics import RENDER_LATENCY
+from app.services.outbox import outbox
+from app.services.progress import progress_hub
+from app.services.rate_scheduler import PRIORITY_INTERACTIVE, rate_scheduler
+from app.services.single_flight import format_flight, payload_key
+from app.services.timeline import timeline_recorder
+from app.services.warmup import load
+from app.services.whatsapp_service import ENGINE_MODE, whatsapp_service
 
 router = APIRouter()
+logger = get_logger(__name__)
 
 
 # Modelos Pydantic consistentes com o contrato de dados
@@ -34,94 +44,218 @@ class MessageFormatRequest(BaseModel):
     data: list
 
 
-class WhatsAppResponse(BaseModel):
-    """Response model for WhatsApp automation status."""
-
-    status: str
-    message: str
-
-
 @router.get("/health")
 async def health_check() -> Dict[str, str]:
     """Return the health status of the WhatsApp Gas API service."""
     return {"status": "healthy", "service": "WhatsApp Gas API"}
 
 
-@router.post("/send-whatsapp", response_model=WhatsAppResponse)
-async def send_whatsapp(request: WhatsAppRequest) -> WhatsAppResponse:
+@router.post("/send-whatsapp", response_model=BatchJobResponse, status_code=202)
+async def send_whatsapp(request: WhatsAppRequest) -> BatchJobResponse:
+    """
+    Enqueue one WhatsApp report as a single-recipient batch job, ahead of
+    regular batch sends, and return 202 immediately. The outcome (including
+    outbox retries) is available at /send-whatsapp/batch/{job_id} and its
+    /events stream, like any batch.
+    """
+    logger.info("🚀 [Backend] Disparo de WhatsApp enfileirado para: %s", request.phone_number)
+    return _submit_batch([(request.phone_number, request.message, PRIORITY_INTERACTIVE)])
+
+
+@router.post("/send-whatsapp/batch", response_model=BatchJobResponse)
+async def send_whatsapp_batch(request: BatchSendRequest) -> BatchJobResponse:
     """
-    Send WhatsApp message using the stable Playwright automation engine.
-    Runs inside an isolated, dedicated background thread with a Proactor loop
-    to bypass Windows/Uvicorn event loop subprocess restrictions.
+    Enqueue one report per recipient as a batch job and return immediately.
+    Progress is available at /send-whatsapp/batch/{job_id}.
     """
+    return _submit_batch(
+        [(item.phone_number, item.message, item.priority) for item in request.recipients]
+    )
+
+
+def _submit_batch(items: List[Tuple[str, str, int]]) -> BatchJobResponse:
+    """Enqueue (phone, message, priority) items and describe the new job."""
     try:
-        print(
-            f"🚀 [Backend] Iniciando disparo de WhatsApp para: {request.phone_number}"
-        )
+        job = batch_manager.submit(items)
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e)) from e
+
+    return BatchJobResponse(
+        job_id=job.job_id,
+        status=job.status,
+        total=len(job.recipients),
+        status_url=f"/api/v1/send-whatsapp/batch/{job.job_id}",
+        events_url=f"/api/v1/send-whatsapp/batch/{job.job_id}/events",
+    )
+
+
+@router.get("/send-whatsapp/batch/{job_id}")
+async def get_batch_status(job_id: str) -> Dict[str, Any]:
+    """Return per-recipient progress, throughput and failures of a batch job."""
+    job = batch_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Batch job '{job_id}' not found")
+    return job.snapshot()
+
+
+@router.get("/send-whatsapp/batch/{job_id}/events")
+async def stream_batch_events(
+    job_id: str, last_event_id: Optional[str] = Header(None)
+) -> StreamingResponse:
+    """
+    Stream the milestones of a batch job as Server-Sent Events (queued,
+    scheduled, browser_ready, chat_open, each dialogue step, confirmed or
+    failed, job_completed). Reconnecting clients resume after Last-Event-ID.
+    """
+    if batch_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Batch job '{job_id}' not found")
+    return _event_stream(job_id, last_event_id)
+
+
+def _event_stream(job_id: str, last_event_id: Optional[str]) -> StreamingResponse:
+    """Server-Sent Events response for a progress channel."""
+    since = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
 
-        # Anexa a assinatura de encerramento automático logo após o bloco de dados enviado
-        mensagem_com_encerramento = (
-            f"{request.message}\n\n"
-            f"🤖 *Esta é uma mensagem automática de informe de consumo de gás. "
-            f"Por favor, não responda a este número.*"
+    async def eventos() -> AsyncIterator[str]:
+        async for event in progress_hub.stream(job_id, since=since):
+            if event is None:
+                # Comentário SSE: mantém proxies e clientes conectados
+                yield ": keepalive\n\n"
+                continue
+            payload = json.dumps(event.to_dict(), ensure_ascii=False)
+            yield f"id: {event.seq}\nevent: {event.step}\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/upload-excel/jobs", response_model=IngestJobResponse)
+async def submit_upload_job(
+    file: UploadFile = File(...),
+    target_month: str = Query(
+        None, description="Filter by month (e.g., '01/2026', '02/2026')"
+    ),
+) -> IngestJobResponse:
+    """
+    Accept an Excel upload and process it in the background. Poll
+    /upload-excel/jobs/{job_id} (or stream its /events) and fetch the rows
+    from /upload-excel/jobs/{job_id}/result. The same file and month sent
+    again while the result is retained returns the same job.
+    """
+    filename = file.filename or ""
+    if not filename.endswith((".xlsx", ".xls")):
+        raise HTTPException(
+            status_code=400, detail="Only Excel files (.xlsx, .xls) are allowed"
         )
+    contents = await file.read()
+    job = ingest_jobs.submit(contents, filename, target_month)
+    return IngestJobResponse(job_id=job.job_id, status=job.status)
 
-        # Usamos uma Future para capturar o retorno da nossa thread isolada
-        future: Future[bool] = Future()
-
-        def thread_target():
-            # Criamos um loop novinho e isolado para esta thread
-            if platform.system() == "Windows":
-                # Evita classes obsoletas instanciando o loop diretamente
-                loop = asyncio.ProactorEventLoop()
-            else:
-                loop = asyncio.new_event_loop()
-
-            asyncio.set_event_loop(loop)
-            task = loop.create_task(
-                send_whatsapp_with_playwright(
-                    phone=request.phone_number, message=mensagem_com_encerramento
-                )
-            )
-            try:
-                loop.run_until_complete(task)
-            finally:
-                if task.done():
-                    task_exc = task.exception()
-                    if task_exc is not None:
-                        future.set_exception(task_exc)
-                    else:
-                        future.set_result(task.result())
-                else:
-                    future.set_exception(
-                        RuntimeError("WhatsApp task terminated before completion")
-                    )
-                loop.close()
-
-        # Dispara a execução em segundo plano
-        t = threading.Thread(target=thread_target)
-        t.start()
-
-        # Aguarda a conclusão da thread de forma assíncrona sem travar o FastAPI
-        while t.is_alive():
-            await asyncio.sleep(0.2)
-
-        sucesso = future.result()
-
-        if sucesso:
-            return WhatsAppResponse(
-                status="success",
-                message="Mensagem enviada com sucesso pelo Playwright!",
-            )
-        else:
-            raise HTTPException(
-                status_code=500,
-                detail="A automação foi executada, mas não concluiu o envio.",
-            )
 
-    except Exception as e:
-        print(f"❌ [Backend] Erro na rota send-whatsapp: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e)) from e
+@router.get("/upload-excel/jobs/{job_id}")
+async def get_upload_job(job_id: str) -> Dict[str, Any]:
+    """Return the status of an upload job."""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Upload job '{job_id}' not found or expired")
+    return job.snapshot()
+
+
+@router.get("/upload-excel/jobs/{job_id}/result")
+async def get_upload_job_result(job_id: str) -> Dict[str, Any]:
+    """
+    Return the processed rows of a finished upload job. Answers 409 while the
+    job is still running and 400 with the processing error when it failed.
+    """
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Upload job '{job_id}' not found or expired")
+    if job.status == STATUS_FAILED:
+        raise HTTPException(status_code=400, detail=f"Excel processing error: {job.error}")
+    if job.status != STATUS_DONE or job.result is None:
+        raise HTTPException(status_code=409, detail=f"Upload job '{job_id}' is {job.status}")
+    return job.result
+
+
+@router.get("/upload-excel/jobs/{job_id}/events")
+async def stream_upload_job_events(
+    job_id: str, last_event_id: Optional[str] = Header(None)
+) -> StreamingResponse:
+    """Stream queued/running/done/failed events of an upload job as SSE."""
+    if ingest_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Upload job '{job_id}' not found or expired")
+    return _event_stream(job_id, last_event_id)
+
+
+@router.get("/send-whatsapp/scheduler")
+async def get_scheduler_metrics() -> Dict[str, Any]:
+    """Return current send rates, bucket levels and queue wait times."""
+    return rate_scheduler.snapshot()
+
+
+@router.get("/send-whatsapp/outbox")
+async def get_outbox_stats() -> Dict[str, Any]:
+    """Return outbox row counts per state and how many retries are due."""
+    return await asyncio.to_thread(outbox.stats)
+
+
+@router.get("/send-whatsapp/outbox/unknown")
+async def get_outbox_unknown(limit: int = Query(100, ge=1, le=1000)) -> Dict[str, Any]:
+    """List deliveries interrupted before confirmation, awaiting an operator decision."""
+    entries = await asyncio.to_thread(outbox.unknown, limit)
+    return {"entries": [entry.to_dict() for entry in entries]}
+
+
+@router.get("/send-whatsapp/outbox/{entry_id}")
+async def get_outbox_entry(entry_id: int) -> Dict[str, Any]:
+    """Return the state of one delivery: sent, retry scheduled, failed for good or unknown."""
+    entry = await outbox.aget(entry_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Outbox entry {entry_id} not found")
+    return entry.to_dict()
+
+
+@router.post("/send-whatsapp/outbox/{entry_id}/resolve")
+async def resolve_outbox_entry(entry_id: int, request: OutboxResolveRequest) -> Dict[str, Any]:
+    """
+    Settle an ``unknown`` delivery after checking the chat: ``delivered``
+    marks it sent, otherwise it is queued for an immediate retry.
+    """
+    entry = await outbox.aresolve(entry_id, request.delivered)
+    if entry is None:
+        raise HTTPException(status_code=409, detail=f"Outbox entry {entry_id} is not awaiting review")
+    return entry.to_dict()
+
+
+@router.get("/automation/status")
+async def get_automation_status() -> Dict[str, Any]:
+    """Return the automation loop state, per-account browser health/usage and selector stats."""
+    if ENGINE_MODE == "process":
+        return {"engine": ENGINE_MODE, "workers": whatsapp_service.supervisor.stats()}
+    try:
+        pool_status = await automation_loop.run(account_router.status())
+    except RuntimeError as e:
+        pool_status = {"error": str(e)}
+    # Playwright só é importado pelo loop de automação, não pelo módulo da API
+    resolver = await load("app.services.selector_resolver")
+    return {
+        "engine": ENGINE_MODE,
+        "loop": automation_loop.stats(),
+        "browsers": pool_status,
+        "selectors": resolver.selector_resolver.stats(),
+    }
+
+
+@router.get("/automation/timeline")
+async def get_automation_timeline(limit: int = Query(10, ge=1, le=50)) -> Dict[str, Any]:
+    """Return per-phase latency percentiles and the most recent send timelines."""
+    return {
+        "percentiles": timeline_recorder.percentiles(),
+        "recent": timeline_recorder.recent(limit),
+    }
 
 
 @router.post("/upload-excel")
@@ -136,9 +270,7 @@ async def upload_excel(
     Optionally filter by specific month.
     """
     try:
-        print(f"Processing uploaded file: {file.filename}")
-        if target_month:
-            print(f"Filtering for month: {target_month}")
+        logger.info("Processing uploaded file: %s (month filter: %s)", file.filename, target_month)
 
         filename = file.filename if file.filename else ""
         if (
@@ -152,44 +284,50 @@ async def upload_excel(
 
         contents = await file.read()
 
-        # Process with the updated ExcelService
-        excel_service = ExcelService()
+        # Process with the updated ExcelService (uploads idênticos simultâneos compartilham o parse)
         try:
-            resultado_excel = excel_service.process_excel_content(
-                contents, target_month=target_month
-            )
+            resultado_excel = await parse_workbook(contents, target_month)
             lista_dados = resultado_excel.get("data", [])
         except Exception as e:
-            print(f"ExcelService error: {e}")
+            logger.warning("ExcelService error: %s", e)
             raise HTTPException(
                 status_code=400,
                 detail=f"Excel processing error: {e}",
             ) from e
 
-        print(f"Excel processed successfully. Data entries: {len(lista_dados)}")
+        logger.info("Excel processed successfully. Data entries: %d", len(lista_dados))
         return {"data": lista_dados}
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error processing Excel file: {e}")
+        logger.error("Error processing Excel file: %s", e)
         raise HTTPException(status_code=400, detail=str(e)) from e
 
 
+async def _format_message(data: list, target_date: str) -> str:
+    """Format the records; pandas and json_utils are loaded on first use."""
+    pd = await load("pandas")
+    json_utils = await load("app.services.json_utils")
+    with RENDER_LATENCY.time():
+        return await json_utils.format_message_with_styles(pd.DataFrame(data), target_date)
+
+
 @router.post("/format-message")
 async def format_message(request: MessageFormatRequest) -> Dict[str, Any]:
     """
     Format gas consumption data into WhatsApp message using normalized json_utils
     """
     try:
-        print(f"Formatting message for date: {request.target_date}")
-        print(f"Data entries: {len(request.data)}")
-
-        # Convert to DataFrame
-        df = pd.DataFrame(request.data)
+        logger.info(
+            "Formatting message for date: %s (%d entries)", request.target_date, len(request.data)
+        )
 
-        # Format message
-        formatted_message = await format_message_with_styles(df, request.target_date)
+        # Convert to DataFrame and format (pedidos idênticos simultâneos são agrupados)
+        formatted_message = await format_flight.run(
+            payload_key(request.data, request.target_date),
+            lambda: _format_message(request.data, request.target_date),
+        )
 
         return {
             "status": "success",
@@ -198,7 +336,7 @@ async def format_message(request: MessageFormatRequest) -> Dict[str, Any]:
         }
 
     except Exception as e:
-        print(f"Error formatting message: {str(e)}")
+        logger.warning("Error formatting message: %s", e)
         raise HTTPException(status_code=400, detail=str(e)) from e
 
 
@@ -208,7 +346,7 @@ async def get_available_months(file: UploadFile = File(...)) -> Dict[str, Any]:
     Get list of available months from Excel file
     """
     try:
-        print(f"Getting available months from: {file.filename}")
+        logger.info("Getting available months from: %s", file.filename)
 
         filename = file.filename if file.filename else ""
         if (
@@ -222,8 +360,7 @@ async def get_available_months(file: UploadFile = File(...)) -> Dict[str, Any]:
 
         contents = await file.read()
 
-        excel_service = ExcelService()
-        result = excel_service.process_excel_content(contents)
+        result = await parse_workbook(contents)
 
         if isinstance(result, dict):
             data_records = result.get("data", []) or []
@@ -244,7 +381,7 @@ async def get_available_months(file: UploadFile = File(...)) -> Dict[str, Any]:
                     available_months.add(f"{month}/{year}")
 
         months_list = sorted(list(available_months))
-        print(f"Available months: {months_list}")
+        logger.debug("Available months: %s", months_list)
 
         return {
             "status": "success",
@@ -255,5 +392,5 @@ async def get_available_months(file: UploadFile = File(...)) -> Dict[str, Any]:
     except Exception as e:
         if isinstance(e, HTTPException):
             raise
-        print(f"Error getting available months: {str(e)}")
+        logger.warning("Error getting available months: %s", e)
         raise HTTPException(status_code=400, detail=str(e)) from e
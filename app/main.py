@@ -2,17 +2,87 @@
 Main entry point for the WhatsApp Gas Consumption API (FastAPI).
 """
 
-from typing import Dict
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, PlainTextResponse
 
 from app.api import routes
+from app.services.accounts import account_router
+from app.services.automation_loop import automation_loop
+from app.services.batch_sender import batch_manager
+from app.services.delivery import outbox_dispatcher
+from app.services.ingest_jobs import STATUS_QUEUED, STATUS_RUNNING, ingest_jobs
+from app.services.metrics import CONTENT_TYPE, Family, RequestMetricsMiddleware, metrics
+from app.services.outbox import outbox
+from app.services.profiling import (
+    ProfilingMiddleware,
+    profile_store,
+    profiling_enabled,
+    token_matches,
+)
+from app.services.rate_scheduler import rate_scheduler
+from app.services.single_flight import format_flight, ingest_flight
+from app.services.timeline import timeline_recorder
+from app.services.warmup import WARMUP_ENABLED, warm_up
+from app.services.whatsapp_service import ENGINE_MODE, whatsapp_service
+
+if ENGINE_MODE != "process":
+    # Os pools das contas são recriados no loop de automação a cada (re)início do loop
+    automation_loop.add_startup_hook(account_router.start)
+    automation_loop.add_shutdown_hook(account_router.close)
+
+# Cada conta serializa seus próprios envios: garante ao menos um slot por conta
+automation_loop.max_concurrent_sends = max(
+    automation_loop.max_concurrent_sends, len(account_router.names)
+)
+batch_manager.workers = max(batch_manager.workers, len(account_router.names))
+# Destinatários de lote em nova tentativa são concluídos pelo dispatcher do outbox
+outbox_dispatcher.add_listener(batch_manager.on_outbox_outcome)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    """Start the automation engine, the outbox dispatcher and the batch workers."""
+    if ENGINE_MODE == "process":
+        # Um processo supervisionado por conta, cada um com seu navegador
+        await whatsapp_service.supervisor.start(
+            {name: session.path for name, session in account_router.sessions.items()}
+        )
+    else:
+        automation_loop.start()
+    await rate_scheduler.start()
+    await outbox_dispatcher.start()
+    await batch_manager.start()
+    # pandas/openpyxl carregam em segundo plano; /health já responde
+    warmup_task = asyncio.create_task(warm_up()) if WARMUP_ENABLED else None
+    try:
+        yield
+    finally:
+        if warmup_task is not None:
+            warmup_task.cancel()
+        await batch_manager.stop()
+        await ingest_jobs.stop()
+        await outbox_dispatcher.stop()
+        await rate_scheduler.stop()
+        outbox.close()
+        if ENGINE_MODE == "process":
+            await whatsapp_service.supervisor.stop()
+        else:
+            # to_thread evita bloquear o loop do uvicorn enquanto o navegador fecha
+            await asyncio.to_thread(automation_loop.stop)
+        # Grava as timelines que ainda estão na fila de exportação
+        await asyncio.to_thread(timeline_recorder.flush)
+
 
 app = FastAPI(
     title="WhatsApp Gas Consumption API",
     description="API for managing gas consumption data and WhatsApp automation",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -24,9 +94,104 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(RequestMetricsMiddleware)
+
+if profiling_enabled():
+    # Sem WHATSAPP_PROFILE_TOKEN o middleware nem é instalado
+    app.add_middleware(ProfilingMiddleware)
+
 app.include_router(routes.router, prefix="/api/v1")
 
 
+def _service_metrics(outbox_stats: Dict[str, Any]) -> List[Family]:
+    """Queue depths, work in flight and cache hit/miss counts of the services."""
+    ingest = ingest_jobs.stats()
+    depths = [
+        ({"queue": "batch"}, batch_manager.queue_depth),
+        ({"queue": "rate_scheduler"}, rate_scheduler.snapshot()["queue_depth"]),
+        ({"queue": "outbox_due"}, outbox_stats["due"]),
+        ({"queue": "ingest"}, ingest["jobs"].get(STATUS_QUEUED, 0)),
+    ]
+    in_flight = [
+        ({"stage": "ingest"}, ingest["jobs"].get(STATUS_RUNNING, 0)),
+        ({"stage": "singleflight_ingest"}, ingest_flight.stats()["in_flight"]),
+        ({"stage": "singleflight_format"}, format_flight.stats()["in_flight"]),
+    ]
+    if ENGINE_MODE == "process":
+        for account, worker in whatsapp_service.supervisor.stats().items():
+            depths.append(({"queue": f"worker:{account}"}, worker["queued"]))
+            in_flight.append(({"stage": f"worker:{account}"}, worker["in_flight"]))
+    else:
+        loop = automation_loop.stats()
+        depths.append(({"queue": "automation_loop"}, loop["waiting"]))
+        in_flight.append(({"stage": "automation_loop"}, loop["in_flight"]))
+
+    # Acerto = reaproveitou um job existente ou um cálculo idêntico em andamento
+    cache = [
+        ({"cache": "ingest_jobs", "result": "hit"}, ingest["reused"]),
+        ({"cache": "ingest_jobs", "result": "miss"}, ingest["submitted"]),
+    ]
+    for flight in (ingest_flight, format_flight):
+        stats = flight.stats()
+        cache.append(({"cache": f"singleflight_{flight.name}", "result": "hit"}, stats["coalesced"]))
+        cache.append(
+            ({"cache": f"singleflight_{flight.name}", "result": "miss"}, stats["calls"] - stats["coalesced"])
+        )
+    return [
+        ("whatsapp_queue_depth", "gauge", "Items waiting in each queue.", depths),
+        ("whatsapp_in_flight", "gauge", "Work currently running, by stage.", in_flight),
+        ("whatsapp_cache_requests_total", "counter", "Cache lookups by result (hit/miss).", cache),
+        (
+            "whatsapp_outbox_rows",
+            "gauge",
+            "Outbox rows by state.",
+            [({"state": state}, total) for state, total in outbox_stats["counts"].items()],
+        ),
+    ]
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics() -> PlainTextResponse:
+    """Prometheus scrape endpoint."""
+    outbox_stats = await asyncio.to_thread(outbox.stats)
+    return PlainTextResponse(metrics.render(_service_metrics(outbox_stats)), media_type=CONTENT_TYPE)
+
+
+def _require_profile_token(token: Optional[str]) -> None:
+    """Profiles are only served with the admin token (404 when disabled)."""
+    if not profiling_enabled():
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not token_matches(token):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+
+@app.get("/profiles", include_in_schema=False)
+async def list_profiles(x_profile_token: Optional[str] = Header(None)) -> Dict[str, Any]:
+    """List the stored request profiles, newest first."""
+    _require_profile_token(x_profile_token)
+    return {"profiles": await asyncio.to_thread(profile_store.entries)}
+
+
+@app.get("/profiles/{profile_id}", include_in_schema=False, response_model=None)
+async def get_profile(
+    profile_id: str,
+    x_profile_token: Optional[str] = Header(None),
+    output: str = Query("prof", pattern="^(prof|text)$"),
+    limit: int = Query(50, ge=1, le=1000),
+) -> FileResponse | PlainTextResponse:
+    """Download a profile (.prof, for pstats/snakeviz) or its top functions as text."""
+    _require_profile_token(x_profile_token)
+    if output == "text":
+        report = await asyncio.to_thread(profile_store.report, profile_id, limit)
+        if report is None:
+            raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found")
+        return PlainTextResponse(report)
+    path = profile_store.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=path.name)
+
+
 @app.get("/")
 async def root() -> Dict[str, str]:
     """Health check endpoint for the API."""
@@ -0,0 +1,147 @@
+"""
+Multi-account WhatsApp sending.
+
+Each authenticated WhatsApp account is a session file in the sessions
+directory (``sessions/<name>.json``) served by its own browser pool, so
+accounts never share a browser, context or lock. A sharding policy assigns
+every recipient to an account:
+
+- ``hash``: a stable hash of the phone number over all configured accounts,
+  so a recipient always talks to the same account (the bot dialogue stays in
+  one conversation). Only while that account is unavailable does the
+  recipient move to the next available one in name order;
+- ``least_loaded``: the account with the fewest sends assigned right now.
+
+Accounts whose pool is not ready are skipped. Without a sessions directory
+the legacy ``playwright_whatsapp_session.json`` is used as the single
+``default`` account.
+"""
+
+import asyncio
+import hashlib
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from app.services.log import get_logger
+from app.services.progress import ProgressCallback
+from app.services.rate_scheduler import DEFAULT_ACCOUNT
+from app.services.session_state import BASE_DIR, SessionStateManager, session_state
+
+logger = get_logger(__name__)
+
+if TYPE_CHECKING:
+    from app.services.browser_pool import WhatsAppBrowserPool
+
+SESSIONS_DIR = Path(os.getenv("WHATSAPP_SESSIONS_DIR", str(BASE_DIR / "sessions")))
+
+# "hash" ou "least_loaded"
+SHARDING_POLICY = os.getenv("WHATSAPP_SHARDING_POLICY", "hash").lower()
+
+
+def discover_accounts(sessions_dir: Path = SESSIONS_DIR) -> Dict[str, SessionStateManager]:
+    """Map account names to their session managers, one per session file."""
+    accounts: Dict[str, SessionStateManager] = {}
+    if sessions_dir.is_dir():
+        for path in sorted(sessions_dir.glob("*.json")):
+            accounts[path.stem] = SessionStateManager(path)
+    if not accounts:
+        accounts[DEFAULT_ACCOUNT] = session_state
+    return accounts
+
+
+class AccountRouter:
+    """Owns one browser pool per account and shards recipients across them."""
+
+    def __init__(self, sessions_dir: Path = SESSIONS_DIR, policy: str = SHARDING_POLICY) -> None:
+        """
+        Discover the accounts. Pools (and Playwright) are created by start(),
+        on the automation loop, so importing this module stays cheap.
+        """
+        if policy not in ("hash", "least_loaded"):
+            raise ValueError(f"Unknown sharding policy: {policy}")
+        self.policy = policy
+        self.sessions: Dict[str, SessionStateManager] = discover_accounts(sessions_dir)
+        self.pools: Dict[str, "WhatsAppBrowserPool"] = {}
+        self.names: List[str] = sorted(self.sessions)
+        # Envios atribuídos e ainda não concluídos, por conta
+        self._assigned: Dict[str, int] = {name: 0 for name in self.names}
+        logger.info("👥 [Accounts] Contas disponíveis: %s (política: %s)", ", ".join(self.names), policy)
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida (executa no loop de automação)
+    # ------------------------------------------------------------------
+    async def start(self) -> None:
+        """Warm up every account's browser concurrently."""
+        if not self.pools:
+            from app.services.browser_pool import (  # pylint: disable=import-outside-toplevel
+                WhatsAppBrowserPool,
+            )
+
+            self.pools = {
+                name: WhatsAppBrowserPool(session=manager, name=name)
+                for name, manager in self.sessions.items()
+            }
+        await asyncio.gather(*(pool.start() for pool in self.pools.values()))
+
+    async def close(self) -> None:
+        """Close every account's browser."""
+        await asyncio.gather(*(pool.close() for pool in self.pools.values()))
+
+    async def status(self) -> Dict[str, Any]:
+        """Status of every account's pool plus its current assignment count."""
+        statuses = await asyncio.gather(*(self.pools[n].status() for n in self.names))
+        return {
+            "policy": self.policy,
+            "accounts": {
+                name: {**status, "assigned": self._assigned[name]}
+                for name, status in zip(self.names, statuses)
+            },
+        }
+
+    # ------------------------------------------------------------------
+    # Sharding (executa no loop da API)
+    # ------------------------------------------------------------------
+    def _candidates(self) -> List[str]:
+        """Accounts ready to send; all of them when none is ready yet."""
+        ready = [name for name in self.names if name in self.pools and self.pools[name].ready]
+        return ready or self.names
+
+    def choose(self, phone: str) -> str:
+        """Pick the account for a recipient according to the policy."""
+        candidates = self._candidates()
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.policy == "least_loaded":
+            return min(candidates, key=lambda name: (self._assigned[name], name))
+        # O hash cobre todas as contas: a queda de uma não remaneja os destinatários das outras
+        digest = hashlib.sha256("".join(filter(str.isdigit, phone)).encode("ascii")).digest()
+        inicio = int.from_bytes(digest[:8], "big") % len(self.names)
+        for offset in range(len(self.names)):
+            name = self.names[(inicio + offset) % len(self.names)]
+            if name in candidates:
+                return name
+        return candidates[0]
+
+    def acquire(self, phone: str) -> str:
+        """Choose an account and count the send against it until release()."""
+        account = self.choose(phone)
+        self._assigned[account] += 1
+        return account
+
+    def release(self, account: str) -> None:
+        """Mark a send assigned with acquire() as finished."""
+        self._assigned[account] = max(0, self._assigned[account] - 1)
+
+    async def send(
+        self,
+        account: str,
+        phone: str,
+        message: str,
+        progress: Optional[ProgressCallback] = None,
+    ) -> bool:
+        """Run the dialogue on the given account's browser (automation loop)."""
+        return await self.pools[account].send(phone=phone, message=message, progress=progress)
+
+
+account_router = AccountRouter()
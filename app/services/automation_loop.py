@@ -0,0 +1,215 @@
+"""
+Dedicated, supervised event-loop thread for browser automation.
+
+Playwright objects are bound to the loop that created them, and on Windows
+uvicorn's loop cannot spawn the Chromium subprocess. Every automation
+coroutine therefore runs on this single long-lived loop (a Proactor loop on
+Windows). FastAPI handlers submit coroutines through a thread-safe API and
+await the result as a regular asyncio future, without polling.
+"""
+
+import asyncio
+import os
+import platform
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Coroutine, Dict, List, Optional, TypeVar
+
+from app.services.log import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Quantidade máxima de envios simultâneos no loop de automação
+MAX_CONCURRENT_SENDS = int(os.getenv("WHATSAPP_MAX_CONCURRENT_SENDS", "2"))
+
+# Intervalo de verificação do supervisor (segundos)
+SUPERVISOR_INTERVAL = float(os.getenv("WHATSAPP_SUPERVISOR_INTERVAL", "5"))
+
+Hook = Callable[[], Awaitable[None]]
+
+
+class AutomationLoop:
+    """
+    Runs one asyncio loop in a background thread and restarts it when the
+    thread dies. Startup hooks run on every (re)start so loop-bound resources,
+    such as the browser pool, are recreated on the fresh loop.
+    """
+
+    def __init__(
+        self,
+        max_concurrent_sends: int = MAX_CONCURRENT_SENDS,
+        supervisor_interval: float = SUPERVISOR_INTERVAL,
+    ) -> None:
+        """Initialize the loop manager without starting any thread."""
+        self.max_concurrent_sends = max(1, max_concurrent_sends)
+        self.supervisor_interval = supervisor_interval
+
+        self._startup_hooks: List[Hook] = []
+        self._shutdown_hooks: List[Hook] = []
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._supervisor: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._send_slots: Optional[asyncio.Semaphore] = None
+
+        self._state_lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = 0
+        self.restarts = 0
+
+    def add_startup_hook(self, hook: Hook) -> None:
+        """Register a coroutine function to run on the loop after each (re)start."""
+        self._startup_hooks.append(hook)
+
+    def add_shutdown_hook(self, hook: Hook) -> None:
+        """Register a coroutine function to run on the loop before it stops."""
+        self._shutdown_hooks.append(hook)
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the loop thread is alive and accepting work."""
+        return self._thread is not None and self._thread.is_alive()
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida
+    # ------------------------------------------------------------------
+    def start(self) -> None:
+        """Start the loop thread and its supervisor."""
+        if self.is_running:
+            return
+        self._stopping.clear()
+        self._spawn_loop()
+        self._supervisor = threading.Thread(
+            target=self._supervise, name="whatsapp-automation-supervisor", daemon=True
+        )
+        self._supervisor.start()
+
+    def stop(self, timeout: float = 15.0) -> None:
+        """Run the shutdown hooks and stop the loop thread and its supervisor."""
+        self._stopping.set()
+        if self._supervisor is not None:
+            self._supervisor.join(timeout=timeout)
+            self._supervisor = None
+
+        loop, thread = self._loop, self._thread
+        if loop is None or thread is None:
+            return
+        if thread.is_alive():
+            try:
+                self.submit(self._run_hooks(self._shutdown_hooks)).result(timeout=timeout)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning("[AUTOMATION] ⚠️ Erro ao encerrar o loop de automação: %s", e)
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=timeout)
+        if not loop.is_running():
+            loop.close()
+        self._loop = None
+        self._thread = None
+
+    def _spawn_loop(self) -> None:
+        """Create a fresh loop and thread, then schedule the startup hooks."""
+        # Evita classes obsoletas instanciando o loop diretamente
+        if platform.system() == "Windows":
+            loop: asyncio.AbstractEventLoop = asyncio.ProactorEventLoop()
+        else:
+            loop = asyncio.new_event_loop()
+
+        def run_loop() -> None:
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_forever()
+            except BaseException as e:  # pylint: disable=broad-except
+                logger.error("[AUTOMATION] ❌ Loop de automação encerrado com erro: %s", e)
+
+        self._loop = loop
+        self._thread = threading.Thread(
+            target=run_loop, name="whatsapp-automation-loop", daemon=True
+        )
+        self._thread.start()
+        self.submit(self._on_loop_start())
+
+    async def _on_loop_start(self) -> None:
+        """Create loop-bound primitives and run the startup hooks."""
+        self._send_slots = asyncio.Semaphore(self.max_concurrent_sends)
+        await self._run_hooks(self._startup_hooks)
+
+    @staticmethod
+    async def _run_hooks(hooks: List[Hook]) -> None:
+        """Run hooks in order, logging failures without aborting the others."""
+        for hook in hooks:
+            try:
+                await hook()
+            except Exception as e:  # pylint: disable=broad-except
+                logger.warning("[AUTOMATION] ⚠️ Hook %s falhou: %s", getattr(hook, "__qualname__", hook), e)
+
+    def _supervise(self) -> None:
+        """Restart the loop thread whenever it dies unexpectedly."""
+        while not self._stopping.wait(self.supervisor_interval):
+            thread = self._thread
+            if thread is not None and thread.is_alive():
+                continue
+            logger.info("[AUTOMATION] 🔄 Loop de automação parado. Reiniciando...")
+            old_loop = self._loop
+            if old_loop is not None and not old_loop.is_running():
+                old_loop.close()
+            self.restarts += 1
+            self._spawn_loop()
+
+    # ------------------------------------------------------------------
+    # Submissão de trabalho
+    # ------------------------------------------------------------------
+    def submit(self, coro: Coroutine[Any, Any, T]) -> "Future[T]":
+        """Schedule a coroutine on the automation loop from any thread."""
+        loop = self._loop
+        if loop is None or not self.is_running:
+            coro.close()
+            raise RuntimeError("Automation loop is not running")
+        return asyncio.run_coroutine_threadsafe(coro, loop)
+
+    async def run(self, coro: Coroutine[Any, Any, T]) -> T:
+        """Run a coroutine on the automation loop and await its result."""
+        return await asyncio.wrap_future(self.submit(coro))
+
+    async def run_send(self, coro: Coroutine[Any, Any, T]) -> T:
+        """Like run(), but bounded by the maximum number of concurrent sends."""
+        return await self.run(self._limited(coro))
+
+    async def _limited(self, coro: Coroutine[Any, Any, T]) -> T:
+        """Wait for a free send slot on the automation loop, then run the coroutine."""
+        if self._send_slots is None:
+            self._send_slots = asyncio.Semaphore(self.max_concurrent_sends)
+        with self._state_lock:
+            self._waiting += 1
+        try:
+            await self._send_slots.acquire()
+        except BaseException:
+            coro.close()
+            raise
+        finally:
+            with self._state_lock:
+                self._waiting -= 1
+        with self._state_lock:
+            self._in_flight += 1
+        try:
+            return await coro
+        finally:
+            with self._state_lock:
+                self._in_flight -= 1
+            self._send_slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the loop state and send slots usage."""
+        with self._state_lock:
+            return {
+                "running": self.is_running,
+                "restarts": self.restarts,
+                "max_concurrent_sends": self.max_concurrent_sends,
+                "in_flight": self._in_flight,
+                "waiting": self._waiting,
+            }
+
+
+automation_loop = AutomationLoop()
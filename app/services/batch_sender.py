@@ -0,0 +1,289 @@
+"""
+Bulk WhatsApp sending: batches of (phone, message) pairs are enqueued as jobs
+and drained by concurrent workers over the shared automation engine. Each
+job has a progress channel streaming the milestones of its recipients.
+
+A recipient whose attempt failed while the outbox still has retries left is
+``retrying``, linked to its outbox row, and settles (sent or failed) when the
+outbox dispatcher reports the row's outcome; the job completes only then.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.services.delivery import deliver_whatsapp
+from app.services.log import get_logger
+from app.services.outbox import STATE_SENT, OutboxEntry
+from app.services.progress import (
+    STEP_CONFIRMED,
+    STEP_FAILED,
+    STEP_JOB_COMPLETED,
+    STEP_QUEUED,
+    STEP_RETRY_SCHEDULED,
+    ProgressHub,
+    progress_hub,
+)
+from app.services.rate_scheduler import PRIORITY_NORMAL
+
+logger = get_logger(__name__)
+
+# Quantidade de workers consumindo a fila de envios em lote
+BATCH_WORKERS = int(os.getenv("WHATSAPP_BATCH_WORKERS", "2"))
+
+# Quantidade de jobs concluídos mantidos em memória para consulta
+MAX_STORED_JOBS = int(os.getenv("WHATSAPP_BATCH_MAX_JOBS", "100"))
+
+# (telefone, mensagem, prioridade, progress=callback) -> linha do outbox após a tentativa
+SendFunction = Callable[..., Awaitable[OutboxEntry]]
+
+
+@dataclass
+class BatchRecipient:
+    """Delivery state of one recipient inside a batch job."""
+
+    phone_number: str
+    message: str
+    priority: int = PRIORITY_NORMAL
+    status: str = "pending"  # pending | sending | retrying | sent | failed
+    error: Optional[str] = None
+    # Linha do outbox da entrega, conhecida após a primeira tentativa
+    outbox_id: Optional[int] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public view of the recipient, without the message body."""
+        duration = None
+        if self.started_at is not None and self.finished_at is not None:
+            duration = round(self.finished_at - self.started_at, 3)
+        return {
+            "phone_number": self.phone_number,
+            "priority": self.priority,
+            "status": self.status,
+            "error": self.error,
+            "outbox_id": self.outbox_id,
+            "duration_s": duration,
+        }
+
+
+@dataclass
+class BatchJob:
+    """A batch of recipients submitted in one request."""
+
+    job_id: str
+    recipients: List[BatchRecipient]
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    # Destinatários ainda sem estado final (sent/failed); zero conclui o job
+    remaining: int = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.remaining = len(self.recipients)
+
+    @property
+    def status(self) -> str:
+        """Aggregate status: queued, running or completed."""
+        if self.finished_at is not None:
+            return "completed"
+        if self.started_at is not None:
+            return "running"
+        return "queued"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Progress, throughput and failures of the job."""
+        counts = {"pending": 0, "sending": 0, "retrying": 0, "sent": 0, "failed": 0}
+        for recipient in self.recipients:
+            counts[recipient.status] += 1
+
+        done = counts["sent"] + counts["failed"]
+        elapsed = 0.0
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        throughput = (done / elapsed * 60) if elapsed > 0 else 0.0
+
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "total": len(self.recipients),
+            "progress": round(done / len(self.recipients), 4) if self.recipients else 1.0,
+            "counts": counts,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_per_min": round(throughput, 2),
+            "failures": [r.to_dict() for r in self.recipients if r.status == "failed"],
+            "recipients": [r.to_dict() for r in self.recipients],
+        }
+
+
+class BatchSendManager:
+    """Owns the job queue and the worker tasks that drain it."""
+
+    def __init__(
+        self,
+        workers: int = BATCH_WORKERS,
+        send: SendFunction = deliver_whatsapp,
+        max_stored_jobs: int = MAX_STORED_JOBS,
+        progress: ProgressHub = progress_hub,
+    ) -> None:
+        """Initialize the manager; workers start with start()."""
+        self.workers = max(1, workers)
+        self.max_stored_jobs = max_stored_jobs
+        self.progress = progress
+        self._send = send
+        self._jobs: "OrderedDict[str, BatchJob]" = OrderedDict()
+        # Itens: (prioridade, sequência, job, destinatário)
+        self._queue: Optional[
+            "asyncio.PriorityQueue[Tuple[int, int, BatchJob, BatchRecipient]]"
+        ] = None
+        self._seq = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+        # Destinatários aguardando a nova tentativa do outbox, por linha
+        self._retrying: Dict[int, List[Tuple[BatchJob, BatchRecipient]]] = {}
+
+    async def start(self) -> None:
+        """Spawn the worker tasks on the running (API) loop."""
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"whatsapp-batch-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info("📦 [Batch] %s workers de envio em lote iniciados", self.workers)
+
+    async def stop(self) -> None:
+        """Cancel the worker tasks. Pending recipients stay pending."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of recipients waiting for a worker."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, items: List[Tuple[str, str, int]]) -> BatchJob:
+        """Enqueue (phone, message, priority) items as a new job and return it."""
+        if self._queue is None:
+            raise RuntimeError("Batch send manager is not running")
+
+        job = BatchJob(
+            job_id=uuid.uuid4().hex,
+            recipients=[
+                BatchRecipient(phone, message, priority) for phone, message, priority in items
+            ],
+        )
+        self._jobs[job.job_id] = job
+        self._trim_jobs()
+        self.progress.open(job.job_id)
+        for recipient in job.recipients:
+            self.progress.emit(job.job_id, STEP_QUEUED, {"phone_number": recipient.phone_number})
+            self._queue.put_nowait((recipient.priority, next(self._seq), job, recipient))
+        logger.info("📦 [Batch] Job %s enfileirado com %s destinatários", job.job_id, len(job.recipients))
+        return job
+
+    def get(self, job_id: str) -> Optional[BatchJob]:
+        """Look up a job by id."""
+        return self._jobs.get(job_id)
+
+    def on_outbox_outcome(self, entry: OutboxEntry) -> None:
+        """
+        Outbox dispatcher listener: settle the recipients waiting for this
+        row's retry, or keep them ``retrying`` if another one is scheduled.
+        """
+        for job, recipient in self._retrying.pop(entry.id, []):
+            self._record(job, recipient, entry)
+
+    def _trim_jobs(self) -> None:
+        """Forget the oldest completed jobs beyond the retention limit."""
+        while len(self._jobs) > self.max_stored_jobs:
+            oldest_id = next(
+                (jid for jid, j in self._jobs.items() if j.status == "completed"), None
+            )
+            if oldest_id is None:
+                break
+            del self._jobs[oldest_id]
+
+    async def _worker(self, worker_id: int) -> None:
+        """Take recipients from the queue and send them one at a time."""
+        assert self._queue is not None
+        queue = self._queue
+        while True:
+            _, _, job, recipient = await queue.get()
+            try:
+                if job.started_at is None:
+                    job.started_at = time.time()
+                recipient.status = "sending"
+                recipient.started_at = time.time()
+                report = self.progress.callback(job.job_id, phone_number=recipient.phone_number)
+                try:
+                    entry = await self._send(
+                        recipient.phone_number,
+                        recipient.message,
+                        recipient.priority,
+                        progress=report,
+                    )
+                except Exception as e:  # pylint: disable=broad-except
+                    logger.error("❌ [Batch] Worker %s falhou para %s: %s", worker_id, recipient.phone_number, e)
+                    recipient.status = "failed"
+                    recipient.error = str(e)
+                    recipient.finished_at = time.time()
+                    report(STEP_FAILED, {"error": recipient.error})
+                    self._settled(job)
+                else:
+                    recipient.outbox_id = entry.id
+                    # Outros lotes podem aguardar a mesma linha (mesmo relatório reenviado)
+                    self.on_outbox_outcome(entry)
+                    self._record(job, recipient, entry)
+            finally:
+                queue.task_done()
+
+    def _record(self, job: BatchJob, recipient: BatchRecipient, entry: OutboxEntry) -> None:
+        """Apply the outbox row after an attempt to its recipient and report it."""
+        report = self.progress.callback(job.job_id, phone_number=recipient.phone_number)
+        if entry.retry_scheduled:
+            # Ainda não é definitivo: o dispatcher do outbox tenta de novo e avisa
+            recipient.status = "retrying"
+            recipient.error = entry.last_error
+            self._retrying.setdefault(entry.id, []).append((job, recipient))
+            report(
+                STEP_RETRY_SCHEDULED,
+                {
+                    "outbox_id": entry.id,
+                    "attempts": entry.attempts,
+                    "next_attempt_at": entry.next_attempt_at,
+                    "error": entry.last_error,
+                },
+            )
+            return
+
+        recipient.finished_at = time.time()
+        if entry.state == STATE_SENT:
+            recipient.status = "sent"
+            recipient.error = None
+            report(STEP_CONFIRMED, {})
+        else:
+            recipient.status = "failed"
+            recipient.error = entry.last_error or "A automação foi executada, mas não concluiu o envio."
+            report(STEP_FAILED, {"error": recipient.error})
+        self._settled(job)
+
+    def _settled(self, job: BatchJob) -> None:
+        """Count a recipient of ``job`` as final and complete the job after the last one."""
+        job.remaining -= 1
+        if job.remaining == 0:
+            job.finished_at = time.time()
+            self.progress.emit(job.job_id, STEP_JOB_COMPLETED, job.snapshot()["counts"])
+            self.progress.close(job.job_id)
+            logger.info("✅ [Batch] Job %s concluído", job.job_id)
+
+
+batch_manager = BatchSendManager()
@@ -0,0 +1,349 @@
+"""
+Long-lived Playwright Chromium pool that keeps an authenticated WhatsApp Web
+page warm between sends.
+
+The pool is started once by the FastAPI lifespan (see app/main.py). Playwright
+objects are bound to the event loop that created them, so every method here
+runs on the dedicated automation loop from app.services.automation_loop.
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, List, Optional
+
+from playwright.async_api import Browser, BrowserContext, Page, Playwright
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import async_playwright
+
+from app.services.browser_profile import (
+    INTERACTIVE_PROFILE,
+    BrowserProfile,
+    apply_resource_blocking,
+    browser_resource_usage,
+    select_profile,
+)
+from app.services.log import get_logger
+from app.services.progress import (
+    STEP_BROWSER_READY,
+    STEP_CHAT_OPEN,
+    ProgressCallback,
+)
+from app.services.session_state import SessionStateManager, session_state
+from app.services.timeline import (
+    PLAYWRIGHT_TRACE_DIR,
+    Timeline,
+    span,
+    timeline_recorder,
+    trace_path,
+)
+from app.services.whatsapp_automation import (
+    CHAT_NAVIGATION,
+    USER_AGENT,
+    WHATSAPP_WEB_URL,
+    StepTiming,
+    abrir_chat,
+    abrir_chat_no_app,
+    aguardar_chat_pronto,
+    aguardar_interface,
+    executar_dialogo,
+)
+
+logger = get_logger(__name__)
+
+# Intervalo entre verificações de saúde da página aquecida (segundos)
+HEALTH_CHECK_INTERVAL = float(os.getenv("WHATSAPP_HEALTH_CHECK_INTERVAL", "30"))
+
+
+class WhatsAppBrowserPool:
+    """
+    Keeps one Chromium browser, one authenticated context and one WhatsApp Web
+    page alive for one account. WhatsApp Web only allows a single active tab
+    per account, so sends on the warm page are serialized by a lock; more
+    accounts (app.services.accounts) means more pools sending in parallel.
+    """
+
+    def __init__(
+        self,
+        session: SessionStateManager = session_state,
+        health_check_interval: float = HEALTH_CHECK_INTERVAL,
+        name: str = "default",
+    ) -> None:
+        """Initialize the pool without launching anything yet."""
+        self.name = name
+        self.session = session
+        self.health_check_interval = health_check_interval
+
+        self._playwright: Optional[Playwright] = None
+        self._browser: Optional[Browser] = None
+        self._context: Optional[BrowserContext] = None
+        self._page: Optional[Page] = None
+
+        self._lock: Optional[asyncio.Lock] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._ready = False
+
+        self.profile: BrowserProfile = INTERACTIVE_PROFILE
+
+        # Latência por passo do último diálogo executado
+        self.last_timings: List[StepTiming] = []
+        # Timeline completa do último envio (spans com duração)
+        self.last_timeline: Optional[Timeline] = None
+
+    # ------------------------------------------------------------------
+    # Ciclo de vida do navegador (executa dentro do loop de automação)
+    # ------------------------------------------------------------------
+    async def start(self) -> None:
+        """Launch the browser and keep WhatsApp Web open, then watch its health."""
+        # Um reinício do loop invalida os objetos criados no loop anterior
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._page = None
+        self._ready = False
+        self._lock = asyncio.Lock()
+        async with self._lock:
+            try:
+                with timeline_recorder.timeline("warmup", account=self.name):
+                    await self._connect()
+            except (asyncio.TimeoutError, PlaywrightError) as err:
+                # O health check tentará novamente em segundo plano
+                logger.error("PLAYWRIGHT ❌ Falha ao aquecer o navegador: %s", err)
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self) -> None:
+        """Stop the health checks and release every Playwright resource."""
+        if self._lock is None:
+            await self._disconnect()
+            return
+        # Aguarda um aquecimento ou envio em andamento antes de fechar
+        async with self._lock:
+            if self._health_task is not None:
+                self._health_task.cancel()
+                try:
+                    await self._health_task
+                except asyncio.CancelledError:
+                    pass
+                self._health_task = None
+            await asyncio.to_thread(self.session.flush)
+            await self._disconnect()
+
+    async def _connect(self) -> bool:
+        """Open a fresh browser, context and page and wait for the main UI."""
+        await self._disconnect()
+
+        estado_sessao = await asyncio.to_thread(self.session.load)
+        self.profile = select_profile(estado_sessao is not None)
+        logger.info("PLAYWRIGHT 🧩 Conta '%s' | perfil do navegador: %s", self.name, self.profile.name)
+
+        with span("launch", profile=self.profile.name):
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(
+                headless=self.profile.headless, args=self.profile.args
+            )
+
+        # Estado da sessão mantido em memória pelo gerenciador (lido do disco uma vez)
+        with span("new_context", session=estado_sessao is not None):
+            if estado_sessao is not None:
+                logger.info("PLAYWRIGHT 🔑 Carregando sessão existente: %s", self.session.path)
+                self._context = await self._browser.new_context(
+                    storage_state=estado_sessao, user_agent=USER_AGENT
+                )
+            else:
+                logger.info("PLAYWRIGHT 🆕 Nenhuma sessão encontrada. Iniciando novo contexto para autenticação...")
+                self._context = await self._browser.new_context(user_agent=USER_AGENT)
+
+            await apply_resource_blocking(self._context, self.profile)
+            if PLAYWRIGHT_TRACE_DIR:
+                # Cada envio grava um chunk próprio do trace (ver send)
+                await self._context.tracing.start(screenshots=True, snapshots=True)
+            self._page = await self._context.new_page()
+        try:
+            with span("navigation", mode="home"):
+                await self._page.goto(
+                    WHATSAPP_WEB_URL, wait_until="domcontentloaded", timeout=120000
+                )
+        except (asyncio.TimeoutError, PlaywrightError) as err:
+            logger.error("PLAYWRIGHT ❌ Falha ao abrir o WhatsApp Web: %s", err)
+            return False
+
+        if not await aguardar_interface(self._page):
+            return False
+
+        if await self._save_session(force=True):
+            logger.info("PLAYWRIGHT 💾 Estado da sessão armazenado no disco!")
+        self._ready = True
+        logger.info("PLAYWRIGHT 🔥 Pool aquecido: WhatsApp Web pronto para envios.")
+        return True
+
+    async def _save_session(self, force: bool = False) -> bool:
+        """
+        Hand the current storage state to the session manager, which writes
+        it atomically and only when it changed (and the flush interval allows).
+        """
+        if self._context is None:
+            return False
+        with span("storage_state", force=force) as attrs:
+            state = await self._context.storage_state()
+            attrs["written"] = await asyncio.to_thread(self.session.update, state, force)
+        return attrs["written"]
+
+    async def _disconnect(self) -> None:
+        """Close the current browser, ignoring errors from dead targets."""
+        self._ready = False
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except PlaywrightError:
+                pass
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except PlaywrightError:
+                pass
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._page = None
+
+    @property
+    def ready(self) -> bool:
+        """Whether the warm page was authenticated and not marked broken."""
+        return self._ready
+
+    async def is_healthy(self) -> bool:
+        """Check that the browser is connected and the main UI is still rendered."""
+        if not self._ready or self._browser is None or self._page is None:
+            return False
+        if not self._browser.is_connected() or self._page.is_closed():
+            return False
+        try:
+            return await self._page.query_selector("#side") is not None
+        except PlaywrightError:
+            return False
+
+    async def status(self) -> Dict[str, Any]:
+        """Health, launch profile and per-browser memory/CPU usage."""
+        usage: Optional[Dict[str, Any]] = None
+        if self._browser is not None and self._browser.is_connected():
+            try:
+                usage = await browser_resource_usage(self._browser)
+            except PlaywrightError as err:
+                usage = {"error": str(err)}
+        return {
+            "account": self.name,
+            "healthy": await self.is_healthy(),
+            "profile": self.profile.name,
+            "headless": self.profile.headless,
+            "blocked_resource_types": sorted(self.profile.blocked_resource_types),
+            "session": self.session.stats(),
+            "resources": usage,
+        }
+
+    async def _ensure_ready(self) -> bool:
+        """Reconnect when the warm page is missing or unhealthy."""
+        if await self.is_healthy():
+            return True
+        logger.info("PLAYWRIGHT 🔄 Página aquecida indisponível. Reconectando...")
+        return await self._connect()
+
+    async def _health_loop(self) -> None:
+        """
+        Periodically verify the warm page and reconnect automatically. Any
+        error of one check is logged and the loop keeps running; only
+        cancellation (close()) stops it.
+        """
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            if self._lock is None or self._lock.locked():
+                # Um envio em andamento já valida a página
+                continue
+            async with self._lock:
+                try:
+                    await self._ensure_ready()
+                    await asyncio.to_thread(self.session.flush_if_due)
+                except (asyncio.TimeoutError, PlaywrightError) as err:
+                    logger.warning("PLAYWRIGHT ⚠️ Health check falhou: %s", err)
+                except Exception:  # pylint: disable=broad-except
+                    # Sem isto a tarefa morre calada e a página deixa de ser reconectada
+                    logger.error("PLAYWRIGHT ❌ Erro inesperado no health check", exc_info=True)
+
+    # ------------------------------------------------------------------
+    # Envio
+    # ------------------------------------------------------------------
+    async def send(
+        self, phone: str, message: str, progress: Optional[ProgressCallback] = None
+    ) -> bool:
+        """Run the full dialogue for one recipient on the warm page."""
+        if self._lock is None:
+            raise RuntimeError("WhatsApp browser pool was not started")
+
+        async with self._lock:
+            with timeline_recorder.timeline("send", account=self.name, phone=phone) as atual:
+                self.last_timeline = atual
+                trace = await self._start_trace_chunk()
+                try:
+                    return await self._send_locked(phone, message, progress)
+                finally:
+                    await self._stop_trace_chunk(trace, phone)
+
+    async def _start_trace_chunk(self) -> bool:
+        """Start a Playwright trace chunk for one send when tracing is enabled."""
+        if not PLAYWRIGHT_TRACE_DIR or self._context is None:
+            return False
+        try:
+            await self._context.tracing.start_chunk(title=self.name)
+            return True
+        except PlaywrightError as err:
+            logger.warning("PLAYWRIGHT ⚠️ Falha ao iniciar o trace: %s", err)
+            return False
+
+    async def _stop_trace_chunk(self, started: bool, phone: str) -> None:
+        """Save the send's trace chunk as a zip in WHATSAPP_PLAYWRIGHT_TRACE_DIR."""
+        destino = trace_path(f"{self.name}_{phone}")
+        if not started or destino is None or self._context is None:
+            return
+        try:
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            await self._context.tracing.stop_chunk(path=str(destino))
+            logger.info("PLAYWRIGHT 🧭 Trace salvo em %s", destino)
+        except PlaywrightError as err:
+            logger.warning("PLAYWRIGHT ⚠️ Falha ao salvar o trace: %s", err)
+
+    async def _send_locked(
+        self, phone: str, message: str, progress: Optional[ProgressCallback]
+    ) -> bool:
+        """Body of send(); the caller holds the lock."""
+        try:
+            if not await self._ensure_ready():
+                return False
+            assert self._page is not None and self._context is not None
+            if progress is not None:
+                progress(STEP_BROWSER_READY, {"account": self.name})
+
+            # Troca de conversa dentro da SPA; o goto fica como fallback
+            aberto = False
+            if CHAT_NAVIGATION == "inapp":
+                with span("chat_switch_inapp") as attrs:
+                    aberto = await abrir_chat_no_app(self._page, phone)
+                    attrs["ok"] = aberto
+            if not aberto:
+                if not await abrir_chat(self._page, phone):
+                    self._ready = False
+                    return False
+                if not await aguardar_chat_pronto(self._page):
+                    return False
+            if progress is not None:
+                progress(STEP_CHAT_OPEN, {"navigation": "inapp" if aberto else "goto"})
+            timings: List[StepTiming] = []
+            self.last_timings = timings
+            if not await executar_dialogo(self._page, message, timings, progress):
+                return False
+
+            await self._save_session()
+            return True
+
+        except (PlaywrightError, asyncio.TimeoutError) as err:
+            logger.error("PLAYWRIGHT ❌ Erro na automação: %s", err)
+            # Força a reconexão no próximo envio ou health check
+            self._ready = False
+            return False
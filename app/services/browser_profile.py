@@ -0,0 +1,143 @@
+"""
+Chromium launch profiles for the WhatsApp automation.
+
+The interactive profile opens a visible window, needed to scan the QR Code.
+Once a session file exists, the lightweight profile runs headless, blocks
+non-essential resources (images, media, fonts) through request routing and
+passes conservative renderer flags, so several senders fit on one host
+without an X display.
+"""
+
+import os
+import platform
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, List, Optional
+
+from playwright.async_api import Browser, BrowserContext, Route
+from playwright.async_api import Error as PlaywrightError
+
+from app.services.whatsapp_automation import CHROMIUM_ARGS
+
+# "auto" usa o perfil leve quando já existe sessão autenticada
+BROWSER_PROFILE = os.getenv("WHATSAPP_BROWSER_PROFILE", "auto").lower()
+
+LIGHTWEIGHT_ARGS = [
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--mute-audio",
+    "--no-first-run",
+    "--renderer-process-limit=2",
+    "--js-flags=--max-old-space-size=512",
+]
+
+
+@dataclass(frozen=True)
+class BrowserProfile:
+    """How Chromium is launched and which resource types are blocked."""
+
+    name: str
+    headless: bool
+    args: List[str] = field(default_factory=list)
+    blocked_resource_types: FrozenSet[str] = frozenset()
+
+
+INTERACTIVE_PROFILE = BrowserProfile(
+    name="interactive",
+    headless=False,
+    args=list(CHROMIUM_ARGS),
+)
+
+LIGHTWEIGHT_PROFILE = BrowserProfile(
+    name="lightweight",
+    headless=True,
+    args=list(CHROMIUM_ARGS) + LIGHTWEIGHT_ARGS,
+    blocked_resource_types=frozenset({"image", "media", "font"}),
+)
+
+
+def select_profile(has_session: bool) -> BrowserProfile:
+    """
+    Pick the launch profile. Without a saved session the QR Code must be
+    scanned, so "auto" only goes headless when a session exists.
+    """
+    if BROWSER_PROFILE == "interactive":
+        return INTERACTIVE_PROFILE
+    if BROWSER_PROFILE == "lightweight":
+        return LIGHTWEIGHT_PROFILE
+    return LIGHTWEIGHT_PROFILE if has_session else INTERACTIVE_PROFILE
+
+
+async def apply_resource_blocking(context: BrowserContext, profile: BrowserProfile) -> None:
+    """Abort requests for the profile's blocked resource types."""
+    if not profile.blocked_resource_types:
+        return
+
+    blocked = profile.blocked_resource_types
+
+    async def handler(route: Route) -> None:
+        if route.request.resource_type in blocked:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await context.route("**/*", handler)
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident memory of a process in MB, read from /proc (Linux only)."""
+    if platform.system() != "Linux":
+        return None
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        return None
+    return None
+
+
+async def browser_resource_usage(browser: Browser) -> Dict[str, Any]:
+    """
+    Memory and CPU of every Chromium process of a browser.
+
+    Process ids and CPU time come from the DevTools SystemInfo domain; RSS is
+    read from /proc where available (None elsewhere).
+    """
+    session = await browser.new_browser_cdp_session()
+    try:
+        info = await session.send("SystemInfo.getProcessInfo")
+    finally:
+        try:
+            await session.detach()
+        except PlaywrightError:
+            pass
+
+    processes = []
+    total_cpu = 0.0
+    total_rss: Optional[float] = 0.0
+    for proc in info.get("processInfo", []):
+        rss = rss_mb(int(proc["id"]))
+        cpu = float(proc.get("cpuTime", 0.0))
+        total_cpu += cpu
+        total_rss = None if rss is None or total_rss is None else total_rss + rss
+        processes.append(
+            {
+                "pid": proc["id"],
+                "type": proc.get("type"),
+                "cpu_time_s": round(cpu, 3),
+                "rss_mb": round(rss, 1) if rss is not None else None,
+            }
+        )
+
+    return {
+        "processes": len(processes),
+        "cpu_time_s": round(total_cpu, 3),
+        "rss_mb": round(total_rss, 1) if total_rss is not None else None,
+        "by_process": processes,
+    }
@@ -0,0 +1,119 @@
+"""
+Single entry point used by the API to deliver one WhatsApp report through the
+shared automation engine: durable outbox -> rate scheduler -> automation loop
+-> account sharding -> warm browser pool of the chosen account. With
+WHATSAPP_ENGINE=process the pool runs in the account's supervised worker
+process instead of the in-process automation loop.
+"""
+
+import time
+from typing import Optional
+
+from app.services.accounts import account_router
+from app.services.automation_loop import automation_loop
+from app.services.log import get_logger
+from app.services.metrics import SCHEDULER_WAIT, SEND_LATENCY
+from app.services.outbox import STATE_SENT, STATE_UNKNOWN, OutboxDispatcher, OutboxEntry, outbox
+from app.services.progress import STEP_SCHEDULED, ProgressCallback
+from app.services.rate_scheduler import PRIORITY_NORMAL, rate_scheduler
+from app.services.whatsapp_service import ENGINE_MODE, whatsapp_service
+
+logger = get_logger(__name__)
+
+
+def adicionar_encerramento(message: str) -> str:
+    """Append the automatic-message closing signature to a report."""
+    # Anexa a assinatura de encerramento automático logo após o bloco de dados enviado
+    return (
+        f"{message}\n\n"
+        f"🤖 *Esta é uma mensagem automática de informe de consumo de gás. "
+        f"Por favor, não responda a este número.*"
+    )
+
+
+async def _send_now(
+    phone: str, message: str, priority: int, progress: Optional[ProgressCallback] = None
+) -> bool:
+    """
+    Shard the recipient to an account, wait for that account's scheduler
+    grant and run the dialogue on the account's warm pool.
+    """
+    account = account_router.acquire(phone)
+    try:
+        with SCHEDULER_WAIT.time():
+            await rate_scheduler.acquire(phone, account=account, priority=priority)
+        if progress is not None:
+            progress(STEP_SCHEDULED, {"account": account})
+        inicio = time.perf_counter()
+        outcome = "error"
+        try:
+            if ENGINE_MODE == "process":
+                ok = await whatsapp_service.send_message(
+                    account, phone, adicionar_encerramento(message), progress
+                )
+            else:
+                ok = await automation_loop.run_send(
+                    account_router.send(account, phone, adicionar_encerramento(message), progress)
+                )
+            outcome = "confirmed" if ok else "failed"
+            return ok
+        finally:
+            SEND_LATENCY.observe(time.perf_counter() - inicio, engine=ENGINE_MODE, outcome=outcome)
+    finally:
+        account_router.release(account)
+
+
+async def _send_entry(entry: OutboxEntry) -> bool:
+    """Send a row picked up by the outbox dispatcher (retries and recovery)."""
+    return await _send_now(entry.phone, entry.message, entry.priority)
+
+
+async def deliver_whatsapp(
+    phone: str,
+    message: str,
+    priority: int = PRIORITY_NORMAL,
+    progress: Optional[ProgressCallback] = None,
+) -> OutboxEntry:
+    """
+    Send a report with its closing signature on the warm browser pool, once
+    the rate scheduler grants the send, and return its outbox row as recorded
+    after the attempt.
+
+    The delivery is recorded in the outbox first: content already confirmed
+    for this phone is not sent again (its ``sent`` row is returned), while
+    content in flight or awaiting review raises RuntimeError. A failed attempt
+    comes back as ``failed`` with ``retry_scheduled`` set while the outbox
+    dispatcher will try again; callers must report that as pending, not as a
+    final failure. Milestones of the attempt are reported to ``progress``
+    when given.
+    """
+    entry, claimed = await outbox.abegin(phone, message, priority)
+    if not claimed:
+        if entry.state == STATE_SENT:
+            logger.info("📮 [Outbox] Relatório já enviado para %s. Ignorando duplicata.", phone)
+            return entry
+        if entry.state == STATE_UNKNOWN:
+            raise RuntimeError(
+                f"O envio anterior do mesmo relatório para {phone} não foi confirmado;"
+                f" aguardando revisão no outbox (#{entry.id})."
+            )
+        raise RuntimeError(f"O mesmo relatório para {phone} já está em envio.")
+
+    try:
+        sucesso = await _send_now(phone, message, priority, progress)
+    except Exception as e:  # pylint: disable=broad-except
+        logger.error("❌ [Delivery] Falha ao enviar para %s: %s", phone, e)
+        atualizado = await outbox.amark_failed(entry.id, str(e) or type(e).__name__)
+    except BaseException as e:
+        await outbox.amark_failed(entry.id, str(e) or type(e).__name__)
+        raise
+    else:
+        if sucesso:
+            atualizado = await outbox.amark_sent(entry.id)
+        else:
+            atualizado = await outbox.amark_failed(entry.id, "A automação não concluiu o envio.")
+    assert atualizado is not None
+    return atualizado
+
+
+outbox_dispatcher = OutboxDispatcher(outbox, _send_entry)
@@ -2,10 +2,15 @@
 
 import io
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional, Tuple
 
 import pandas as pd  # type: ignore
 
+from app.services.log import SAMPLED, get_logger, lazy
+from app.services.metrics import INGEST_STAGE
+
+logger = get_logger(__name__)
+
 
 class ExcelService:  # pylint: disable=too-few-public-methods
     """Service for processing gas Excel files in the WhatsApp gas clone app."""
@@ -29,82 +34,37 @@ class ExcelService:  # pylint: disable=too-few-public-methods
         """
         try:
             # 1. Abre o arquivo temporariamente para espiar as abas disponíveis
-            content_io = io.BytesIO(content)
-            xl = pd.ExcelFile(content_io, engine="openpyxl")
-            abas_disponiveis = xl.sheet_names
+            with INGEST_STAGE.time(stage="open"):
+                content_io = io.BytesIO(content)
+                xl = pd.ExcelFile(content_io, engine="openpyxl")
+                abas_disponiveis = xl.sheet_names
 
-            # 2. Define o ano corrente do sistema como alvo padrão (Ex: 2026)
-            ano_alvo = str(datetime.now().year)
-
-            # 3. Se o usuário passou um filtro de mês/ano, extrai o ano escolhido
-            if target_month and "/" in target_month:
-                try:
-                    ano_alvo = target_month.split("/")[-1].strip()
-                except IndexError:
-                    pass
-
-            # 4. Monta o nome dinâmico esperado para a aba
-            aba_esperada = f"Gas_{ano_alvo}"
-
-            # 5. Fallback de Segurança: Se a aba calculada não existir, usa a primeira disponível
-            if aba_esperada in abas_disponiveis:
-                aba_final = aba_esperada
-            else:
-                # Ensure aba_final is always a string (sheet names can sometimes be non-str)
-                aba_final = str(abas_disponiveis[0]) if abas_disponiveis else "Sheet1"
-                print(f"⚠️ Aba '{aba_esperada}' não encontrada. Utilizando fallback: '{aba_final}'")
+            with INGEST_STAGE.time(stage="sheet_resolve"):
+                aba_final = self._resolve_sheet(abas_disponiveis, target_month)
 
-            print(f"📂 Abrindo dinamicamente a aba do Excel: {aba_final}")
+            logger.info("📂 Abrindo dinamicamente a aba do Excel: %s", aba_final)
 
             # 6. Carrega os dados da aba definida
-            content_io.seek(0)
-            excel_data = pd.read_excel(
-                content_io, sheet_name=aba_final, header=0
-            )
-            print(f"Raw Excel data shape: {excel_data.shape}")
-            print(f"Columns: {list(excel_data.columns)}")
-            print(f"First few rows:\n{excel_data.head()}")
+            with INGEST_STAGE.time(stage="read"):
+                content_io.seek(0)
+                excel_data = pd.read_excel(
+                    content_io, sheet_name=aba_final, header=0
+                )
+            logger.debug("Raw Excel data shape: %s", excel_data.shape)
+            logger.debug("Columns: %s", lazy(lambda: list(excel_data.columns)))
+            logger.debug("First few rows:\n%s", lazy(excel_data.head))
 
-            formatted_df = self._format_dataframe(excel_data)
-            print(f"Formatted data shape: {formatted_df.shape}")
+            with INGEST_STAGE.time(stage="format"):
+                formatted_df = self._format_dataframe(excel_data)
+            logger.debug("Formatted data shape: %s", formatted_df.shape)
 
             if target_month:
-                formatted_df = self._filter_by_month(formatted_df, target_month)
-                print(f"After month filter ({target_month}): {formatted_df.shape}")
+                with INGEST_STAGE.time(stage="filter"):
+                    formatted_df = self._filter_by_month(formatted_df, target_month)
+                logger.debug("After month filter (%s): %s", target_month, formatted_df.shape)
 
-            gas_data = []
-            target_date: str = ""
-
-            for index, row in formatted_df.iterrows():
-                try:
-                    data_leitura = str(row.get("Data Leitura", "") or "").strip()
-                    apartamento = str(row.get("Apartamento", "") or "").strip()
-                    if not data_leitura or data_leitura.lower() == "data leitura":
-                        continue
-                    if not apartamento or apartamento.lower() == "apartamento":
-                        continue
-
-                    # Forçamos as chaves a corresponderem exatamente ao modelo Pydantic esperado pelo FastAPI
-                    item = {
-                        "data_leitura": data_leitura,
-                        "apartamento": apartamento,
-                        "leitura_atual": self._safe_float_convert(
-                            row.get("Leitura atual", 0)
-                        ),
-                        "consumo_m3": self._safe_float_convert(
-                            row.get("Consumo(m³)", 0)
-                        ),
-                        "calculo": self._safe_float_convert(row.get("Cálculo", 0)),
-                        "valor_final_rs": round(
-                            self._safe_float_convert(row.get("Valor final(R$)", 0)), 2
-                        ),
-                    }
-                    gas_data.append(item)
-                    if not target_date and data_leitura:
-                        target_date = data_leitura
-                except (TypeError, ValueError) as row_error:
-                    print(f"Skipping row {index} due to error: {row_error}")
-                    continue
+            with INGEST_STAGE.time(stage="records"):
+                gas_data, target_date = self._build_records(formatted_df)
 
             if not gas_data:
                 raise ValueError("No valid data found in Excel file.")
@@ -133,6 +93,71 @@ class ExcelService:  # pylint: disable=too-few-public-methods
                 case _:
                     raise ValueError(f"Error processing Excel file: {e}") from e
 
+    def _resolve_sheet(self, abas_disponiveis: list, target_month: Optional[str]) -> str:
+        """
+        Pick the sheet of the target year (Gas_<year>), falling back to the first one.
+        """
+        # 2. Define o ano corrente do sistema como alvo padrão (Ex: 2026)
+        ano_alvo = str(datetime.now().year)
+
+        # 3. Se o usuário passou um filtro de mês/ano, extrai o ano escolhido
+        if target_month and "/" in target_month:
+            try:
+                ano_alvo = target_month.split("/")[-1].strip()
+            except IndexError:
+                pass
+
+        # 4. Monta o nome dinâmico esperado para a aba
+        aba_esperada = f"Gas_{ano_alvo}"
+
+        # 5. Fallback de Segurança: Se a aba calculada não existir, usa a primeira disponível
+        if aba_esperada in abas_disponiveis:
+            return aba_esperada
+        # Ensure aba_final is always a string (sheet names can sometimes be non-str)
+        aba_final = str(abas_disponiveis[0]) if abas_disponiveis else "Sheet1"
+        logger.warning("⚠️ Aba '%s' não encontrada. Utilizando fallback: '%s'", aba_esperada, aba_final)
+        return aba_final
+
+    def _build_records(self, formatted_df: pd.DataFrame) -> Tuple[List[dict], str]:
+        """
+        Turn the formatted rows into the records of the API contract, plus the
+        first reading date found.
+        """
+        gas_data = []
+        target_date: str = ""
+
+        for index, row in formatted_df.iterrows():
+            try:
+                data_leitura = str(row.get("Data Leitura", "") or "").strip()
+                apartamento = str(row.get("Apartamento", "") or "").strip()
+                if not data_leitura or data_leitura.lower() == "data leitura":
+                    continue
+                if not apartamento or apartamento.lower() == "apartamento":
+                    continue
+
+                # Forçamos as chaves a corresponderem exatamente ao modelo Pydantic esperado pelo FastAPI
+                item = {
+                    "data_leitura": data_leitura,
+                    "apartamento": apartamento,
+                    "leitura_atual": self._safe_float_convert(
+                        row.get("Leitura atual", 0)
+                    ),
+                    "consumo_m3": self._safe_float_convert(
+                        row.get("Consumo(m³)", 0)
+                    ),
+                    "calculo": self._safe_float_convert(row.get("Cálculo", 0)),
+                    "valor_final_rs": round(
+                        self._safe_float_convert(row.get("Valor final(R$)", 0)), 2
+                    ),
+                }
+                gas_data.append(item)
+                if not target_date and data_leitura:
+                    target_date = data_leitura
+            except (TypeError, ValueError) as row_error:
+                logger.warning("Skipping row %s due to error: %s", index, row_error, extra=SAMPLED)
+                continue
+        return gas_data, target_date
+
     def _safe_float_convert(self, value) -> float:
         """
         Safely convert value to float, handling various edge cases.
@@ -150,7 +175,7 @@ class ExcelService:  # pylint: disable=too-few-public-methods
             try:
                 return float(value)
             except ValueError:
-                print(f"Warning: Could not convert '{value}' to float, using 0.0")
+                logger.warning("Could not convert '%s' to float, using 0.0", value, extra=SAMPLED)
                 return 0.0
         return 0.0
 
@@ -160,8 +185,8 @@ class ExcelService:  # pylint: disable=too-few-public-methods
         """
         df = df.loc[:, ~df.columns.str.contains("^Unnamed")].copy()
         df = df.dropna(how="all")
-        print(f"After cleanup, columns: {list(df.columns)}")
-        print(f"After cleanup, shape: {df.shape}")
+        logger.debug("After cleanup, columns: %s", lazy(lambda: list(df.columns)))
+        logger.debug("After cleanup, shape: %s", df.shape)
 
         if "Data Leitura" in df.columns:
             try:
@@ -174,7 +199,7 @@ class ExcelService:  # pylint: disable=too-few-public-methods
                         lambda x: x.strftime("%d/%m/%Y") if pd.notnull(x) else ""
                     )
             except (ValueError, TypeError) as e:
-                print(f"Warning: Error formatting date column: {e}")
+                logger.warning("Error formatting date column: %s", e)
 
         numeric_columns = ["Leitura atual", "Consumo(m³)", "Cálculo", "Valor final(R$)"]
         for col in numeric_columns:
@@ -187,7 +212,7 @@ class ExcelService:  # pylint: disable=too-few-public-methods
                     else:
                         df[col] = df[col].round(4)
                 except (ValueError, TypeError) as e:
-                    print(f"Warning: Error formatting column {col}: {e}")
+                    logger.warning("Error formatting column %s: %s", col, e)
                     df[col] = 0
         return df
 
@@ -196,7 +221,7 @@ class ExcelService:  # pylint: disable=too-few-public-methods
         Filter dataframe by specific month.
         """
         if "Data Leitura" not in df.columns:
-            print("Warning: No 'Data Leitura' column found for month filtering.")
+            logger.warning("No 'Data Leitura' column found for month filtering.")
             return df
         try:
             if "/" in target_month:
@@ -205,7 +230,7 @@ class ExcelService:  # pylint: disable=too-few-public-methods
                 month = target_month.zfill(2)
                 year = str(datetime.now().year)
                 
-            print(f"Filtering for month: {month}/{year}")
+            logger.debug("Filtering for month: %s/%s", month, year)
             filtered_df = df.copy()
             
             filtered_df["Data_Leitura_Date"] = pd.to_datetime(
@@ -230,26 +255,28 @@ class ExcelService:  # pylint: disable=too-few-public-methods
                 else:
                     result_df = filtered_df.iloc[0:0].copy()
             else:
-                print(
-                    "Warning: 'Data_Leitura_Date' is not datetime64, skipping month filter."
+                logger.warning(
+                    "'Data_Leitura_Date' is not datetime64, skipping month filter."
                 )
                 result_df = filtered_df.copy()
                 
             if "Data_Leitura_Date" in result_df.columns:
                 result_df = result_df.drop("Data_Leitura_Date", axis=1)
                 
-            print(f"Found {len(result_df)} records for {month}/{year}")
+            logger.info("Found %d records for %s/%s", len(result_df), month, year)
             if len(result_df) == 0:
-                available_dates = filtered_df["Data Leitura"].dropna().unique()
-                print(
-                    f"No data found for {month}/{year}. Available dates: {list(available_dates)[:10]}..."
+                logger.info(
+                    "No data found for %s/%s. Available dates: %s...",
+                    month,
+                    year,
+                    lazy(lambda: list(filtered_df["Data Leitura"].dropna().unique())[:10]),
                 )
             return result_df
         except (ValueError, TypeError) as e:
             match e:
                 case ValueError() as ve:
-                    print(f"Value error filtering by month: {ve}")
+                    logger.warning("Value error filtering by month: %s", ve)
                 case TypeError() as te:
-                    print(f"Type error filtering by month: {te}")
+                    logger.warning("Type error filtering by month: %s", te)
             return df
         
\ No newline at end of file
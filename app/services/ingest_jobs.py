@@ -0,0 +1,204 @@
+"""
+Background processing of uploaded workbooks.
+
+An upload becomes a job that runs ExcelService in a worker thread while the
+request returns the job id at once. Status, result and progress events (see
+app.services.progress) can be fetched by id. Finished results stay available
+for a TTL; resubmitting the same content with the same month filter within
+that window returns the existing job, so a client retrying after a timeout
+never repeats the parse. Concurrent parses of the same content and month,
+from jobs or the synchronous routes, are coalesced into one (parse_workbook).
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Set
+
+from app.services.log import get_logger
+from app.services.profiling import run_profiled
+from app.services.progress import ProgressHub, progress_hub
+from app.services.single_flight import ingest_flight
+
+logger = get_logger(__name__)
+
+# Tempo em que resultados (e falhas) continuam disponíveis para consulta
+RESULT_TTL_S = float(os.getenv("WHATSAPP_INGEST_RESULT_TTL_S", "3600"))
+
+# Planilhas processadas em paralelo (threads)
+INGEST_WORKERS = int(os.getenv("WHATSAPP_INGEST_WORKERS", "2"))
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def ingest_key(content: bytes, target_month: Optional[str]) -> str:
+    """Identity of an ingest request: content hash plus the month filter."""
+    digest = hashlib.sha256(content).hexdigest()
+    return f"{digest}:{(target_month or '').strip()}"
+
+
+def _process_excel(content: bytes, target_month: Optional[str]) -> Dict[str, Any]:
+    """Parse in the worker thread; pandas is imported there on first use."""
+    from app.services.excel_service import ExcelService  # pylint: disable=import-outside-toplevel
+
+    return ExcelService().process_excel_content(content, target_month)
+
+
+async def parse_workbook(content: bytes, target_month: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run ExcelService in a worker thread. Identical requests in flight share
+    one parse, profiled along with the request that started it.
+    """
+    return await ingest_flight.run(
+        ingest_key(content, target_month),
+        lambda: asyncio.to_thread(run_profiled, _process_excel, content, target_month),
+    )
+
+
+@dataclass
+class IngestJob:
+    """One uploaded workbook and the outcome of its processing."""
+
+    job_id: str
+    key: str
+    filename: str
+    target_month: Optional[str]
+    size: int
+    status: str = STATUS_QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    def expired(self, ttl: float, now: float) -> bool:
+        """Whether a finished job is past its retention time."""
+        return self.finished_at is not None and now - self.finished_at > ttl
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Status view of the job, without the result rows."""
+        duration = None
+        if self.started_at is not None and self.finished_at is not None:
+            duration = round(self.finished_at - self.started_at, 3)
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "filename": self.filename,
+            "target_month": self.target_month,
+            "size_bytes": self.size,
+            "duration_s": duration,
+            "records": len(self.result.get("data", [])) if self.result else None,
+            "error": self.error,
+        }
+
+
+class IngestJobManager:
+    """Runs ingest jobs in threads and keeps their results for a TTL."""
+
+    def __init__(
+        self,
+        ttl: float = RESULT_TTL_S,
+        workers: int = INGEST_WORKERS,
+        progress: ProgressHub = progress_hub,
+    ) -> None:
+        """The concurrency limit is created on the first submit."""
+        self.ttl = ttl
+        self.workers = max(1, workers)
+        self.progress = progress
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._by_key: Dict[str, str] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.submitted = 0
+        self.reused = 0
+
+    def submit(self, content: bytes, filename: str, target_month: Optional[str]) -> IngestJob:
+        """
+        Start processing a workbook and return its job. A live job for the
+        same content and month is returned instead of parsing again.
+        """
+        self._purge()
+        key = ingest_key(content, target_month)
+        existente = self._jobs.get(self._by_key.get(key, ""))
+        if existente is not None and existente.status != STATUS_FAILED:
+            self.reused += 1
+            logger.info("📥 [Ingest] Reutilizando job %s (%s)", existente.job_id, existente.status)
+            return existente
+
+        job = IngestJob(
+            job_id=uuid.uuid4().hex,
+            key=key,
+            filename=filename,
+            target_month=target_month,
+            size=len(content),
+        )
+        self._jobs[job.job_id] = job
+        self._by_key[key] = job.job_id
+        self.submitted += 1
+        self.progress.open(job.job_id)
+        self.progress.emit(job.job_id, STATUS_QUEUED, {"filename": filename})
+
+        task = asyncio.create_task(self._run(job, content), name=f"ingest-{job.job_id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        logger.info("📥 [Ingest] Job %s enfileirado: %s (%s bytes)", job.job_id, filename, len(content))
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        """Look up a job; expired ones are gone."""
+        self._purge()
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: IngestJob, content: bytes) -> None:
+        """Parse the workbook off the event loop, bounded by the worker count."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        async with self._slots:
+            job.status = STATUS_RUNNING
+            job.started_at = time.time()
+            self.progress.emit(job.job_id, STATUS_RUNNING, {})
+            try:
+                job.result = await parse_workbook(content, job.target_month)
+                job.status = STATUS_DONE
+                self.progress.emit(
+                    job.job_id, STATUS_DONE, {"records": len(job.result.get("data", []))}
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                job.status = STATUS_FAILED
+                job.error = str(e)
+                self.progress.emit(job.job_id, STATUS_FAILED, {"error": job.error})
+                logger.error("❌ [Ingest] Job %s falhou: %s", job.job_id, e)
+            finally:
+                job.finished_at = time.time()
+                self.progress.close(job.job_id)
+
+    def _purge(self) -> None:
+        """Forget finished jobs past the TTL."""
+        now = time.time()
+        for job_id in [jid for jid, job in self._jobs.items() if job.expired(self.ttl, now)]:
+            job = self._jobs.pop(job_id)
+            if self._by_key.get(job.key) == job_id:
+                del self._by_key[job.key]
+
+    async def stop(self) -> None:
+        """Cancel jobs still running (on shutdown)."""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Job counts by status, jobs started and submissions that reused a job."""
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"jobs": counts, "submitted": self.submitted, "reused": self.reused, "ttl_s": self.ttl}
+
+
+ingest_jobs = IngestJobManager()
@@ -5,10 +5,14 @@ from typing import Optional
 
 import pandas as pd
 
+from app.services.log import get_logger, lazy
+
+logger = get_logger(__name__)
+
 
 async def format_message_with_styles(data: pd.DataFrame, target_date: str) -> str:
     """Format dataframe records into a clean, structured WhatsApp message."""
-    print(f"DataFrame columns received by backend: {list(data.columns)}")
+    logger.debug("DataFrame columns received by backend: %s", lazy(lambda: list(data.columns)))
 
     # Normaliza o nome das colunas eliminando espaços e aplicando letras minúsculas
     data = data.rename(columns=lambda x: x.strip().lower().replace(" ", "_"))
@@ -90,5 +94,5 @@ async def format_message_with_styles(data: pd.DataFrame, target_date: str) -> st
         return emoji_pattern.sub(r"", text)
 
     clean_message = remove_emojis(message)
-    print(f"✅ Message formatted successfully. Total length: {len(clean_message)}")
+    logger.info("✅ Message formatted successfully. Total length: %d", len(clean_message))
     return clean_message
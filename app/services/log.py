@@ -0,0 +1,110 @@
+"""
+Structured, level-gated logging for the backend.
+
+Modules log through ``get_logger(__name__)``, a standard library logger
+below the ``app`` logger, which is configured once from the environment:
+
+- WHATSAPP_LOG_LEVEL: DEBUG, INFO (default), WARNING or ERROR;
+- WHATSAPP_LOG_FORMAT: ``text`` (default, one line per record) or ``json``
+  (one object per line with time, level, logger, message and extra fields);
+- WHATSAPP_LOG_SAMPLE_RATE: fraction (0-1) of hot-path records that are kept.
+  Only DEBUG/INFO records logged with ``extra=SAMPLED`` are sampled; warnings
+  and errors always go through.
+
+Messages use ``%`` arguments, so they are only formatted when the record is
+emitted. Expensive dumps (DataFrame heads, column lists) go through
+``lazy(fn)`` and are never built when their level is disabled.
+"""
+
+import json
+import logging
+import os
+import random
+import sys
+import time
+from typing import Any, Callable, Dict
+
+LOG_LEVEL = os.getenv("WHATSAPP_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("WHATSAPP_LOG_FORMAT", "text").lower()
+LOG_SAMPLE_RATE = float(os.getenv("WHATSAPP_LOG_SAMPLE_RATE", "1.0"))
+
+# extra= dos registros de caminho quente sujeitos à amostragem
+SAMPLED: Dict[str, Any] = {"sampled": True}
+
+# Atributos padrão de LogRecord (o restante vem de extra= e vai para o JSON)
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_configured = False
+
+
+class lazy:  # pylint: disable=invalid-name,too-few-public-methods
+    """Defers an expensive value until the record is actually formatted."""
+
+    __slots__ = ("_fn",)
+
+    def __init__(self, fn: Callable[[], Any]) -> None:
+        self._fn = fn
+
+    def __str__(self) -> str:
+        return str(self._fn())
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the DEBUG/INFO records marked with ``extra=SAMPLED``."""
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = max(0.0, min(1.0, rate))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False) or record.levelno >= logging.WARNING:
+            return True
+        return self.rate >= 1.0 or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, extra= fields included."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and key != "sampled":
+                data[key] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def configure_logging(
+    level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, sample_rate: float = LOG_SAMPLE_RATE
+) -> None:
+    """(Re)configure the ``app`` logger; called on the first get_logger()."""
+    global _configured  # pylint: disable=global-statement
+    logger = logging.getLogger("app")
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    # stdout, como os print() de antes
+    handler = logging.StreamHandler(sys.stdout)
+    if fmt == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(message)s", "%H:%M:%S"))
+    handler.addFilter(SamplingFilter(sample_rate))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    _configured = True
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for a module of the backend (``__name__``)."""
+    if not _configured:
+        configure_logging()
+    return logging.getLogger(name if name.startswith("app") else f"app.{name}")
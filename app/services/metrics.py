@@ -0,0 +1,276 @@
+"""
+Prometheus metrics of the API.
+
+Counters and histograms are kept in process and rendered in the Prometheus
+text exposition format (0.0.4) at GET /metrics, without a client library.
+The request middleware in app.main records per-route counts and latency.
+The services observe their own stage timings: workbook ingest stages,
+message rendering, WhatsApp sends and automation spans. Queue depths and
+cache hit/miss counts already exist in each service's stats(); app.main reads
+them at scrape time and renders them along with the registry.
+"""
+
+import abc
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Limites (segundos) dos histogramas de latência
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+# Envios levam de segundos a minutos (navegação, ticks, resposta do bot)
+SEND_BUCKETS: Tuple[float, ...] = (0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+# Content-Type do formato texto do Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+# (labels, valor) de uma amostra coletada na leitura
+Sample = Tuple[Dict[str, str], float]
+# (nome, tipo, ajuda, amostras) de uma família lida na coleta
+Family = Tuple[str, str, str, List[Sample]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pares = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric(abc.ABC):
+    """Name, help text and label names shared by counters and histograms."""
+
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        # Observações chegam do loop da API, do loop de automação e de threads
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {sorted(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    @abc.abstractmethod
+    def render(self) -> List[str]:
+        """Exposition lines of the metric's samples."""
+
+
+class Counter(_Metric):
+    """Monotonic counter per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help_text, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Add ``amount`` to the counter of the label set."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(v)}" for key, v in items]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram per label set (values in seconds)."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # contagens por bucket (não cumulativas) e soma
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record one observation."""
+        key = self._key(labels)
+        index = next(i for i, limite in enumerate(self.buckets) if value <= limite)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * len(self.buckets), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the block (also when it raises)."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - inicio, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(c), s[0])) for key, (c, s) in self._values.items())
+        linhas: List[str] = []
+        for key, (counts, soma) in items:
+            acumulado = 0
+            for limite, count in zip(self.buckets, counts):
+                acumulado += count
+                le = f'le="{_number(limite)}"'
+                linhas.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {acumulado}")
+            linhas.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(soma)}")
+            linhas.append(f"{self.name}_count{_labels(self.labelnames, key)} {acumulado}")
+        return linhas
+
+
+class MetricsRegistry:
+    """Owns the metrics of the process and renders them for a scrape."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Create and register a counter."""
+        metric = Counter(name, help_text, labelnames)
+        self._register(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None,
+    ) -> Histogram:
+        """Create and register a histogram."""
+        metric = Histogram(name, help_text, labelnames, buckets or LATENCY_BUCKETS)
+        self._register(metric)
+        return metric
+
+    def render(self, extra: Sequence[Family] = ()) -> str:
+        """The registry plus ``extra`` families read at scrape time, in the Prometheus text format."""
+        linhas: List[str] = []
+        for metric in self._metrics.values():
+            linhas += [f"# HELP {metric.name} {metric.help}", f"# TYPE {metric.name} {metric.kind}"]
+            linhas += metric.render()
+        for name, kind, help_text, samples in extra:
+            linhas += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                linhas.append(f"{name}{_labels(list(labels), list(labels.values()))} {_number(value)}")
+        return "\n".join(linhas) + "\n"
+
+
+def _route_template(scope: Dict[str, Any]) -> str:
+    """Template of the matched route including the prefix it was included under."""
+    route = scope.get("route")
+    template = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    regex = getattr(route, "path_regex", None)
+    path = scope.get("path", "")
+    if regex is None or regex.match(path):
+        return template
+    # Versões recentes do FastAPI guardam a rota do APIRouter sem o prefixo do
+    # include_router: o prefixo é a parte do caminho antes do trecho que casa
+    for i, char in enumerate(path):
+        if char == "/" and i and regex.match(path[i:]):
+            return path[:i] + template
+    return template
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware counting requests and timing them up to the response
+    headers (streams such as SSE are not held open in the histogram). Routes
+    are labelled by their template, e.g. /api/v1/upload-excel/jobs/{job_id}.
+    """
+
+    def __init__(self, app: Callable[..., Awaitable[None]]) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        inicio = time.perf_counter()
+        registrado = False
+
+        def registrar(status: int) -> None:
+            nonlocal registrado
+            registrado = True
+            route = _route_template(scope)
+            HTTP_LATENCY.observe(time.perf_counter() - inicio, method=scope["method"], route=route)
+            HTTP_REQUESTS.inc(method=scope["method"], route=route, status=str(status))
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start" and not registrado:
+                registrar(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not registrado:
+                registrar(500)
+
+
+metrics = MetricsRegistry()
+
+HTTP_REQUESTS = metrics.counter(
+    "whatsapp_http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status")
+)
+HTTP_LATENCY = metrics.histogram(
+    "whatsapp_http_request_duration_seconds",
+    "Time to produce the response headers, by route template.",
+    ("method", "route"),
+)
+INGEST_STAGE = metrics.histogram(
+    "whatsapp_ingest_stage_duration_seconds",
+    "ExcelService stages: open, sheet_resolve, read, format, filter, records.",
+    ("stage",),
+)
+RENDER_LATENCY = metrics.histogram(
+    "whatsapp_message_render_duration_seconds", "Rendering of the WhatsApp report message."
+)
+SEND_LATENCY = metrics.histogram(
+    "whatsapp_send_duration_seconds",
+    "WhatsApp dialogue after the scheduler grant, by engine and outcome.",
+    ("engine", "outcome"),
+    buckets=SEND_BUCKETS,
+)
+SCHEDULER_WAIT = metrics.histogram(
+    "whatsapp_scheduler_wait_seconds", "Wait for the rate scheduler grant of a send.", buckets=SEND_BUCKETS
+)
+AUTOMATION_SPAN = metrics.histogram(
+    "whatsapp_automation_span_duration_seconds",
+    "Automation timeline spans (launch, navigation, dialogue steps...).",
+    ("span",),
+    buckets=SEND_BUCKETS,
+)
@@ -0,0 +1,446 @@
+"""
+Durable SQLite outbox for WhatsApp deliveries.
+
+Every report is recorded before the browser touches it, keyed by an
+idempotency key derived from the phone number and a hash of the content.
+State transitions (queued -> sending -> sent | failed) survive uvicorn
+restarts and Chromium crashes, failed deliveries are retried with exponential
+backoff, and a row confirmed as sent is never sent again. A row found in
+``sending`` after a crash may or may not have reached the chat, so it is
+parked as ``unknown`` until an operator resolves it instead of being resent.
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.services.log import get_logger
+
+logger = get_logger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+OUTBOX_DB = Path(os.getenv("WHATSAPP_OUTBOX_DB", str(BASE_DIR / "whatsapp_outbox.sqlite3")))
+
+# Política de novas tentativas
+MAX_ATTEMPTS = int(os.getenv("WHATSAPP_OUTBOX_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE_S = float(os.getenv("WHATSAPP_OUTBOX_BACKOFF_BASE_S", "30"))
+BACKOFF_MAX_S = float(os.getenv("WHATSAPP_OUTBOX_BACKOFF_MAX_S", "3600"))
+
+# Varredura de mensagens pendentes pelo dispatcher
+POLL_INTERVAL_S = float(os.getenv("WHATSAPP_OUTBOX_POLL_INTERVAL_S", "5"))
+DISPATCH_BATCH_SIZE = int(os.getenv("WHATSAPP_OUTBOX_BATCH_SIZE", "20"))
+
+STATE_QUEUED = "queued"
+STATE_SENDING = "sending"
+STATE_SENT = "sent"
+STATE_FAILED = "failed"
+# Interrompido sem confirmação: pode ter chegado ao chat; só um operador decide
+STATE_UNKNOWN = "unknown"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    phone TEXT NOT NULL,
+    message TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 5,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due
+    ON outbox (state, next_attempt_at, priority);
+"""
+
+
+def make_idempotency_key(phone: str, message: str) -> str:
+    """Derive the idempotency key from the phone number and a content hash."""
+    content_hash = hashlib.sha256(message.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{phone}:{content_hash}".encode("utf-8")).hexdigest()
+
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with jitter for the given number of failed attempts."""
+    delay = min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** max(0, attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+@dataclass
+class OutboxEntry:
+    """One row of the outbox."""
+
+    id: int
+    idempotency_key: str
+    phone: str
+    message: str
+    priority: int
+    state: str
+    attempts: int
+    next_attempt_at: Optional[float]
+    last_error: Optional[str]
+
+    @property
+    def retry_scheduled(self) -> bool:
+        """Whether the dispatcher will attempt this row again on its own."""
+        return self.state in (STATE_QUEUED, STATE_FAILED) and self.next_attempt_at is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Public view of the row, without the message body."""
+        return {
+            "id": self.id,
+            "phone": self.phone,
+            "priority": self.priority,
+            "state": self.state,
+            "attempts": self.attempts,
+            "retry_scheduled": self.retry_scheduled,
+            "next_attempt_at": self.next_attempt_at,
+            "last_error": self.last_error,
+        }
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "OutboxEntry":
+        """Build an entry from a sqlite row."""
+        return cls(
+            id=row["id"],
+            idempotency_key=row["idempotency_key"],
+            phone=row["phone"],
+            message=row["message"],
+            priority=row["priority"],
+            state=row["state"],
+            attempts=row["attempts"],
+            next_attempt_at=row["next_attempt_at"],
+            last_error=row["last_error"],
+        )
+
+
+class Outbox:
+    """
+    Thread-safe access to the outbox table. The synchronous methods are short
+    indexed statements; async callers go through the ``a*`` wrappers, which
+    run them in a worker thread so the event loop never blocks on disk.
+    """
+
+    def __init__(self, db_path: Path = OUTBOX_DB, max_attempts: int = MAX_ATTEMPTS) -> None:
+        """Open (or create) the database in WAL mode."""
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the connection lazily, on first use."""
+        if self._conn is None:
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _get(self, conn: sqlite3.Connection, key: str) -> Optional[OutboxEntry]:
+        row = conn.execute(
+            "SELECT * FROM outbox WHERE idempotency_key = ?", (key,)
+        ).fetchone()
+        return OutboxEntry.from_row(row) if row else None
+
+    def _by_id(self, conn: sqlite3.Connection, entry_id: int) -> Optional[OutboxEntry]:
+        row = conn.execute("SELECT * FROM outbox WHERE id = ?", (entry_id,)).fetchone()
+        return OutboxEntry.from_row(row) if row else None
+
+    def get(self, entry_id: int) -> Optional[OutboxEntry]:
+        """Current state of a row, without claiming it."""
+        with self._lock:
+            return self._by_id(self._connection(), entry_id)
+
+    def begin(self, phone: str, message: str, priority: int = 5) -> Tuple[OutboxEntry, bool]:
+        """
+        Record a delivery and claim it for sending, atomically.
+
+        Returns the entry and whether it was claimed (state ``sending``). An
+        unclaimed entry was already sent to this phone, is in flight or is
+        awaiting an operator (``unknown``).
+        """
+        key = make_idempotency_key(phone, message)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                entry = self._get(conn, key)
+                if entry is None:
+                    conn.execute(
+                        "INSERT INTO outbox (idempotency_key, phone, message, priority, state,"
+                        " created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (key, phone, message, priority, STATE_SENDING, now, now),
+                    )
+                elif entry.state in (STATE_QUEUED, STATE_FAILED):
+                    # Um envio explícito antecipa a próxima tentativa agendada
+                    conn.execute(
+                        "UPDATE outbox SET state = ?, updated_at = ? WHERE id = ?",
+                        (STATE_SENDING, now, entry.id),
+                    )
+                else:
+                    conn.execute("COMMIT")
+                    return entry, False
+                claimed = self._get(conn, key)
+                conn.execute("COMMIT")
+                assert claimed is not None
+                return claimed, True
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def claim(self, entry_id: int) -> Optional[OutboxEntry]:
+        """Move a queued/failed row to ``sending`` if nobody else claimed it."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.execute(
+                "UPDATE outbox SET state = ?, updated_at = ? WHERE id = ? AND state IN (?, ?)",
+                (STATE_SENDING, now, entry_id, STATE_QUEUED, STATE_FAILED),
+            )
+            if cursor.rowcount != 1:
+                return None
+            return self._by_id(conn, entry_id)
+
+    def mark_sent(self, entry_id: int) -> Optional[OutboxEntry]:
+        """Record a confirmed delivery and return the row. Sent rows are never picked again."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "UPDATE outbox SET state = ?, attempts = attempts + 1, next_attempt_at = NULL,"
+                " last_error = NULL, sent_at = ?, updated_at = ? WHERE id = ?",
+                (STATE_SENT, now, now, entry_id),
+            )
+            return self._by_id(conn, entry_id)
+
+    def mark_failed(self, entry_id: int, error: str) -> Optional[OutboxEntry]:
+        """
+        Record a failed attempt, schedule the retry with backoff and return
+        the row (``retry_scheduled`` is False once the attempts run out).
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT attempts FROM outbox WHERE id = ?", (entry_id,)).fetchone()
+            attempts = (row["attempts"] if row else 0) + 1
+            next_attempt_at: Optional[float] = None
+            if attempts < self.max_attempts:
+                next_attempt_at = now + backoff_delay(attempts)
+            conn.execute(
+                "UPDATE outbox SET state = ?, attempts = ?, next_attempt_at = ?,"
+                " last_error = ?, updated_at = ? WHERE id = ?",
+                (STATE_FAILED, attempts, next_attempt_at, error[:500], now, entry_id),
+            )
+            return self._by_id(conn, entry_id)
+
+    def due(self, limit: int = DISPATCH_BATCH_SIZE) -> List[int]:
+        """Ids of queued/failed rows whose next attempt is due, by priority."""
+        now = time.time()
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT id FROM outbox WHERE state IN (?, ?) AND next_attempt_at IS NOT NULL"
+                " AND next_attempt_at <= ? ORDER BY priority, next_attempt_at LIMIT ?",
+                (STATE_QUEUED, STATE_FAILED, now, limit),
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def recover(self) -> int:
+        """
+        Park rows left in ``sending`` by a crash as ``unknown``. The crash may
+        have happened after the report reached the chat but before mark_sent,
+        so they are not resent automatically; an operator checks the chat and
+        calls resolve(). Confirmed rows are untouched.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._connection().execute(
+                "UPDATE outbox SET state = ?, next_attempt_at = NULL, last_error = ?, updated_at = ?"
+                " WHERE state = ?",
+                (STATE_UNKNOWN, "Interrompido antes da confirmação; verifique o chat.", now, STATE_SENDING),
+            )
+            return cursor.rowcount
+
+    def unknown(self, limit: int = 100) -> List[OutboxEntry]:
+        """Rows awaiting an operator decision, oldest first."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT * FROM outbox WHERE state = ? ORDER BY updated_at LIMIT ?",
+                (STATE_UNKNOWN, limit),
+            ).fetchall()
+        return [OutboxEntry.from_row(row) for row in rows]
+
+    def resolve(self, entry_id: int, delivered: bool) -> Optional[OutboxEntry]:
+        """
+        Settle an ``unknown`` row: mark it sent when the report is in the chat,
+        or queue it for an immediate retry when it is not. Returns None when
+        the row is not awaiting review.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            if delivered:
+                cursor = conn.execute(
+                    "UPDATE outbox SET state = ?, last_error = NULL, sent_at = ?, updated_at = ?"
+                    " WHERE id = ? AND state = ?",
+                    (STATE_SENT, now, now, entry_id, STATE_UNKNOWN),
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE outbox SET state = ?, next_attempt_at = ?, updated_at = ?"
+                    " WHERE id = ? AND state = ?",
+                    (STATE_QUEUED, now, now, entry_id, STATE_UNKNOWN),
+                )
+            if cursor.rowcount != 1:
+                return None
+            return self._by_id(conn, entry_id)
+
+    def stats(self) -> Dict[str, Any]:
+        """Row counts per state and the number of retries currently due."""
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute(
+                "SELECT state, COUNT(*) AS total FROM outbox GROUP BY state"
+            ).fetchall()
+            due = conn.execute(
+                "SELECT COUNT(*) AS total FROM outbox WHERE state IN (?, ?)"
+                " AND next_attempt_at IS NOT NULL AND next_attempt_at <= ?",
+                (STATE_QUEUED, STATE_FAILED, time.time()),
+            ).fetchone()
+        counts = {STATE_QUEUED: 0, STATE_SENDING: 0, STATE_SENT: 0, STATE_FAILED: 0, STATE_UNKNOWN: 0}
+        counts.update({row["state"]: row["total"] for row in rows})
+        return {"counts": counts, "due": due["total"]}
+
+    # Wrappers assíncronos: o SQLite roda fora do loop de eventos
+    async def abegin(
+        self, phone: str, message: str, priority: int = 5
+    ) -> Tuple[OutboxEntry, bool]:
+        """Async version of begin()."""
+        return await asyncio.to_thread(self.begin, phone, message, priority)
+
+    async def aclaim(self, entry_id: int) -> Optional[OutboxEntry]:
+        """Async version of claim()."""
+        return await asyncio.to_thread(self.claim, entry_id)
+
+    async def amark_sent(self, entry_id: int) -> Optional[OutboxEntry]:
+        """Async version of mark_sent()."""
+        return await asyncio.to_thread(self.mark_sent, entry_id)
+
+    async def amark_failed(self, entry_id: int, error: str) -> Optional[OutboxEntry]:
+        """Async version of mark_failed()."""
+        return await asyncio.to_thread(self.mark_failed, entry_id, error)
+
+    async def aget(self, entry_id: int) -> Optional[OutboxEntry]:
+        """Async version of get()."""
+        return await asyncio.to_thread(self.get, entry_id)
+
+    async def aresolve(self, entry_id: int, delivered: bool) -> Optional[OutboxEntry]:
+        """Async version of resolve()."""
+        return await asyncio.to_thread(self.resolve, entry_id, delivered)
+
+
+SendEntry = Callable[[OutboxEntry], Awaitable[bool]]
+# Recebe a linha depois de cada tentativa do dispatcher (enviada ou falha)
+OutcomeListener = Callable[[OutboxEntry], None]
+
+
+class OutboxDispatcher:
+    """
+    Background task that retries due outbox rows. Listeners are told the
+    outcome of every retry, so whoever reported the first failure (a batch
+    job) can report the final state too.
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        send_entry: SendEntry,
+        poll_interval: float = POLL_INTERVAL_S,
+        batch_size: int = DISPATCH_BATCH_SIZE,
+    ) -> None:
+        """Initialize the dispatcher; it starts with start()."""
+        self.outbox = outbox
+        self.send_entry = send_entry
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._listeners: List[OutcomeListener] = []
+
+    def add_listener(self, listener: OutcomeListener) -> None:
+        """Call ``listener`` (on the dispatcher's loop) with the row after each retry."""
+        self._listeners.append(listener)
+
+    async def start(self) -> None:
+        """Park interrupted rows for review and start polling for due retries."""
+        if self._task is not None:
+            return
+        recovered = await asyncio.to_thread(self.outbox.recover)
+        if recovered:
+            logger.warning(
+                "📮 [Outbox] ⚠️ %s envios interrompidos sem confirmação aguardam revisão (estado unknown)",
+                recovered,
+            )
+        self._task = asyncio.create_task(self._run(), name="whatsapp-outbox-dispatcher")
+
+    async def stop(self) -> None:
+        """Stop polling. In-flight rows are parked for review on the next start."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        """Claim due rows and deliver them concurrently, batch by batch."""
+        while True:
+            try:
+                ids = await asyncio.to_thread(self.outbox.due, self.batch_size)
+                claimed = [e for e in [await self.outbox.aclaim(i) for i in ids] if e]
+                if claimed:
+                    await asyncio.gather(*(self._deliver(e) for e in claimed))
+                    continue
+            except sqlite3.Error as e:
+                logger.error("📮 [Outbox] ❌ Erro ao consultar o outbox: %s", e)
+            await asyncio.sleep(self.poll_interval)
+
+    async def _deliver(self, entry: OutboxEntry) -> None:
+        """Send one claimed row and record the outcome."""
+        logger.info("📮 [Outbox] Nova tentativa #%s para %s", entry.attempts + 1, entry.phone)
+        try:
+            sucesso = await self.send_entry(entry)
+        except Exception as e:  # pylint: disable=broad-except
+            atualizado = await self.outbox.amark_failed(entry.id, str(e) or type(e).__name__)
+        else:
+            if sucesso:
+                atualizado = await self.outbox.amark_sent(entry.id)
+            else:
+                atualizado = await self.outbox.amark_failed(entry.id, "A automação não concluiu o envio.")
+        if atualizado is None:
+            return
+        for listener in self._listeners:
+            try:
+                listener(atualizado)
+            except Exception as e:  # pylint: disable=broad-except
+                logger.error("📮 [Outbox] ❌ Erro ao notificar o resultado de #%s: %s", entry.id, e)
+
+
+outbox = Outbox()
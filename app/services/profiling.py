@@ -0,0 +1,276 @@
+"""
+On-demand cProfile of a single API request.
+
+Disabled unless WHATSAPP_PROFILE_TOKEN is set; the middleware is then added
+by app.main and a request is profiled only when it carries the token in the
+``X-Profile-Token`` header or the ``profile`` query parameter. Unprofiled
+requests pay one header lookup; with the token unset nothing is installed.
+
+A session profiles the event loop thread (routes,
+format_message_with_styles). Work offloaded through ``run_profiled``
+(ExcelService parses) is covered by that same profiler on Python 3.12+,
+where cProfile is interpreter-wide, and by a per-thread profiler on older
+versions. The session travels in a ContextVar, which asyncio tasks and
+``asyncio.to_thread`` inherit. The merged stats are written as a ``.prof``
+file (pstats/snakeviz) in WHATSAPP_PROFILE_DIR, keeping the newest
+WHATSAPP_PROFILE_RETENTION.
+
+Only one request is profiled at a time: the loop profiler also records
+whatever else the loop runs meanwhile, and a second one would replace it.
+"""
+
+import asyncio
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+from urllib.parse import parse_qs
+
+from app.services.log import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Segredo do administrador; vazio desativa o profiling por completo
+PROFILE_TOKEN = os.getenv("WHATSAPP_PROFILE_TOKEN", "")
+
+# Onde os perfis (.prof) são gravados e quantos são mantidos
+PROFILE_DIR = Path(os.getenv("WHATSAPP_PROFILE_DIR", str(BASE_DIR / "profiles")))
+PROFILE_RETENTION = int(os.getenv("WHATSAPP_PROFILE_RETENTION", "20"))
+
+PROFILE_HEADER = b"x-profile-token"
+PROFILE_QUERY = "profile"
+
+# Rotas de download dos perfis (app.main) nunca são perfiladas
+PROFILE_ROUTES = "/profiles"
+
+_PROFILE_ID = re.compile(r"^[0-9A-Za-z_-]+$")
+
+
+def profiling_enabled() -> bool:
+    """Whether WHATSAPP_PROFILE_TOKEN is configured."""
+    return bool(PROFILE_TOKEN)
+
+
+def token_matches(value: Optional[str]) -> bool:
+    """Constant-time comparison against the configured token."""
+    return bool(PROFILE_TOKEN) and value is not None and hmac.compare_digest(value, PROFILE_TOKEN)
+
+
+class ProfileSession:
+    """Profilers of every thread that worked on one request."""
+
+    def __init__(self, method: str, path: str) -> None:
+        self.profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        self.method = method
+        self.path = path
+        self.finished = False
+        self._profilers: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def profiler(self) -> cProfile.Profile:
+        """A new profiler registered in the session (one per thread)."""
+        profiler = cProfile.Profile()
+        self.add(profiler)
+        return profiler
+
+    def add(self, profiler: cProfile.Profile) -> None:
+        """Register a profiler whose stats go into the artifact."""
+        with self._lock:
+            self._profilers.append(profiler)
+
+    def stats(self) -> Optional[pstats.Stats]:
+        """Merged stats of every profiler, or None when nothing was recorded."""
+        with self._lock:
+            profilers = list(self._profilers)
+        merged: Optional[pstats.Stats] = None
+        for profiler in profilers:
+            try:
+                if merged is None:
+                    merged = pstats.Stats(profiler)
+                else:
+                    merged.add(profiler)
+            except TypeError:
+                # Profiler sem nenhuma chamada registrada
+                continue
+        return merged
+
+
+_active: ContextVar[Optional[ProfileSession]] = ContextVar("profile_session", default=None)
+
+
+def run_profiled(fn: Callable[..., T], *args: Any) -> T:
+    """
+    Call ``fn`` in the current (worker) thread, under a profiler of the
+    request's session when there is one.
+
+    Up to Python 3.11 cProfile hooks only the thread that enabled it, so the
+    worker gets a profiler of its own. From 3.12 cProfile sits on the
+    interpreter-wide sys.monitoring: the request's loop profiler already
+    records this thread and a second one raises ValueError, so ``fn`` just
+    runs (one profiler per request).
+    """
+    session = _active.get()
+    if session is None or session.finished:
+        return fn(*args)
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return fn(*args)
+    session.add(profiler)
+    try:
+        return fn(*args)
+    finally:
+        profiler.disable()
+
+
+class ProfileStore:
+    """Profile artifacts on disk, pruned to the newest ``retention``."""
+
+    def __init__(self, directory: Path = PROFILE_DIR, retention: int = PROFILE_RETENTION) -> None:
+        self.directory = directory
+        self.retention = retention
+
+    def path(self, profile_id: str) -> Optional[Path]:
+        """Path of an existing profile, or None (ids are never paths)."""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        destino = self.directory / f"{profile_id}.prof"
+        return destino if destino.is_file() else None
+
+    def save(self, session: ProfileSession, elapsed: float) -> Optional[Path]:
+        """Dump the merged stats of a session and apply the retention."""
+        stats = session.stats()
+        if stats is None:
+            return None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        destino = self.directory / f"{session.profile_id}.prof"
+        stats.dump_stats(str(destino))
+        logger.info(
+            "🔬 [Profile] %s %s (%.0f ms) salvo em %s",
+            session.method,
+            session.path,
+            elapsed * 1000,
+            destino,
+        )
+        self.prune()
+        return destino
+
+    def prune(self) -> None:
+        """Remove the oldest profiles beyond the retention."""
+        perfis = sorted(self.directory.glob("*.prof"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for antigo in perfis[max(self.retention, 0):]:
+            try:
+                antigo.unlink()
+            except OSError:
+                pass
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Stored profiles, newest first."""
+        if not self.directory.is_dir():
+            return []
+        perfis = sorted(self.directory.glob("*.prof"), key=lambda p: p.stat().st_mtime, reverse=True)
+        return [
+            {"profile_id": p.stem, "bytes": p.stat().st_size, "created_at": p.stat().st_mtime}
+            for p in perfis
+        ]
+
+    def report(self, profile_id: str, limit: int = 50, sort: str = "cumulative") -> Optional[str]:
+        """Text summary (pstats) of a stored profile."""
+        origem = self.path(profile_id)
+        if origem is None:
+            return None
+        saida = io.StringIO()
+        pstats.Stats(str(origem), stream=saida).strip_dirs().sort_stats(sort).print_stats(limit)
+        return saida.getvalue()
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles requests carrying the admin token and
+    answers with the artifact id in ``X-Profile-Id``.
+    """
+
+    def __init__(self, app: Callable[..., Awaitable[None]], store: Optional["ProfileStore"] = None) -> None:
+        self.app = app
+        self.store = store or profile_store
+        self._busy = False
+
+    @staticmethod
+    def _requested(scope: Dict[str, Any]) -> bool:
+        if scope["path"].startswith(PROFILE_ROUTES):
+            return False
+        for name, value in scope.get("headers", ()):
+            if name == PROFILE_HEADER:
+                return token_matches(value.decode("latin-1"))
+        query = scope.get("query_string", b"")
+        if PROFILE_QUERY.encode() in query:
+            values = parse_qs(query.decode("latin-1")).get(PROFILE_QUERY, [])
+            return any(token_matches(value) for value in values)
+        return False
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+        if self._busy:
+            # Outro perfil em andamento no loop: segue sem perfil
+            await self.app(scope, receive, self._with_headers(send, [(b"x-profile-status", b"busy")]))
+            return
+
+        self._busy = True
+        session = ProfileSession(scope["method"], scope["path"])
+        token = _active.set(session)
+        loop_profiler = session.profiler()
+        inicio = time.perf_counter()
+
+        async def finalizar() -> None:
+            if session.finished:
+                return
+            loop_profiler.disable()
+            session.finished = True
+            try:
+                await asyncio.to_thread(self.store.save, session, time.perf_counter() - inicio)
+            except OSError as err:
+                logger.warning("⚠️ [Profile] Falha ao salvar o perfil %s: %s", session.profile_id, err)
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                headers = [*message.get("headers", []), (b"x-profile-id", session.profile_id.encode())]
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                # O perfil já está no disco quando o cliente recebe o fim da resposta
+                await finalizar()
+            await send(message)
+
+        loop_profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            await finalizar()
+            _active.reset(token)
+            self._busy = False
+
+    @staticmethod
+    def _with_headers(send: Callable, extra: List[tuple]) -> Callable:
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), *extra]}
+            await send(message)
+
+        return send_wrapper
+
+
+profile_store = ProfileStore()
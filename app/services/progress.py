@@ -0,0 +1,144 @@
+"""
+Live progress of WhatsApp send jobs.
+
+The automation reports each milestone of a send (browser ready, chat open,
+every dialogue step, confirmed/failed) to a per-job channel. Events can be
+emitted from any thread (the automation loop runs in its own) and are kept
+in order with timestamps, so the API can stream them as Server-Sent Events
+while the send runs in the background.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+# Recebe o nome do marco e detalhes (telefone, tempos do passo, erro...)
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
+
+# Canais mantidos em memória para consulta e reconexão
+MAX_CHANNELS = int(os.getenv("WHATSAPP_PROGRESS_MAX_CHANNELS", "200"))
+
+STEP_QUEUED = "queued"
+STEP_SCHEDULED = "scheduled"
+STEP_BROWSER_READY = "browser_ready"
+STEP_CHAT_OPEN = "chat_open"
+STEP_RETRY_SCHEDULED = "retry_scheduled"
+STEP_CONFIRMED = "confirmed"
+STEP_FAILED = "failed"
+STEP_JOB_COMPLETED = "job_completed"
+
+
+@dataclass
+class ProgressEvent:
+    """One milestone of a job, numbered in emission order."""
+
+    seq: int
+    step: str
+    timestamp: float
+    detail: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable view of the event."""
+        return asdict(self)
+
+
+@dataclass
+class _Channel:
+    events: List[ProgressEvent] = field(default_factory=list)
+    closed: bool = False
+    waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = field(default_factory=list)
+
+
+class ProgressHub:
+    """Thread-safe store of progress channels with async subscribers."""
+
+    def __init__(self, max_channels: int = MAX_CHANNELS) -> None:
+        """Channels are created on demand by open() or emit()."""
+        self.max_channels = max_channels
+        self._channels: "OrderedDict[str, _Channel]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(self, job_id: str) -> None:
+        """Create the channel of a job, forgetting the oldest closed ones."""
+        with self._lock:
+            self._channels.setdefault(job_id, _Channel())
+            while len(self._channels) > self.max_channels:
+                oldest = next((jid for jid, ch in self._channels.items() if ch.closed), None)
+                if oldest is None:
+                    break
+                del self._channels[oldest]
+
+    def emit(self, job_id: str, step: str, detail: Optional[Dict[str, Any]] = None) -> None:
+        """Append an event to a job's channel and wake its subscribers."""
+        with self._lock:
+            channel = self._channels.setdefault(job_id, _Channel())
+            if channel.closed:
+                return
+            channel.events.append(
+                ProgressEvent(len(channel.events) + 1, step, time.time(), detail or {})
+            )
+            self._notify_locked(channel)
+
+    def close(self, job_id: str) -> None:
+        """Mark a job's channel as finished; streams end after the last event."""
+        with self._lock:
+            channel = self._channels.get(job_id)
+            if channel is None or channel.closed:
+                return
+            channel.closed = True
+            self._notify_locked(channel)
+
+    def callback(self, job_id: str, **context: Any) -> ProgressCallback:
+        """Progress callback bound to a job, adding ``context`` to every event."""
+
+        def report(step: str, detail: Dict[str, Any]) -> None:
+            self.emit(job_id, step, {**context, **detail})
+
+        return report
+
+    def _notify_locked(self, channel: _Channel) -> None:
+        for loop, event in channel.waiters:
+            loop.call_soon_threadsafe(event.set)
+        channel.waiters.clear()
+
+    async def stream(
+        self, job_id: str, since: int = 0, keepalive_s: float = 15.0
+    ) -> AsyncIterator[Optional[ProgressEvent]]:
+        """
+        Yield a job's events from ``since`` until the channel closes. None is
+        yielded after ``keepalive_s`` without events so callers can keep the
+        connection alive.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            wake = asyncio.Event()
+            with self._lock:
+                channel = self._channels.get(job_id)
+                if channel is None:
+                    return
+                pending = channel.events[since:]
+                closed = channel.closed
+                if not pending and not closed:
+                    channel.waiters.append((loop, wake))
+
+            for event in pending:
+                since = event.seq
+                yield event
+            if closed and not pending:
+                return
+            if pending:
+                continue
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=keepalive_s)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    if (loop, wake) in channel.waiters:
+                        channel.waiters.remove((loop, wake))
+                yield None
+
+
+progress_hub = ProgressHub()
@@ -0,0 +1,287 @@
+"""
+Token-bucket rate scheduler placed in front of the WhatsApp automation.
+
+Every send asks the scheduler for permission first. Grants respect a token
+bucket per account and another per destination phone, are spaced by a random
+jitter so traffic does not look robotic, and are handed out by priority
+(lower value first, e.g. overdue bills before regular ones). Whenever the
+buckets allow, the next waiter is released immediately, keeping the pipeline
+at the highest throughput the limits consider safe.
+"""
+
+import asyncio
+import itertools
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# Prioridades: valores menores são atendidos primeiro
+PRIORITY_OVERDUE = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_NORMAL = 5
+
+DEFAULT_ACCOUNT = "default"
+
+# Limites por conta do WhatsApp (envios completos de diálogo)
+ACCOUNT_RATE_PER_MIN = float(os.getenv("WHATSAPP_ACCOUNT_RATE_PER_MIN", "6"))
+ACCOUNT_BURST = float(os.getenv("WHATSAPP_ACCOUNT_BURST", "3"))
+
+# Limites por número de destino
+DESTINATION_RATE_PER_MIN = float(os.getenv("WHATSAPP_DESTINATION_RATE_PER_MIN", "1"))
+DESTINATION_BURST = float(os.getenv("WHATSAPP_DESTINATION_BURST", "3"))
+
+# Espaçamento mínimo entre envios da mesma conta, com jitter aleatório (segundos)
+MIN_SPACING_S = float(os.getenv("WHATSAPP_MIN_SPACING_S", "2"))
+SPACING_JITTER_S = float(os.getenv("WHATSAPP_SPACING_JITTER_S", "3"))
+
+# Quantidade máxima de buckets de destino mantidos em memória
+MAX_DESTINATION_BUCKETS = 10000
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at ``rate_per_s`` tokens per second."""
+
+    def __init__(self, rate_per_s: float, capacity: float) -> None:
+        """Start with a full bucket."""
+        self.rate_per_s = rate_per_s
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        """Add the tokens accumulated since the last update."""
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate_per_s)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available (0 when available now)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        if self.rate_per_s <= 0:
+            return float("inf")
+        return (1 - self.tokens) / self.rate_per_s
+
+    def consume(self, now: float) -> None:
+        """Take one token; callers check wait_time() first."""
+        self._refill(now)
+        self.tokens -= 1
+
+    def available(self, now: float) -> float:
+        """Tokens available right now."""
+        self._refill(now)
+        return self.tokens
+
+    def is_full(self, now: float) -> bool:
+        """Whether the bucket is back to capacity (safe to forget)."""
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+@dataclass(order=True)
+class _Waiter:
+    """A pending send waiting for its grant."""
+
+    priority: int
+    seq: int
+    account: str = field(compare=False)
+    destination: str = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    future: "asyncio.Future[float]" = field(compare=False)
+
+
+class RateScheduler:
+    """Grants sends according to account/destination buckets, priority and jitter."""
+
+    def __init__(
+        self,
+        account_rate_per_min: float = ACCOUNT_RATE_PER_MIN,
+        account_burst: float = ACCOUNT_BURST,
+        destination_rate_per_min: float = DESTINATION_RATE_PER_MIN,
+        destination_burst: float = DESTINATION_BURST,
+        min_spacing_s: float = MIN_SPACING_S,
+        spacing_jitter_s: float = SPACING_JITTER_S,
+    ) -> None:
+        """Initialize empty buckets; the dispatcher starts with start()."""
+        self.account_rate_per_min = account_rate_per_min
+        self.account_burst = account_burst
+        self.destination_rate_per_min = destination_rate_per_min
+        self.destination_burst = destination_burst
+        self.min_spacing_s = min_spacing_s
+        self.spacing_jitter_s = spacing_jitter_s
+
+        self._accounts: Dict[str, TokenBucket] = {}
+        self._destinations: Dict[str, TokenBucket] = {}
+        self._next_allowed: Dict[str, float] = {}
+        self._waiting: List[_Waiter] = []
+        self._seq = itertools.count()
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        # Janelas recentes para métricas: (instante, conta) e (instante, espera)
+        self._grants: Deque[Tuple[float, str]] = deque(maxlen=5000)
+        self._waits: Deque[Tuple[float, float]] = deque(maxlen=5000)
+
+    async def start(self) -> None:
+        """Start the dispatcher task on the running loop."""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._dispatch(), name="whatsapp-rate-scheduler")
+
+    async def stop(self) -> None:
+        """Stop the dispatcher and fail every pending waiter."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for waiter in self._waiting:
+            if not waiter.future.done():
+                waiter.future.set_exception(RuntimeError("Rate scheduler stopped"))
+        self._waiting.clear()
+
+    async def acquire(
+        self,
+        destination: str,
+        account: str = DEFAULT_ACCOUNT,
+        priority: int = PRIORITY_NORMAL,
+    ) -> float:
+        """
+        Wait until a send to ``destination`` through ``account`` is allowed.
+        Returns the time spent waiting, in seconds.
+        """
+        if self._task is None or self._wakeup is None:
+            raise RuntimeError("Rate scheduler is not running")
+
+        future: "asyncio.Future[float]" = asyncio.get_running_loop().create_future()
+        self._waiting.append(
+            _Waiter(
+                priority=priority,
+                seq=next(self._seq),
+                account=account,
+                destination=destination,
+                enqueued_at=time.monotonic(),
+                future=future,
+            )
+        )
+        self._wakeup.set()
+        return await future
+
+    def _account_bucket(self, account: str) -> TokenBucket:
+        bucket = self._accounts.get(account)
+        if bucket is None:
+            bucket = TokenBucket(self.account_rate_per_min / 60, self.account_burst)
+            self._accounts[account] = bucket
+        return bucket
+
+    def _destination_bucket(self, destination: str) -> TokenBucket:
+        bucket = self._destinations.get(destination)
+        if bucket is None:
+            if len(self._destinations) >= MAX_DESTINATION_BUCKETS:
+                self._prune_destinations()
+            bucket = TokenBucket(self.destination_rate_per_min / 60, self.destination_burst)
+            self._destinations[destination] = bucket
+        return bucket
+
+    def _prune_destinations(self) -> None:
+        """Forget destination buckets that are full again (no information lost)."""
+        now = time.monotonic()
+        for key in [k for k, b in self._destinations.items() if b.is_full(now)]:
+            del self._destinations[key]
+
+    def _grant_ready(self) -> Optional[float]:
+        """
+        Release every waiter whose limits allow it, by priority.
+        Returns the seconds until the next possible grant, or None when idle.
+        """
+        self._waiting = [w for w in self._waiting if not w.future.done()]
+        self._waiting.sort()
+
+        next_wait: Optional[float] = None
+        granted: List[_Waiter] = []
+        for waiter in self._waiting:
+            now = time.monotonic()
+            account_bucket = self._account_bucket(waiter.account)
+            destination_bucket = self._destination_bucket(waiter.destination)
+            wait = max(
+                account_bucket.wait_time(now),
+                destination_bucket.wait_time(now),
+                self._next_allowed.get(waiter.account, 0.0) - now,
+            )
+            if wait > 0:
+                next_wait = wait if next_wait is None else min(next_wait, wait)
+                continue
+
+            account_bucket.consume(now)
+            destination_bucket.consume(now)
+            self._next_allowed[waiter.account] = (
+                now + self.min_spacing_s + random.uniform(0, self.spacing_jitter_s)
+            )
+            waited = now - waiter.enqueued_at
+            self._grants.append((now, waiter.account))
+            self._waits.append((now, waited))
+            waiter.future.set_result(waited)
+            granted.append(waiter)
+
+        if granted:
+            self._waiting = [w for w in self._waiting if w not in granted]
+        return next_wait
+
+    async def _dispatch(self) -> None:
+        """Grant waiters as soon as possible, sleeping until the next opportunity."""
+        assert self._wakeup is not None
+        while True:
+            self._wakeup.clear()
+            timeout = self._grant_ready()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current rates, bucket levels, queue depth and wait-time statistics."""
+        now = time.monotonic()
+        window = 60.0
+
+        rates: Dict[str, int] = {}
+        for ts, account in self._grants:
+            if now - ts <= window:
+                rates[account] = rates.get(account, 0) + 1
+
+        recent_waits = sorted(w for ts, w in self._waits if now - ts <= 15 * window)
+
+        def percentile(values: List[float], pct: float) -> Optional[float]:
+            if not values:
+                return None
+            index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+            return round(values[index], 3)
+
+        return {
+            "queue_depth": len([w for w in self._waiting if not w.future.done()]),
+            "oldest_wait_s": round(
+                max((now - w.enqueued_at for w in self._waiting), default=0.0), 3
+            ),
+            "accounts": {
+                account: {
+                    "sends_last_min": rates.get(account, 0),
+                    "limit_per_min": self.account_rate_per_min,
+                    "tokens": round(bucket.available(now), 3),
+                }
+                for account, bucket in self._accounts.items()
+            },
+            "tracked_destinations": len(self._destinations),
+            "wait_s": {
+                "count": len(recent_waits),
+                "p50": percentile(recent_waits, 50),
+                "p95": percentile(recent_waits, 95),
+                "max": round(recent_waits[-1], 3) if recent_waits else None,
+            },
+        }
+
+
+rate_scheduler = RateScheduler()
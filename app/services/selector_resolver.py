@@ -0,0 +1,196 @@
+"""
+Adaptive selector resolution for the WhatsApp Web DOM.
+
+Each role (message text box, send button, chat-ready marker) has a list of
+candidate selectors in preference order. The resolver first tries the
+selector that won last time for that role with a short timeout; on a miss it
+races all candidates concurrently instead of waiting for each one in turn.
+When several candidates match, the highest-ranked one present wins. Hits,
+misses and latencies are kept per selector. Text box and chat-ready
+candidates are scoped to the chat footer (``#main footer``) so the search
+box in ``#side``, also an editable textbox, can never be learned.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from playwright.async_api import ElementHandle, Page
+from playwright.async_api import Error as PlaywrightError
+
+ROLE_TEXT_BOX = "text_box"
+ROLE_SEND_BUTTON = "send_button"
+ROLE_CHAT_READY = "chat_ready"
+
+DEFAULT_CANDIDATES: Dict[str, List[str]] = {
+    # Sempre dentro do rodapé do chat: a busca de #side também é um textbox editável
+    ROLE_TEXT_BOX: [
+        "#main footer div[contenteditable='true'][role='textbox']",
+        "#main footer div[contenteditable='true'][data-tab='10']",
+        "#main footer div[contenteditable='true']",
+    ],
+    ROLE_SEND_BUTTON: [
+        "button span[data-icon='send']",
+        "span[data-icon='send']",
+        "button[aria-label='Enviar']",
+        "button[aria-label='Send']",
+    ],
+    ROLE_CHAT_READY: [
+        "#main footer div[contenteditable='true'][role='textbox']",
+        "#main footer div[contenteditable='true'][data-tab='10']",
+        "#main footer div[contenteditable='true']",
+    ],
+}
+
+# Tempo concedido ao seletor aprendido antes de disputar todos os candidatos
+FAST_PATH_TIMEOUT_MS = 1500
+
+
+@dataclass
+class SelectorStats:
+    """Hit/miss counters and latency of one selector."""
+
+    hits: int = 0
+    misses: int = 0
+    total_latency_s: float = 0.0
+    last_latency_s: Optional[float] = None
+
+    def record_hit(self, latency_s: float) -> None:
+        """Count a successful resolution."""
+        self.hits += 1
+        self.total_latency_s += latency_s
+        self.last_latency_s = latency_s
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable view with the average hit latency."""
+        avg = self.total_latency_s / self.hits if self.hits else None
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "avg_latency_s": round(avg, 4) if avg is not None else None,
+            "last_latency_s": (
+                round(self.last_latency_s, 4) if self.last_latency_s is not None else None
+            ),
+        }
+
+
+class SelectorResolver:
+    """Resolves role selectors with a learned fast path and concurrent fallback."""
+
+    def __init__(
+        self,
+        candidates: Optional[Dict[str, List[str]]] = None,
+        fast_path_timeout_ms: int = FAST_PATH_TIMEOUT_MS,
+    ) -> None:
+        """Initialize with the default candidates unless others are given."""
+        self.candidates = candidates or DEFAULT_CANDIDATES
+        self.fast_path_timeout_ms = fast_path_timeout_ms
+        self._winners: Dict[str, str] = {}
+        self._stats: Dict[str, Dict[str, SelectorStats]] = {
+            role: {sel: SelectorStats() for sel in sels} for role, sels in self.candidates.items()
+        }
+
+    def _stat(self, role: str, selector: str) -> SelectorStats:
+        return self._stats.setdefault(role, {}).setdefault(selector, SelectorStats())
+
+    async def resolve(
+        self,
+        page: Page,
+        role: str,
+        timeout_ms: int = 10000,
+        state: str = "visible",
+    ) -> Optional[Tuple[ElementHandle, str]]:
+        """
+        Return the element and winning selector for a role, or None when no
+        candidate appears within ``timeout_ms``.
+        """
+        inicio = time.perf_counter()
+        candidates = self.candidates[role]
+
+        preferred = self._winners.get(role)
+        if preferred is not None:
+            try:
+                element = await page.wait_for_selector(
+                    preferred, timeout=min(timeout_ms, self.fast_path_timeout_ms), state=state
+                )
+                if element:
+                    self._stat(role, preferred).record_hit(time.perf_counter() - inicio)
+                    return element, preferred
+            except (asyncio.TimeoutError, PlaywrightError):
+                pass
+            self._stat(role, preferred).misses += 1
+
+        remaining = max(0, timeout_ms - int((time.perf_counter() - inicio) * 1000))
+        result = await self._race(page, candidates, remaining, state)
+        if result is None:
+            for selector in candidates:
+                if selector != preferred:
+                    self._stat(role, selector).misses += 1
+            return None
+
+        element, selector = result
+        self._winners[role] = selector
+        self._stat(role, selector).record_hit(time.perf_counter() - inicio)
+        return element, selector
+
+    async def _race(
+        self, page: Page, candidates: List[str], timeout_ms: int, state: str
+    ) -> Optional[Tuple[ElementHandle, str]]:
+        """Wait for all candidates at once; prefer the highest-ranked one present."""
+        if timeout_ms <= 0:
+            return None
+
+        tasks = {
+            asyncio.create_task(
+                page.wait_for_selector(selector, timeout=timeout_ms, state=state)
+            ): selector
+            for selector in candidates
+        }
+        first: Optional[Tuple[ElementHandle, str]] = None
+        try:
+            pending = set(tasks)
+            while pending and first is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled() or task.exception() is not None:
+                        continue
+                    element = task.result()
+                    if element is not None:
+                        first = (element, tasks[task])
+                        break
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        if first is None:
+            return None
+
+        # Um candidato mais específico pode estar presente ao mesmo tempo
+        rank = candidates.index(first[1])
+        for selector in candidates[:rank]:
+            try:
+                element = await page.query_selector(selector)
+            except PlaywrightError:
+                continue
+            if element is None:
+                continue
+            if state == "visible" and not await element.is_visible():
+                continue
+            return element, selector
+        return first
+
+    def stats(self) -> Dict[str, Any]:
+        """Learned winner and per-selector statistics for every role."""
+        return {
+            role: {
+                "preferred": self._winners.get(role),
+                "selectors": {sel: st.to_dict() for sel, st in selectors.items()},
+            }
+            for role, selectors in self._stats.items()
+        }
+
+
+selector_resolver = SelectorResolver()
@@ -0,0 +1,142 @@
+"""
+In-memory manager for the Playwright storage state (WhatsApp Web session).
+
+The state is kept in memory and only written when it actually changed. Writes
+go to a temporary file in the same directory followed by an atomic rename,
+under a lock, and are rate-limited, so concurrent sends never corrupt the
+session file and a crash never leaves it truncated.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.services.log import get_logger
+
+logger = get_logger(__name__)
+
+# Garante o caminho absoluto baseado na raiz do projeto (cross-platform)
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+SESSION_FILE = BASE_DIR / "playwright_whatsapp_session.json"
+
+# Intervalo mínimo entre gravações do estado da sessão (segundos)
+FLUSH_INTERVAL_S = float(os.getenv("WHATSAPP_SESSION_FLUSH_INTERVAL_S", "60"))
+
+
+def _digest(state: Dict[str, Any]) -> str:
+    """Stable hash of a storage state, independent of key order."""
+    canonical = json.dumps(state, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SessionStateManager:
+    """Caches one storage-state file and persists it atomically when it changes."""
+
+    def __init__(self, path: Path = SESSION_FILE, flush_interval: float = FLUSH_INTERVAL_S) -> None:
+        """Nothing is read until load() is called."""
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._state: Optional[Dict[str, Any]] = None
+        self._disk_digest: Optional[str] = None
+        self._dirty = False
+        self._last_flush = 0.0
+        self.writes = 0
+        self.skipped = 0
+
+    def exists(self) -> bool:
+        """Whether a session is available (in memory or on disk)."""
+        return self._state is not None or self.path.exists()
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached state, reading the file on first use. An unreadable
+        file is treated as missing so a fresh login can replace it.
+        """
+        with self._lock:
+            if self._state is not None:
+                return self._state
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    state = json.load(f)
+            except FileNotFoundError:
+                return None
+            except (OSError, ValueError) as e:
+                logger.warning("PLAYWRIGHT ⚠️ Arquivo de sessão ilegível (%s). Será necessário novo login.", e)
+                return None
+            self._state = state
+            self._disk_digest = _digest(state)
+            return state
+
+    def update(self, state: Dict[str, Any], force: bool = False) -> bool:
+        """
+        Replace the in-memory state. Writes to disk only when the content
+        changed and the flush interval elapsed (or ``force``). Returns True
+        when the file was written.
+        """
+        digest = _digest(state)
+        with self._lock:
+            self._state = state
+            if digest == self._disk_digest:
+                self._dirty = False
+                self.skipped += 1
+                return False
+            self._dirty = True
+            if not force and time.monotonic() - self._last_flush < self.flush_interval:
+                return False
+            return self._write_locked(digest)
+
+    def flush(self) -> bool:
+        """Write pending changes now, if any."""
+        with self._lock:
+            if not self._dirty or self._state is None:
+                return False
+            return self._write_locked(_digest(self._state))
+
+    def flush_if_due(self) -> bool:
+        """Write pending changes when the flush interval elapsed."""
+        if time.monotonic() - self._last_flush < self.flush_interval:
+            return False
+        return self.flush()
+
+    def _write_locked(self, digest: str) -> bool:
+        """Temp file + fsync + atomic rename. Caller holds the lock."""
+        assert self._state is not None
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=f".{self.path.name}.", suffix=".tmp", dir=str(self.path.parent)
+        )
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+                json.dump(self._state, tmp)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._disk_digest = digest
+        self._dirty = False
+        self._last_flush = time.monotonic()
+        self.writes += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Write/skip counters and whether unsaved changes are pending."""
+        return {
+            "path": str(self.path),
+            "writes": self.writes,
+            "skipped_unchanged": self.skipped,
+            "dirty": self._dirty,
+        }
+
+
+session_state = SessionStateManager()
@@ -0,0 +1,61 @@
+"""
+Single-flight coalescing of identical concurrent computations.
+
+While a computation for a key is in flight, further calls with the same key
+wait for it and receive the same result (or exception) instead of starting
+their own. Nothing is cached after it finishes; retention is the job store's
+business (app.services.ingest_jobs).
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+from app.services.log import SAMPLED, get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+
+def payload_key(*parts: Any) -> str:
+    """Stable hash of JSON-serializable parts (request body and parameters)."""
+    canonical = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one computation."""
+
+    def __init__(self, name: str) -> None:
+        """Keys are namespaced only by the instance."""
+        self.name = name
+        self._inflight: Dict[str, "asyncio.Task[Any]"] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, compute: Callable[[], Awaitable[T]]) -> T:
+        """
+        Return the result of ``compute()`` for ``key``, sharing an in-flight
+        run when there is one. The computation is a task of its own, so a
+        caller that disconnects does not cancel it for the others.
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            logger.info("🔁 [SingleFlight:%s] Requisição idêntica em andamento; aguardando resultado", self.name, extra=SAMPLED)
+        else:
+            task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, k=key: self._inflight.pop(k, None))
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls, coalesced calls and computations in flight."""
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._inflight)}
+
+
+ingest_flight = SingleFlight("ingest")
+format_flight = SingleFlight("format")
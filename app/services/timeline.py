@@ -0,0 +1,254 @@
+"""
+Step-level timeline tracing of the WhatsApp automation.
+
+Each send runs inside a timeline; the automation wraps its phases (browser
+launch, context creation, navigation, #side wait, chat ready, every dialogue
+step and its typing/tick/reply phases, storage-state writes) in spans with
+start offsets and durations. Finished timelines feed rolling per-span
+percentiles and can be exported as one JSON file per send
+(WHATSAPP_TIMELINE_DIR). Spans outside a timeline are no-ops.
+
+Timelines are recorded on the automation loop (and on the API loop for worker
+processes), so the export never touches the disk there: serialization and the
+write happen on a writer thread fed by a bounded queue, and exports are
+dropped with a warning rather than blocking a send when the disk falls behind.
+"""
+
+import json
+import math
+import os
+import queue
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from app.services.log import get_logger
+from app.services.metrics import AUTOMATION_SPAN
+
+logger = get_logger(__name__)
+
+# Diretório para exportar um JSON por envio (desativado quando vazio)
+TIMELINE_DIR = os.getenv("WHATSAPP_TIMELINE_DIR", "")
+
+# Diretório para traces do Playwright (.zip) por envio (desativado quando vazio)
+PLAYWRIGHT_TRACE_DIR = os.getenv("WHATSAPP_PLAYWRIGHT_TRACE_DIR", "")
+
+# Timelines recentes mantidas e amostras por span usadas nos percentis
+RECENT_TIMELINES = int(os.getenv("WHATSAPP_TIMELINE_RECENT", "50"))
+PERCENTILE_WINDOW = int(os.getenv("WHATSAPP_TIMELINE_WINDOW", "500"))
+
+# Exportações aguardando a thread de escrita antes de serem descartadas
+EXPORT_QUEUE_SIZE = int(os.getenv("WHATSAPP_TIMELINE_EXPORT_QUEUE", "200"))
+
+
+@dataclass
+class Span:
+    """One timed phase, relative to the start of its timeline."""
+
+    name: str
+    start_ms: float
+    duration_ms: float
+    depth: int
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+class Timeline:
+    """Spans recorded during one send (or browser warm-up)."""
+
+    def __init__(self, label: str, **attrs: Any) -> None:
+        """Start the clock; spans are added with span()."""
+        self.label = label
+        self.attrs = attrs
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self._depth = 0
+        self.spans: List[Span] = []
+        self.duration_ms: Optional[float] = None
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+        """Time the block; the yielded dict can receive extra attributes."""
+        inicio = time.perf_counter()
+        depth = self._depth
+        self._depth += 1
+        try:
+            yield attrs
+        except BaseException as e:
+            attrs["error"] = type(e).__name__
+            raise
+        finally:
+            self._depth -= 1
+            fim = time.perf_counter()
+            self.spans.append(
+                Span(
+                    name=name,
+                    start_ms=round((inicio - self._t0) * 1000, 1),
+                    duration_ms=round((fim - inicio) * 1000, 1),
+                    depth=depth,
+                    attrs=attrs,
+                )
+            )
+
+    def finish(self) -> None:
+        """Stop the clock of the timeline."""
+        self.duration_ms = round((time.perf_counter() - self._t0) * 1000, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializable view with spans ordered by start."""
+        return {
+            "label": self.label,
+            "attrs": self.attrs,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "spans": [asdict(s) for s in sorted(self.spans, key=lambda s: s.start_ms)],
+        }
+
+
+_current: ContextVar[Optional[Timeline]] = ContextVar("whatsapp_timeline", default=None)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """Record a span on the current timeline, if there is one."""
+    atual = _current.get()
+    if atual is None:
+        yield attrs
+        return
+    with atual.span(name, **attrs) as span_attrs:
+        yield span_attrs
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+class TimelineRecorder:
+    """Keeps recent timelines, per-span percentiles and the optional JSON export."""
+
+    def __init__(
+        self,
+        recent: int = RECENT_TIMELINES,
+        window: int = PERCENTILE_WINDOW,
+        export_dir: str = TIMELINE_DIR,
+        export_queue_size: int = EXPORT_QUEUE_SIZE,
+    ) -> None:
+        """Nothing is exported unless ``export_dir`` is set."""
+        self.export_dir = Path(export_dir) if export_dir else None
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=recent)
+        self._durations: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+        # Itens: (diretório, timeline) a gravar, ou um Event de flush()
+        self._exports: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, export_queue_size))
+        self._writer: Optional[threading.Thread] = None
+        self.dropped_exports = 0
+
+    @contextmanager
+    def timeline(self, label: str, **attrs: Any) -> Iterator[Timeline]:
+        """Make a new timeline current for the block and record it at the end."""
+        atual = Timeline(label, **attrs)
+        token = _current.set(atual)
+        try:
+            yield atual
+        finally:
+            _current.reset(token)
+            atual.finish()
+            self.record(atual.to_dict())
+
+    def record(self, data: Dict[str, Any]) -> None:
+        """Add a finished timeline (also those reported by worker processes)."""
+        with self._lock:
+            self._recent.append(data)
+            for item in data["spans"]:
+                self._durations[item["name"]].append(item["duration_ms"])
+                AUTOMATION_SPAN.observe(item["duration_ms"] / 1000, span=item["name"])
+            if data.get("duration_ms") is not None:
+                self._durations[f"total:{data['label']}"].append(data["duration_ms"])
+        self._export(data)
+
+    def _export(self, data: Dict[str, Any]) -> None:
+        """Hand a timeline to the writer thread; never blocks the caller's loop."""
+        if self.export_dir is None:
+            return
+        self._ensure_writer()
+        try:
+            self._exports.put_nowait((self.export_dir, data))
+        except queue.Full:
+            self.dropped_exports += 1
+            logger.warning("PLAYWRIGHT ⚠️ Fila de exportação de timelines cheia; timeline descartada")
+
+    def _ensure_writer(self) -> None:
+        """Start the writer thread on the first export."""
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_loop, name="whatsapp-timeline-writer", daemon=True
+                )
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        """Write queued timelines, one JSON file each (runs in the writer thread)."""
+        while True:
+            item = self._exports.get()
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            export_dir, data = item
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(data["started_at"]))
+            ms = int(data["started_at"] * 1000) % 1000
+            slug = re.sub(r"[^0-9A-Za-z_-]+", "_", data["label"])
+            destino = export_dir / f"{stamp}.{ms:03d}_{slug}.json"
+            try:
+                export_dir.mkdir(parents=True, exist_ok=True)
+                destino.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+            except OSError as e:
+                logger.warning("PLAYWRIGHT ⚠️ Não foi possível exportar a timeline: %s", e)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until the exports queued so far are written (blocking; call off the loop)."""
+        if self._writer is None:
+            return True
+        marcador = threading.Event()
+        try:
+            self._exports.put(marcador, timeout=timeout)
+        except queue.Full:
+            return False
+        return marcador.wait(timeout)
+
+    def percentiles(self) -> Dict[str, Dict[str, Any]]:
+        """Count, p50, p95 and max duration (ms) of every span name."""
+        with self._lock:
+            amostras = {name: sorted(values) for name, values in self._durations.items()}
+        return {
+            name: {
+                "count": len(ordered),
+                "p50_ms": _percentile(ordered, 50),
+                "p95_ms": _percentile(ordered, 95),
+                "max_ms": ordered[-1],
+            }
+            for name, ordered in sorted(amostras.items())
+            if ordered
+        }
+
+    def recent(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """The most recent timelines, newest first."""
+        with self._lock:
+            return list(self._recent)[-limit:][::-1]
+
+
+def trace_path(label: str) -> Optional[Path]:
+    """Destination of a per-send Playwright trace, or None when disabled."""
+    if not PLAYWRIGHT_TRACE_DIR:
+        return None
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    slug = re.sub(r"[^0-9A-Za-z_-]+", "_", label)
+    return Path(PLAYWRIGHT_TRACE_DIR) / f"{stamp}_{slug}.zip"
+
+
+timeline_recorder = TimelineRecorder()
@@ -0,0 +1,52 @@
+"""
+Deferred loading of the heavy dependencies of the API.
+
+pandas, numpy and openpyxl (through ExcelService and json_utils) are not
+imported when the API module loads, so every uvicorn worker and every
+``--reload`` restart answers /health without paying for them. They are
+imported in a worker thread on first use, or by a background warm-up task
+started after the lifespan (WHATSAPP_WARMUP=0 disables it).
+"""
+
+import asyncio
+import importlib
+import os
+import sys
+import time
+from types import ModuleType
+from typing import Tuple
+
+from app.services.log import get_logger
+
+logger = get_logger(__name__)
+
+# Aquece as dependências pesadas em segundo plano após a inicialização
+WARMUP_ENABLED = os.getenv("WHATSAPP_WARMUP", "1") != "0"
+
+# Módulos carregados pelo aquecimento, na ordem
+HEAVY_MODULES: Tuple[str, ...] = (
+    "pandas",
+    "openpyxl",
+    "app.services.excel_service",
+    "app.services.json_utils",
+)
+
+
+async def load(name: str) -> ModuleType:
+    """Import a module off the event loop (immediate when already loaded)."""
+    module = sys.modules.get(name)
+    # Um módulo ainda sendo importado por outra thread já está em sys.modules
+    if module is not None and not getattr(module.__spec__, "_initializing", False):
+        return module
+    return await asyncio.to_thread(importlib.import_module, name)
+
+
+async def warm_up(modules: Tuple[str, ...] = HEAVY_MODULES) -> None:
+    """Import the heavy modules one by one so the first upload does not wait."""
+    inicio = time.perf_counter()
+    for name in modules:
+        try:
+            await load(name)
+        except ImportError as e:
+            logger.warning("⚠️ [Warmup] %s indisponível: %s", name, e)
+    logger.info("🔥 [Warmup] Dependências carregadas em %.0f ms", (time.perf_counter() - inicio) * 1000)
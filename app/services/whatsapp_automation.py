@@ -5,11 +5,120 @@ Handles TargetClosedError gracefully if the page or browser is closed.
 
 import asyncio
 import os
+import time
+from dataclasses import asdict, dataclass
 from datetime import datetime
-from pathlib import Path
+from typing import List, Optional
 
 from playwright.async_api import Error as PlaywrightError
-from playwright.async_api import async_playwright
+from playwright.async_api import Page, async_playwright
+
+from app.services.log import SAMPLED, get_logger
+from app.services.progress import ProgressCallback
+from app.services.selector_resolver import (
+    ROLE_CHAT_READY,
+    ROLE_SEND_BUTTON,
+    ROLE_TEXT_BOX,
+    selector_resolver,
+)
+from app.services.session_state import SESSION_FILE, session_state
+from app.services.timeline import span, timeline_recorder, trace_path
+
+logger = get_logger(__name__)
+
+# Pode apontar para o servidor simulado de scripts/benchmarks/mock_whatsapp.py
+WHATSAPP_WEB_URL = os.getenv("WHATSAPP_WEB_URL", "https://web.whatsapp.com").rstrip("/")
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+)
+
+CHROMIUM_ARGS = [
+    "--disable-dev-shm-usage",
+    "--no-sandbox",
+    "--disable-setuid-sandbox"
+]
+
+# Navegação entre chats: "inapp" troca de conversa pela busca do próprio
+# WhatsApp Web (sem recarregar a SPA); "goto" sempre recarrega via /send?phone=
+CHAT_NAVIGATION = os.getenv("WHATSAPP_CHAT_NAVIGATION", "inapp").lower()
+
+SEARCH_BOX_SELECTORS = [
+    "#side div[contenteditable='true'][data-tab='3']",
+    "#side div[contenteditable='true'][role='textbox']",
+]
+SEARCH_RESULT_SELECTOR = "#pane-side [role='listitem'] span[title]"
+CHAT_COMPOSER_SELECTOR = "#main footer div[contenteditable='true']"
+CHAT_HEADER_SELECTOR = "#main header span[title]"
+
+# Limites das esperas orientadas a eventos do diálogo (milissegundos)
+CONFIRM_TIMEOUT_MS = int(os.getenv("WHATSAPP_CONFIRM_TIMEOUT_MS", "15000"))
+REPLY_TIMEOUT_MS = int(os.getenv("WHATSAPP_REPLY_TIMEOUT_MS", "20000"))
+
+# Ícones de status da bolha enviada: enviado (✓), entregue (✓✓) e lido
+TICK_SELECTORS = (
+    "span[data-icon='msg-check'], "
+    "span[data-icon='msg-dblcheck'], "
+    "span[data-icon='msg-dblcheck-ack']"
+)
+
+# As bolhas são identificadas pelo data-id da linha que as contém, o que
+# continua funcionando quando a lista de mensagens é virtualizada
+JS_ULTIMO_ID = """
+(bubbleSelector) => {
+    const bubbles = document.querySelectorAll(bubbleSelector);
+    if (!bubbles.length) return "";
+    const last = bubbles[bubbles.length - 1];
+    const row = last.closest("[data-id]");
+    return row ? row.getAttribute("data-id") : String(bubbles.length);
+}
+"""
+
+JS_NOVA_MENSAGEM = """
+([previousId, bubbleSelector]) => {
+    const bubbles = document.querySelectorAll(bubbleSelector);
+    if (!bubbles.length) return false;
+    const last = bubbles[bubbles.length - 1];
+    const row = last.closest("[data-id]");
+    const id = row ? row.getAttribute("data-id") : String(bubbles.length);
+    return id !== previousId;
+}
+"""
+
+JS_ENVIO_CONFIRMADO = """
+([previousId, tickSelectors]) => {
+    const bubbles = document.querySelectorAll("div.message-out");
+    if (!bubbles.length) return false;
+    const last = bubbles[bubbles.length - 1];
+    const row = last.closest("[data-id]");
+    const id = row ? row.getAttribute("data-id") : String(bubbles.length);
+    return id !== previousId && last.querySelector(tickSelectors) !== null;
+}
+"""
+
+# Resultado da busca (ou cabeçalho do chat) cujo título tem exatamente os dígitos do número
+JS_TITULO_DO_NUMERO = """
+([selector, digits]) => Array.from(document.querySelectorAll(selector)).some(
+    (el) => (el.getAttribute("title") || "").replace(/\\D/g, "") === digits
+)
+"""
+
+
+def _digitos(texto: str) -> str:
+    return "".join(filter(str.isdigit, texto))
+
+
+@dataclass
+class StepTiming:
+    """Latency breakdown of one dialogue step, in seconds."""
+
+    passo: str
+    envio_s: float
+    confirmacao_s: float
+    resposta_s: Optional[float]
+    confirmado: bool
+    respondido: bool
 
 
 def obter_saudacao_expediente() -> str:
@@ -35,160 +144,357 @@ def obter_saudacao_expediente() -> str:
     )
 
 
-async def send_whatsapp_with_playwright(phone: str, message: str) -> bool:
+async def aguardar_interface(page: Page, timeout_ms: int = 120000) -> bool:
     """
-    Automates sending WhatsApp messages using Playwright Chromium with interactive dialogue.
-    Simulates human typing rhythm: Saudacao -> '1' -> '3' -> Relatorio.
-    Handles cross-platform session path resolution (Linux/Windows).
+    Waits for the main WhatsApp Web interface (#side) to be rendered.
+    Returns False when the QR Code is not scanned in time.
     """
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=False,
-            args=[
-                "--disable-dev-shm-usage",
-                "--no-sandbox",
-                "--disable-setuid-sandbox"
-            ]
-        )
-        user_agent = (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-            "(KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
-        )
+    logger.info("PLAYWRIGHT 🔑 Aguardando carregamento do WhatsApp / Leitura do QR Code...")
+    try:
+        with span("wait_side"):
+            await page.wait_for_selector("#side", timeout=timeout_ms)
+        logger.info("PLAYWRIGHT ✅ Interface do WhatsApp Web carregada!")
+        return True
+    except (asyncio.TimeoutError, PlaywrightError):
+        logger.error("PLAYWRIGHT ❌ Tempo limite expirado aguardando interface.")
+        return False
+
+
+async def abrir_chat(page: Page, phone: str) -> bool:
+    """
+    Navigates an existing page to the conversation with the given phone number
+    and waits for the WhatsApp Web interface to come back.
+    """
+    target_url = f"{WHATSAPP_WEB_URL}/send?phone={phone}"
+    logger.info("PLAYWRIGHT 🌐 Navegando diretamente para o contato: %s", target_url)
+
+    # Aumenta o tempo limite de carregamento da página para 120s no Linux
+    with span("navigation", mode="goto"):
+        await page.goto(target_url, wait_until="domcontentloaded", timeout=120000)
 
-        # Garante o caminho absoluto baseado na raiz do projeto (cross-platform)
-        base_dir = Path(__file__).resolve().parent.parent.parent
-        session_file = base_dir / "playwright_whatsapp_session.json"
+    return await aguardar_interface(page)
 
-        # Verifica se o arquivo de sessão realmente existe no disco antes de carregar
-        if os.path.exists(session_file):
-            print(f"PLAYWRIGHT 🔑 Carregando sessão existente: {session_file}")
-            context = await browser.new_context(
-                storage_state=str(session_file),
-                user_agent=user_agent
+
+async def aguardar_chat_pronto(page: Page) -> bool:
+    """
+    Waits until the message box of the opened chat is ready for typing.
+    """
+    # Espera até 30s para que a caixa de conversa específica do número seja aberta
+    logger.info("PLAYWRIGHT ⏳ Aguardando abertura do chat do destinatário...")
+    with span("chat_ready") as attrs:
+        attrs["ok"] = bool(await selector_resolver.resolve(page, ROLE_CHAT_READY, timeout_ms=30000))
+    if attrs["ok"]:
+        return True
+
+    logger.warning("PLAYWRIGHT ⚠️ O chat do número não abriu a tempo. Verifique a conexão do celular.")
+    return False
+
+
+async def abrir_chat_no_app(page: Page, phone: str, timeout_ms: int = 8000) -> bool:
+    """
+    Switches to the recipient's chat inside the already loaded WhatsApp Web,
+    through its search box, without reloading the page.
+
+    Waits for a search result whose title is exactly the recipient's number
+    (the list may still show the unfiltered chats for a moment) and opens it
+    only when there is one such result. The switch is kept only once the chat
+    header shows that number: the composer of the previous chat is already
+    on the page, so its presence proves nothing. A saved contact shown by
+    name never matches and always takes the full navigation, since another
+    contact must never receive someone else's report. Returns False when the
+    in-app switch is not possible or not confirmed; callers then fall back
+    to abrir_chat().
+    """
+    if not page.url.startswith(WHATSAPP_WEB_URL):
+        return False
+    try:
+        if await page.query_selector("#side") is None:
+            return False
+
+        search_box = None
+        for selector in SEARCH_BOX_SELECTORS:
+            search_box = await page.query_selector(selector)
+            if search_box:
+                break
+        if not search_box:
+            return False
+
+        digitos = _digitos(phone)
+        await search_box.click()
+        await search_box.fill("")
+        await page.keyboard.insert_text(digitos)
+
+        # A busca é filtrada de forma incremental: espera o resultado do próprio número
+        try:
+            await page.wait_for_function(
+                JS_TITULO_DO_NUMERO, arg=[SEARCH_RESULT_SELECTOR, digitos], timeout=timeout_ms
             )
-        else:
-            print("PLAYWRIGHT 🆕 Nenhuma sessão encontrada. Iniciando novo contexto para autenticação...")
-            context = await browser.new_context(user_agent=user_agent)
+        except (asyncio.TimeoutError, PlaywrightError):
+            logger.info("PLAYWRIGHT 🔎 Busca por %s sem conversa do número; usando navegação completa.", digitos)
+            await search_box.fill("")
+            return False
 
-        page = await context.new_page()
+        resultados = [
+            resultado
+            for resultado in await page.query_selector_all(SEARCH_RESULT_SELECTOR)
+            if _digitos(await resultado.get_attribute("title") or "") == digitos
+        ]
+        if len(resultados) != 1:
+            logger.info(
+                "PLAYWRIGHT 🔎 Busca por %s retornou %d conversas; usando navegação completa.",
+                digitos,
+                len(resultados),
+            )
+            await search_box.fill("")
+            return False
 
+        await resultados[0].click()
+        # O composer do chat anterior já existe: só o cabeçalho prova a troca
         try:
-            target_url = f"https://web.whatsapp.com/send?phone={phone}"
-            print(f"PLAYWRIGHT 🌐 Navegando diretamente para o contato: {target_url}")
+            await page.wait_for_function(
+                JS_TITULO_DO_NUMERO, arg=[CHAT_HEADER_SELECTOR, digitos], timeout=timeout_ms
+            )
+        except (asyncio.TimeoutError, PlaywrightError):
+            logger.warning("PLAYWRIGHT ⚠️ Cabeçalho do chat não mostrou %s; usando navegação completa.", digitos)
+            return False
+        await page.wait_for_selector(CHAT_COMPOSER_SELECTOR, timeout=timeout_ms)
+        await search_box.fill("")
+        logger.debug("PLAYWRIGHT ⚡ Chat de %s aberto sem recarregar a página.", digitos)
+        return True
+    except (asyncio.TimeoutError, PlaywrightError):
+        return False
+
+
+async def _ultimo_id(page: Page, bubble_selector: str) -> str:
+    """Returns the data-id of the last rendered message bubble of a given kind."""
+    try:
+        return await page.evaluate(JS_ULTIMO_ID, bubble_selector) or ""
+    except PlaywrightError:
+        return ""
+
+
+async def _aguardar_confirmacao(page: Page, id_anterior: str, timeout_ms: int) -> bool:
+    """Waits until a new outgoing bubble shows the sent/delivered tick."""
+    try:
+        await page.wait_for_function(
+            JS_ENVIO_CONFIRMADO,
+            arg=[id_anterior, TICK_SELECTORS],
+            timeout=timeout_ms,
+        )
+        return True
+    except (asyncio.TimeoutError, PlaywrightError):
+        return False
+
+
+async def _aguardar_resposta(page: Page, id_anterior: str, timeout_ms: int) -> bool:
+    """Waits until a new incoming bubble (the bot reply) is rendered."""
+    try:
+        await page.wait_for_function(
+            JS_NOVA_MENSAGEM,
+            arg=[id_anterior, "div.message-in"],
+            timeout=timeout_ms,
+        )
+        return True
+    except (asyncio.TimeoutError, PlaywrightError):
+        return False
 
-            # Aumenta o tempo limite de carregamento da página para 120s no Linux
-            await page.goto(target_url, wait_until="domcontentloaded", timeout=120000)
 
-            print("PLAYWRIGHT 🔑 Aguardando carregamento do WhatsApp / Leitura do QR Code...")
+async def executar_dialogo(
+    page: Page,
+    message: str,
+    timings: Optional[List[StepTiming]] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> bool:
+    """
+    Runs the interactive dialogue on an already opened chat.
+    Simulates human typing rhythm: Saudacao -> '1' -> '3' -> Relatorio.
 
-            # Aguarda a interface principal carregar (com timeout estendido para o Linux)
+    Instead of fixed sleeps, each step waits for the outgoing bubble to reach
+    the sent/delivered tick and, when a bot answer is expected, for the reply
+    bubble. Every wait is bounded. A step whose tick does not show up within
+    CONFIRM_TIMEOUT_MS stops the dialogue and the send is reported as not
+    completed (False), never as delivered. Per-step latencies are appended
+    to ``timings`` when a list is given and reported to ``progress`` as each
+    step completes.
+    """
+    # Função auxiliar interna para simular o diálogo cadenciado
+    async def enviar_passo(passo: str, texto: str, aguardar_resposta: bool = True) -> bool:
+        with span(f"step:{passo}") as attrs:
+            attrs["ok"] = await executar_passo(passo, texto, aguardar_resposta)
+        return attrs["ok"]
+
+    async def executar_passo(passo: str, texto: str, aguardar_resposta: bool) -> bool:
+        inicio = time.perf_counter()
+        # O seletor vencedor do envio anterior é tentado primeiro
+        with span("locate_text_box"):
+            resolvido = await selector_resolver.resolve(
+                page, ROLE_TEXT_BOX, timeout_ms=10000, state="attached"
+            )
+        if not resolvido:
+            logger.error("PLAYWRIGHT ❌ Campo de texto não localizado para o passo '%s'.", texto)
+            return False
+        chat_box = resolvido[0]
+
+        # Marca as últimas bolhas antes do envio para detectar as novas
+        ultimo_enviado = await _ultimo_id(page, "div.message-out")
+        ultimo_recebido = await _ultimo_id(page, "div.message-in")
+
+        with span("type", chars=len(texto)):
+            await chat_box.focus()
+            await chat_box.fill("")
+            await page.keyboard.insert_text(texto)
+
+        # O botão de envio só aparece depois que o texto é inserido
+        with span("click_send"):
             try:
-                await page.wait_for_selector("#side", timeout=120000)
-                print("PLAYWRIGHT ✅ Interface do WhatsApp Web carregada!")
+                botao = await selector_resolver.resolve(page, ROLE_SEND_BUTTON, timeout_ms=2500)
+                if botao:
+                    await botao[0].click()
+                else:
+                    await chat_box.press("Enter")
             except (asyncio.TimeoutError, PlaywrightError):
-                print("PLAYWRIGHT ❌ Tempo limite expirado aguardando interface.")
-                await browser.close()
-                return False
+                await chat_box.press("Enter")
+
+        enviado_em = time.perf_counter()
+        logger.debug("PLAYWRIGHT 💬 Passo enviado: '%s'", texto, extra=SAMPLED)
+
+        with span("confirm_tick") as tick_attrs:
+            confirmado = await _aguardar_confirmacao(page, ultimo_enviado, CONFIRM_TIMEOUT_MS)
+            tick_attrs["ok"] = confirmado
+        confirmado_em = time.perf_counter()
+        if not confirmado:
+            logger.warning(
+                "PLAYWRIGHT ⚠️ Sem confirmação de envio (✓) para o passo '%s'. Diálogo interrompido.", passo
+            )
 
-            # Salva o estado da sessão IMEDIATAMENTE após a autenticação confirmada
-            await context.storage_state(path=str(session_file))
-            print("PLAYWRIGHT 💾 Estado da sessão armazenado no disco!")
-
-            # Espera até 30s para que a caixa de conversa específica do número seja aberta
-            print("PLAYWRIGHT ⏳ Aguardando abertura do chat do destinatário...")
-            chat_pronto = False
-            for _ in range(15):  # Tenta por até 30 segundos (15 x 2s)
-                try:
-                    # Verifica se a caixa de texto de digitação já está visível
-                    box = await page.wait_for_selector("div[contenteditable='true'][role='textbox']", timeout=2000)
-                    if box:
-                        chat_pronto = True
-                        break
-                except (asyncio.TimeoutError, PlaywrightError):
-                    await asyncio.sleep(2)
-
-            if not chat_pronto:
-                print("PLAYWRIGHT ⚠️ O chat do número não abriu a tempo. Verifique a conexão do celular.")
-                await browser.close()
-                return False
+        respondido = False
+        if aguardar_resposta and confirmado:
+            with span("bot_reply") as reply_attrs:
+                respondido = await _aguardar_resposta(page, ultimo_recebido, REPLY_TIMEOUT_MS)
+                reply_attrs["ok"] = respondido
+            if not respondido:
+                logger.warning("PLAYWRIGHT ⚠️ Sem resposta do bot após o passo '%s'. Prosseguindo...", passo)
+        respondido_em = time.perf_counter()
+
+        timing = StepTiming(
+            passo=passo,
+            envio_s=round(enviado_em - inicio, 3),
+            confirmacao_s=round(confirmado_em - enviado_em, 3),
+            resposta_s=round(respondido_em - confirmado_em, 3) if aguardar_resposta else None,
+            confirmado=confirmado,
+            respondido=respondido,
+        )
+        if timings is not None:
+            timings.append(timing)
+        if progress is not None:
+            progress(passo, asdict(timing))
+        logger.info(
+            "PLAYWRIGHT ⏱️ Passo '%s': envio %ss | confirmação %ss | resposta %ss",
+            passo,
+            timing.envio_s,
+            timing.confirmacao_s,
+            timing.resposta_s,
+            extra=SAMPLED,
+        )
+        # Sem o ✓ a mensagem pode não ter saído: o envio não conta como concluído
+        return confirmado
 
-            # ... segue para a execução do diálogo interativo (Passo 1, 2, 3...)
-            # Função auxiliar interna para simular o diálogo cadenciado
-            async def enviar_passo(texto: str, espera_segundos: float = 2.0) -> bool:
-                text_box_selectors = [
-                    "div[contenteditable='true'][role='textbox']",
-                    "div[contenteditable='true'][data-tab='10']",
-                    "footer div[contenteditable='true']",
-                    "div[contenteditable='true']"
-                ]
-
-                chat_box = None
-                for selector in text_box_selectors:
-                    try:
-                        chat_box = await page.wait_for_selector(selector, timeout=10000, state="attached")
-                        if chat_box:
-                            break
-                    except (asyncio.TimeoutError, PlaywrightError):
-                        continue
-
-                if not chat_box:
-                    print(f"PLAYWRIGHT ❌ Campo de texto não localizado para o passo '{texto}'.")
-                    return False
+    # -------------------------------------------------------------
+    # 🔄 EXECUÇÃO DO DIÁLOGO INTERATIVO
+    # -------------------------------------------------------------
+    inicio_dialogo = time.perf_counter()
+    saudacao_dinamica = obter_saudacao_expediente()
+    logger.info("PLAYWRIGHT 🤝 Iniciando diálogo com a saudação: '%s'", saudacao_dinamica)
 
-                await chat_box.focus()
-                await chat_box.fill("")
-                await page.keyboard.insert_text(texto)
-                await asyncio.sleep(0.8)
-
-                send_button_selector = "button span[data-icon='send']"
-                try:
-                    send_button = await page.wait_for_selector(send_button_selector, timeout=2500)
-                    if send_button:
-                        await send_button.click()
-                    else:
-                        await chat_box.press("Enter")
-                except (asyncio.TimeoutError, PlaywrightError):
-                    await chat_box.press("Enter")
+    # Passo 1: Saudação
+    if not await enviar_passo("saudacao", saudacao_dinamica):
+        return False
 
-                print(f"PLAYWRIGHT 💬 Passo enviado: '{texto}'")
-                await asyncio.sleep(espera_segundos)
-                return True
+    # Passo 2: Opção 1
+    if not await enviar_passo("opcao_1", "1"):
+        return False
 
-            # -------------------------------------------------------------
-            # 🔄 EXECUÇÃO DO DIÁLOGO INTERATIVO
-            # -------------------------------------------------------------
-            saudacao_dinamica = obter_saudacao_expediente()
-            print(f"PLAYWRIGHT 🤝 Iniciando diálogo com a saudação: '{saudacao_dinamica}'")
+    # Passo 3: Opção 3
+    if not await enviar_passo("opcao_3", "3"):
+        return False
 
-            # Passo 1: Saudação
-            if not await enviar_passo(saudacao_dinamica, espera_segundos=2.5):
-                await browser.close()
-                return False
+    # Passo 4: Envio do Relatório Final (o bot não responde ao relatório)
+    logger.info("PLAYWRIGHT 📄 Transmitindo relatório detalhado...")
+    if not await enviar_passo("relatorio", message, aguardar_resposta=False):
+        return False
 
-            # Passo 2: Opção 1
-            if not await enviar_passo("1", espera_segundos=2.0):
-                await browser.close()
-                return False
+    total = time.perf_counter() - inicio_dialogo
+    logger.info("PLAYWRIGHT 🎉 Diálogo e Relatório concluídos com sucesso em %.1fs!", total)
+    return True
 
-            # Passo 3: Opção 3
-            if not await enviar_passo("3", espera_segundos=2.0):
-                await browser.close()
-                return False
 
-            # Passo 4: Envio do Relatório Final
-            print("PLAYWRIGHT 📄 Transmitindo relatório detalhado...")
-            if not await enviar_passo(message, espera_segundos=5.0):
-                await browser.close()
-                return False
+async def send_whatsapp_with_playwright(phone: str, message: str) -> bool:
+    """
+    Automates sending WhatsApp messages using Playwright Chromium with interactive dialogue.
+    Simulates human typing rhythm: Saudacao -> '1' -> '3' -> Relatorio.
+    Handles cross-platform session path resolution (Linux/Windows).
+
+    This one-shot path launches its own browser; the API uses the warm
+    WhatsAppBrowserPool from app.services.browser_pool instead. Every phase
+    is recorded on a timeline (and a Playwright trace when enabled).
+    """
+    with timeline_recorder.timeline("send_oneshot", phone=phone):
+        async with async_playwright() as p:
+            with span("launch"):
+                browser = await p.chromium.launch(
+                    headless=False,
+                    args=CHROMIUM_ARGS
+                )
+            # Estado da sessão mantido em memória pelo gerenciador (lido do disco uma vez)
+            estado_sessao = await asyncio.to_thread(session_state.load)
+            with span("new_context", session=estado_sessao is not None):
+                if estado_sessao is not None:
+                    logger.info("PLAYWRIGHT 🔑 Carregando sessão existente: %s", SESSION_FILE)
+                    context = await browser.new_context(
+                        storage_state=estado_sessao,
+                        user_agent=USER_AGENT
+                    )
+                else:
+                    logger.info("PLAYWRIGHT 🆕 Nenhuma sessão encontrada. Iniciando novo contexto para autenticação...")
+                    context = await browser.new_context(user_agent=USER_AGENT)
+
+            trace = trace_path(f"oneshot_{phone}")
+            if trace is not None:
+                await context.tracing.start(screenshots=True, snapshots=True)
+
+            page = await context.new_page()
+
+            try:
+                if not await abrir_chat(page, phone):
+                    return False
+
+                # Salva o estado da sessão IMEDIATAMENTE após a autenticação confirmada
+                with span("storage_state", force=True):
+                    if await asyncio.to_thread(
+                        session_state.update, await context.storage_state(), True
+                    ):
+                        logger.info("PLAYWRIGHT 💾 Estado da sessão armazenado no disco!")
 
-            print("PLAYWRIGHT 🎉 Diálogo e Relatório concluídos com sucesso!")
+                if not await aguardar_chat_pronto(page):
+                    return False
 
-            # Salva o estado da sessão autenticada convertendo o Path para string
-            await context.storage_state(path=str(session_file))
-            await browser.close()
-            return True
+                if not await executar_dialogo(page, message):
+                    return False
 
-        except (PlaywrightError, asyncio.TimeoutError) as err:
-            print(f"PLAYWRIGHT ❌ Erro na automação: {str(err)}")
-            await browser.close()
-            return False
+                # Atualiza o estado em memória; o disco só é gravado se algo mudou
+                with span("storage_state", force=False):
+                    await asyncio.to_thread(session_state.update, await context.storage_state())
+                return True
+
+            except (PlaywrightError, asyncio.TimeoutError) as err:
+                logger.error("PLAYWRIGHT ❌ Erro na automação: %s", err)
+                return False
+            finally:
+                if trace is not None:
+                    try:
+                        trace.parent.mkdir(parents=True, exist_ok=True)
+                        await context.tracing.stop(path=str(trace))
+                        logger.info("PLAYWRIGHT 🧭 Trace salvo em %s", trace)
+                    except PlaywrightError as err:
+                        logger.warning("PLAYWRIGHT ⚠️ Falha ao salvar o trace: %s", err)
+                await browser.close()
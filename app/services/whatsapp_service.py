@@ -1,87 +1,419 @@
 # app/services/whatsapp_service.py
-from multiprocessing import Process, Event
+"""
+Process-isolated WhatsApp automation workers under a supervisor.
 
+Each account gets a slot with one worker process running its own event loop
+and WhatsAppBrowserPool (WhatsApp Web allows a single tab per account). The
+supervisor feeds each slot through a queue, watches heartbeats, restarts a
+worker that crashes or hangs, and recycles it after a configurable number of
+sends or when its RSS (worker + Chromium) passes a threshold, so memory stays
+bounded over days of operation. Enabled with WHATSAPP_ENGINE=process.
 
-from typing import Any
+The heartbeat runs on the worker's own loop, so it only proves the loop is
+alive: a send stuck on an await keeps heartbeating. Each send therefore also
+has a deadline, counted from the worker's "started" event, after which the
+worker is killed and restarted like a hung one.
+"""
 
-class WhatsAppService:
-    async def send_message(self, phone_number: str, message: str) -> dict[str, Any]:
-        """FastAPI wrapper for full WhatsApp automation with greeting, with extra logging for debugging."""
-        try:
-            # Clean the message to prevent emoji encoding issues
-            clean_message = message.encode("ascii", "ignore").decode("ascii")
-            if not clean_message.strip():
-                clean_message = "Gas consumption data message"
-
-            print(f"[WHATSAPP SERVICE] Starting full WhatsApp workflow for {phone_number}")
-            print(f"[WHATSAPP SERVICE] Original message length: {len(message)} chars")
-            print(f"[WHATSAPP SERVICE] Cleaned message length: {len(clean_message)} chars")
-
-            # Start process and return immediately (fire and forget)
-            from app.services.whatsapp_automation import run_send_whatsapp_with_greeting
-
-            stop_event = Event()
-            p = Process(
-                target=run_send_whatsapp_with_greeting,
-                args=(phone_number, clean_message, stop_event),
-            )
-            p.start()
-
-            print(f"[WHATSAPP SERVICE] WhatsApp process started with PID: {p.pid}")
-            # Wait briefly to check if process is alive
-            import time
-            time.sleep(2)
-            if not p.is_alive():
-                print("[WHATSAPP SERVICE][ERROR] WhatsApp process exited early. Check logs for details.")
-                return {
-                    "status": "error",
-                    "message": "WhatsApp process failed to start. Check backend logs for details.",
-                    "pid": p.pid,
-                }
-
-            return {
-                "status": "sent",
-                "message": "WhatsApp automation started successfully",
-                "pid": p.pid,
-            }
+import asyncio
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
 
-        except Exception as e:
-            print(f"[WHATSAPP SERVICE][ERROR] Error in send_message: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return {
-                "status": "error",
-                "message": f"Exception in send_message: {str(e)}"
-            }
+from app.services.log import get_logger
+from app.services.progress import ProgressCallback
+from app.services.timeline import timeline_recorder
+
+logger = get_logger(__name__)
+
+# "thread" (loop de automação no processo da API) ou "process" (workers isolados)
+ENGINE_MODE = os.getenv("WHATSAPP_ENGINE", "thread").lower()
+
+HEARTBEAT_INTERVAL_S = float(os.getenv("WHATSAPP_WORKER_HEARTBEAT_S", "10"))
+# O aquecimento pode esperar até 120s pelo QR Code; o heartbeat continua nesse período
+HANG_TIMEOUT_S = float(os.getenv("WHATSAPP_WORKER_HANG_TIMEOUT_S", "90"))
+# Prazo de um envio no worker (reconexão + abertura do chat + diálogo completo)
+SEND_TIMEOUT_S = float(os.getenv("WHATSAPP_WORKER_SEND_TIMEOUT_S", "300"))
+MAX_SENDS_PER_WORKER = int(os.getenv("WHATSAPP_WORKER_MAX_SENDS", "200"))
+MAX_RSS_MB = float(os.getenv("WHATSAPP_WORKER_MAX_RSS_MB", "1500"))
+MONITOR_INTERVAL_S = float(os.getenv("WHATSAPP_WORKER_MONITOR_S", "5"))
+
+# spawn em todas as plataformas: evita herdar threads e loops do processo da API
+_CTX = mp.get_context("spawn")
+
+
+async def _worker_async(
+    slot_id: str, session_path: str, task_queue: Any, event_queue: Any
+) -> None:
+    """Event loop of a worker process: warm the browser and serve tasks."""
+    # Importações pesadas apenas no processo filho
+    from app.services.browser_pool import WhatsAppBrowserPool
+    from app.services.browser_profile import rss_mb
+    from app.services.session_state import SessionStateManager
+
+    pool = WhatsAppBrowserPool(session=SessionStateManager(Path(session_path)), name=slot_id)
+    # As timelines são exportadas pelo processo da API, que recebe cópia de cada uma
+    timeline_recorder.export_dir = None
+    sends = 0
+
+    async def heartbeat() -> None:
+        while True:
+            rss = rss_mb(os.getpid())
+            try:
+                status = await pool.status()
+                browser_rss = (status.get("resources") or {}).get("rss_mb")
+            except Exception:  # pylint: disable=broad-except
+                browser_rss = None
+            total = None if rss is None else rss + (browser_rss or 0.0)
+            event_queue.put(("heartbeat", slot_id, os.getpid(), sends, total))
+            await asyncio.sleep(HEARTBEAT_INTERVAL_S)
+
+    # O heartbeat começa antes do aquecimento para não parecer travamento
+    heartbeat_task = asyncio.create_task(heartbeat())
+    await pool.start()
+    try:
+        while True:
+            task: Optional[Tuple[int, str, str]] = await asyncio.to_thread(task_queue.get)
+            if task is None:
+                break
+            task_id, phone, message = task
+            event_queue.put(("started", slot_id, task_id))
+
+            def report(step: str, detail: Dict[str, Any], task_id: int = task_id) -> None:
+                event_queue.put(("progress", slot_id, task_id, step, detail))
+
+            try:
+                sucesso = await pool.send(phone=phone, message=message, progress=report)
+                event_queue.put(("result", slot_id, task_id, sucesso, None))
+            except Exception as e:  # pylint: disable=broad-except
+                event_queue.put(("result", slot_id, task_id, False, str(e)))
+            if pool.last_timeline is not None:
+                event_queue.put(("timeline", slot_id, pool.last_timeline.to_dict()))
+            sends += 1
+    finally:
+        heartbeat_task.cancel()
+        await pool.close()
+
+
+def _worker_main(slot_id: str, session_path: str, task_queue: Any, event_queue: Any) -> None:
+    """Entry point of a worker process."""
+    logger.info("[WHATSAPP WORKER] Worker '%s' iniciado (PID %s)", slot_id, os.getpid())
+    asyncio.run(_worker_async(slot_id, session_path, task_queue, event_queue))
+    logger.info("[WHATSAPP WORKER] Worker '%s' encerrado (PID %s)", slot_id, os.getpid())
+
+
+@dataclass
+class _Task:
+    """A send submitted to a slot and its result future."""
+
+    phone: str
+    message: str
+    future: "asyncio.Future[bool]"
+    progress: Optional[ProgressCallback] = None
+    started: bool = False
+    # Momento (monotonic) em que o worker começou o envio
+    started_at: Optional[float] = None
+
+
+@dataclass
+class _Slot:
+    """One account's worker: its current process, queue and bookkeeping."""
+
+    slot_id: str
+    session_path: str
+    task_queue: Any = None
+    process: Optional[Any] = None
+    tasks: Dict[int, _Task] = field(default_factory=dict)
+    last_heartbeat: float = 0.0
+    sends: int = 0
+    rss_mb: Optional[float] = None
+    recycling: bool = False
+    restarts: int = 0
+    recycles: int = 0
 
-    async def send_test_message(self, phone_number: str, message: str) -> dict[str, Any]:
-        """FastAPI wrapper for simple test message (no greeting sequence)"""
+
+class WorkerSupervisor:
+    """Starts, monitors, restarts and recycles the worker processes."""
+
+    def __init__(
+        self,
+        max_sends: int = MAX_SENDS_PER_WORKER,
+        max_rss_mb: float = MAX_RSS_MB,
+        hang_timeout: float = HANG_TIMEOUT_S,
+        send_timeout: float = SEND_TIMEOUT_S,
+    ) -> None:
+        """Nothing runs until start()."""
+        self.max_sends = max_sends
+        self.max_rss_mb = max_rss_mb
+        self.hang_timeout = hang_timeout
+        self.send_timeout = send_timeout
+        self._slots: Dict[str, _Slot] = {}
+        self._event_queue: Any = None
+        self._ids = itertools.count(1)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reader: Optional[threading.Thread] = None
+        self._monitor: Optional[asyncio.Task] = None
+        self._stopping = threading.Event()
+
+    async def start(self, accounts: Dict[str, Path]) -> None:
+        """Spawn one worker per account and start monitoring them."""
+        if self._monitor is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._event_queue = _CTX.Queue()
+        self._stopping.clear()
+        for slot_id, session_path in accounts.items():
+            slot = _Slot(slot_id=slot_id, session_path=str(session_path))
+            self._slots[slot_id] = slot
+            self._spawn(slot, fresh_queue=True)
+
+        self._reader = threading.Thread(
+            target=self._read_events, name="whatsapp-worker-events", daemon=True
+        )
+        self._reader.start()
+        self._monitor = asyncio.create_task(self._monitor_loop(), name="whatsapp-worker-monitor")
+
+    async def stop(self, timeout: float = 20.0) -> None:
+        """Ask every worker to finish, then terminate stragglers."""
+        if self._monitor is not None:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+            self._monitor = None
+        for slot in self._slots.values():
+            slot.task_queue.put(None)
+        for slot in self._slots.values():
+            if slot.process is not None:
+                await asyncio.to_thread(slot.process.join, timeout)
+                if slot.process.is_alive():
+                    slot.process.kill()
+                    # Colhe o processo fora do loop da API
+                    await asyncio.to_thread(slot.process.join, 5)
+            self._fail_tasks(slot, only_started=False, reason="Worker encerrado")
+        self._stopping.set()
+        if self._reader is not None:
+            await asyncio.to_thread(self._reader.join, 5)
+            self._reader = None
+        self._slots.clear()
+
+    async def send(
+        self,
+        slot_id: str,
+        phone: str,
+        message: str,
+        progress: Optional[ProgressCallback] = None,
+    ) -> bool:
+        """Queue a send for an account's worker and await its result."""
+        slot = self._slots.get(slot_id)
+        if slot is None:
+            raise RuntimeError(f"No worker for account '{slot_id}'")
+        task_id = next(self._ids)
+        future: "asyncio.Future[bool]" = asyncio.get_running_loop().create_future()
+        slot.tasks[task_id] = _Task(
+            phone=phone, message=message, future=future, progress=progress
+        )
+        slot.task_queue.put((task_id, phone, message))
         try:
-            print(f"Starting test message for {phone_number}")
+            return await future
+        finally:
+            slot.tasks.pop(task_id, None)
+
+    def _spawn(self, slot: _Slot, fresh_queue: bool) -> None:
+        """Start a worker process for a slot, optionally with a rebuilt queue."""
+        if fresh_queue or slot.task_queue is None:
+            slot.task_queue = _CTX.Queue()
+            # Reenfileira o que ainda não tinha começado no worker anterior
+            for task_id, task in slot.tasks.items():
+                if not task.started:
+                    slot.task_queue.put((task_id, task.phone, task.message))
+        slot.process = _CTX.Process(
+            target=_worker_main,
+            args=(slot.slot_id, slot.session_path, slot.task_queue, self._event_queue),
+            name=f"whatsapp-worker-{slot.slot_id}",
+            daemon=True,
+        )
+        slot.process.start()
+        slot.last_heartbeat = time.monotonic()
+        slot.sends = 0
+        slot.rss_mb = None
+        slot.recycling = False
+
+    def _fail_tasks(self, slot: _Slot, only_started: bool, reason: str) -> None:
+        """Fail the futures of tasks lost with a worker."""
+        for task_id, task in list(slot.tasks.items()):
+            if only_started and not task.started:
+                continue
+            if not task.future.done():
+                task.future.set_exception(RuntimeError(reason))
+            slot.tasks.pop(task_id, None)
+
+    def _read_events(self) -> None:
+        """Forward worker events to the API loop (runs in a thread)."""
+        while not self._stopping.is_set():
+            try:
+                event = self._event_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._handle_event, event)
+
+    def _handle_event(self, event: Tuple[Any, ...]) -> None:
+        """Apply a heartbeat, started or result event (API loop)."""
+        kind, slot_id = event[0], event[1]
+        slot = self._slots.get(slot_id)
+        if slot is None:
+            return
+        if kind == "heartbeat":
+            _, _, pid, sends, rss = event
+            if slot.process is not None and slot.process.pid == pid:
+                slot.last_heartbeat = time.monotonic()
+                slot.sends = sends
+                slot.rss_mb = rss
+        elif kind == "started":
+            task = slot.tasks.get(event[2])
+            if task is not None:
+                task.started = True
+                task.started_at = time.monotonic()
+        elif kind == "timeline":
+            timeline_recorder.record(event[2])
+        elif kind == "progress":
+            _, _, task_id, step, detail = event
+            task = slot.tasks.get(task_id)
+            if task is not None and task.progress is not None:
+                task.progress(step, detail)
+        elif kind == "result":
+            _, _, task_id, sucesso, error = event
+            task = slot.tasks.get(task_id)
+            if task is not None and not task.future.done():
+                if error:
+                    task.future.set_exception(RuntimeError(error))
+                else:
+                    task.future.set_result(bool(sucesso))
+            slot.sends += 1
+
+    async def _monitor_loop(self) -> None:
+        """Restart dead or hung workers and recycle bloated ones."""
+        while True:
+            await asyncio.sleep(MONITOR_INTERVAL_S)
+            for slot in list(self._slots.values()):
+                await self._check_slot(slot)
+
+    async def _check_slot(self, slot: _Slot) -> None:
+        """Restart, recycle or leave one worker alone, never blocking the loop."""
+        process = slot.process
+        if process is None:
+            return
 
-            # Start process and return immediately (fire and forget)
-            from app.services.whatsapp_automation import run_send_simple_test_message
+        if not process.is_alive():
+            if slot.recycling and process.exitcode == 0:
+                logger.info("[WHATSAPP SERVICE] ♻️ Worker '%s' reciclado", slot.slot_id)
+                slot.recycles += 1
+                self._spawn(slot, fresh_queue=False)
+            else:
+                logger.error(
+                    "[WHATSAPP SERVICE][ERROR] Worker '%s' morreu (exitcode=%s). Reiniciando...",
+                    slot.slot_id,
+                    process.exitcode,
+                )
+                self._restart(slot, "Worker encerrado inesperadamente")
+            return
 
-            stop_event = Event()
-            p = Process(
-                target=run_send_simple_test_message,
-                args=(phone_number, message, stop_event),
+        if time.monotonic() - slot.last_heartbeat > self.hang_timeout:
+            logger.error("[WHATSAPP SERVICE][ERROR] Worker '%s' sem heartbeat. Reiniciando...", slot.slot_id)
+            await self._kill_and_restart(slot, "Worker travado foi reiniciado")
+            return
+
+        # O heartbeat segue vivo com um envio preso num await: o prazo por envio cobre esse caso
+        idade = self._oldest_send_age(slot)
+        if idade is not None and idade > self.send_timeout:
+            logger.error(
+                "[WHATSAPP SERVICE][ERROR] Envio no worker '%s' passou de %.0fs. Reiniciando...",
+                slot.slot_id,
+                self.send_timeout,
+            )
+            await self._kill_and_restart(slot, "Envio excedeu o prazo; worker reiniciado")
+            return
+
+        if not slot.recycling and (
+            slot.sends >= self.max_sends
+            or (slot.rss_mb is not None and slot.rss_mb > self.max_rss_mb)
+        ):
+            logger.info(
+                "[WHATSAPP SERVICE] ♻️ Reciclando worker '%s' (envios=%s, rss=%.0f MB)",
+                slot.slot_id,
+                slot.sends,
+                slot.rss_mb or 0,
             )
-            p.start()
+            slot.recycling = True
+            # O worker termina o que já pegou e sai ao ler a sentinela
+            slot.task_queue.put(None)
+
+    async def _kill_and_restart(self, slot: _Slot, reason: str) -> None:
+        """Kill a stuck worker and restart it, failing its in-flight tasks."""
+        assert slot.process is not None
+        slot.process.kill()
+        # join() bloqueia até o SIGKILL ser entregue: espera em outra thread
+        await asyncio.to_thread(slot.process.join, 5)
+        self._restart(slot, reason)
+
+    @staticmethod
+    def _oldest_send_age(slot: _Slot) -> Optional[float]:
+        """Seconds since the oldest in-flight send of a slot started (None when idle)."""
+        inicios = [t.started_at for t in slot.tasks.values() if t.started_at is not None]
+        return time.monotonic() - min(inicios) if inicios else None
+
+    def _restart(self, slot: _Slot, reason: str) -> None:
+        """Fail in-flight tasks, rebuild the queue and spawn a new worker."""
+        self._fail_tasks(slot, only_started=True, reason=reason)
+        slot.restarts += 1
+        self._spawn(slot, fresh_queue=True)
 
-            print(f"Test process started with PID: {p.pid}")
-            return {
-                "status": "sent",
-                "message": "WhatsApp test started successfully",
-                "pid": p.pid,
+    def stats(self) -> Dict[str, Any]:
+        """Per-worker pid, liveness, sends, RSS, queue depth, oldest send age and restarts."""
+        now = time.monotonic()
+        idades = {slot_id: self._oldest_send_age(slot) for slot_id, slot in self._slots.items()}
+        return {
+            slot_id: {
+                "pid": slot.process.pid if slot.process else None,
+                "alive": bool(slot.process and slot.process.is_alive()),
+                "sends": slot.sends,
+                "rss_mb": round(slot.rss_mb, 1) if slot.rss_mb is not None else None,
+                "heartbeat_age_s": round(now - slot.last_heartbeat, 1),
+                "queued": sum(1 for t in slot.tasks.values() if not t.started),
+                "in_flight": sum(1 for t in slot.tasks.values() if t.started),
+                "oldest_send_age_s": round(idades[slot_id], 1) if idades[slot_id] is not None else None,
+                "recycling": slot.recycling,
+                "restarts": slot.restarts,
+                "recycles": slot.recycles,
             }
+            for slot_id, slot in self._slots.items()
+        }
+
+
+class WhatsAppService:
+    """FastAPI-facing wrapper around the supervised worker processes."""
+
+    def __init__(self, supervisor: Optional[WorkerSupervisor] = None) -> None:
+        """Use the given supervisor or create one."""
+        self.supervisor = supervisor or WorkerSupervisor()
+
+    async def send_message(
+        self,
+        account: str,
+        phone_number: str,
+        message: str,
+        progress: Optional[ProgressCallback] = None,
+    ) -> bool:
+        """Run the full dialogue for one recipient on the account's worker."""
+        logger.info("[WHATSAPP SERVICE] Enviando para %s pela conta '%s'", phone_number, account)
+        return await self.supervisor.send(account, phone_number, message, progress)
+
 
-        except Exception as e:
-            print(f"Error in send_test_message: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            match e:
-                case ValueError() as ve:
-                    raise Exception(f"Failed to send test WhatsApp (value error): {ve}")
-                case _:
-                    raise Exception(f"Failed to send test WhatsApp: {str(e)}")
+whatsapp_service = WhatsAppService()
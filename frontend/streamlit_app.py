@@ -1,8 +1,14 @@
 """frontend/streamlit_app.py"""
 
+import hashlib
+import json
+import time
+from datetime import datetime
+
 import pandas as pd  # type: ignore[import]
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
 
 st.set_page_config(
     page_title="Gas Consumption Manager",
@@ -17,11 +23,133 @@ st.markdown("---")
 # API base URL
 API_BASE = "http://localhost:8000/api/v1"
 
+# Rótulos dos marcos transmitidos pelo backend durante o envio
+PROGRESS_LABELS = {
+    "queued": "📥 Envio enfileirado",
+    "scheduled": "⏳ Liberado pelo limitador de envio",
+    "browser_ready": "🌐 Navegador pronto",
+    "chat_open": "💬 Conversa aberta",
+    "saudacao": "🤝 Saudação enviada",
+    "opcao_1": "1️⃣ Opção 1 enviada",
+    "opcao_3": "3️⃣ Opção 3 enviada",
+    "relatorio": "📄 Relatório enviado",
+    "confirmed": "✅ Entrega confirmada",
+    "failed": "❌ Falha no envio",
+}
+
+
+# Resultados de upload mantidos em cache (por hash do arquivo e mês)
+UPLOAD_CACHE_TTL_S = 3600
+UPLOAD_CACHE_ENTRIES = 32
+
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """
+    One keep-alive session shared by every rerun and browser tab, so calls
+    to the backend reuse pooled TCP connections instead of opening new ones.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def file_digest(content: bytes) -> str:
+    """Cache key of an uploaded workbook."""
+    return hashlib.sha256(content).hexdigest()
+
+
+@st.cache_data(ttl=UPLOAD_CACHE_TTL_S, max_entries=UPLOAD_CACHE_ENTRIES, show_spinner=False)
+def cached_upload(api_base: str, digest: str, target_month: str, filename: str, _content: bytes):
+    """
+    process_upload() memoized by file hash and month: reruns and page changes
+    with the same file selected do not send the workbook again. Errors are
+    not cached. (``_content`` is left out of Streamlit's hashing; the digest
+    stands for it.)
+    """
+    del digest  # só compõe a chave do cache
+    return process_upload(api_base, filename, _content, target_month)
+
+
+@st.cache_data(max_entries=UPLOAD_CACHE_ENTRIES, show_spinner=False)
+def display_frame(data_key: tuple, _records: list) -> pd.DataFrame:
+    """DataFrame shown on the Upload and Preview pages, built once per upload."""
+    del data_key
+    df = pd.DataFrame(_records)
+    if "valor_final_rs" in df.columns:
+        df["valor_final_rs"] = df["valor_final_rs"].apply(lambda x: f"{float(x):.2f}")
+    return df
+
+
+@st.cache_data(max_entries=UPLOAD_CACHE_ENTRIES, show_spinner=False)
+def summary_stats(data_key: tuple, _records: list) -> dict:
+    """Totals of the Preview page, computed once per upload."""
+    del data_key
+    df = pd.DataFrame(_records)
+    return {
+        "apartments": len(df),
+        "consumption": float(pd.to_numeric(df["consumo_m3"], errors="coerce").sum()),
+        "value": float(pd.to_numeric(df["valor_final_rs"], errors="coerce").sum()),
+    }
+
+
+def process_upload(api_base: str, filename: str, content: bytes, target_month: str):
+    """
+    Submit the workbook as a background job and poll until its result is
+    ready. Returns the result payload or raises RuntimeError with the error.
+    """
+    http = get_http_session()
+    response = http.post(
+        f"{api_base}/upload-excel/jobs",
+        files={"file": (filename, content)},
+        params={"target_month": target_month},
+        timeout=30,
+    )
+    if response.status_code != 200:
+        raise RuntimeError(response.text)
+    job_id = response.json()["job_id"]
+
+    # Cada consulta é curta; o processamento pesado continua no servidor
+    deadline = time.monotonic() + 600
+    while time.monotonic() < deadline:
+        status = http.get(f"{api_base}/upload-excel/jobs/{job_id}", timeout=10)
+        status.raise_for_status()
+        if status.json()["status"] in ("done", "failed"):
+            break
+        time.sleep(0.5)
+
+    result = http.get(f"{api_base}/upload-excel/jobs/{job_id}/result", timeout=30)
+    if result.status_code != 200:
+        raise RuntimeError(result.text)
+    return result.json()
+
+
+def stream_progress(api_base: str, job_id: str):
+    """Yield (step, event) pairs from the job's Server-Sent Events stream."""
+    with get_http_session().get(
+        f"{api_base}/send-whatsapp/batch/{job_id}/events",
+        stream=True,
+        timeout=(5, 60),  # leitura renovada pelos keepalives do servidor
+    ) as response:
+        response.raise_for_status()
+        step = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                step = line[len("event: "):]
+            elif line.startswith("data: ") and step:
+                yield step, json.loads(line[len("data: "):])
+                step = None
+
 # Centralização Segura e Limpa do Estado Global da Aplicação
 if "gas_data" not in st.session_state:
     st.session_state.gas_data = None
 if "selected_month_str" not in st.session_state:
     st.session_state.selected_month_str = ""
+if "gas_data_key" not in st.session_state:
+    # (hash do arquivo, mês) dos dados atuais: chave dos cálculos em cache
+    st.session_state.gas_data_key = None
 
 # Menu Lateral de Navegação
 st.sidebar.title("Navigation")
@@ -91,33 +219,26 @@ if page == "📊 Upload Data":
     if uploaded_file:
         with st.spinner("Processing file..."):
             try:
-                files = {"file": (uploaded_file.name, uploaded_file.getvalue())}
-                params = {"target_month": TARGET_MONTH}
-                response = requests.post(
-                    f"{API_BASE}/upload-excel",
-                    files=files,
-                    params=params,
-                    timeout=30,
+                # O backend processa em segundo plano; aqui só acompanhamos o job.
+                # Reexecuções com o mesmo arquivo e mês respondem do cache
+                content = uploaded_file.getvalue()
+                digest = file_digest(content)
+                st.session_state.gas_data = cached_upload(
+                    API_BASE, digest, TARGET_MONTH, uploaded_file.name, content
                 )
-
-                if response.status_code == 200:
-                    st.session_state.gas_data = response.json()
-                    st.success("✅ File processed successfully!")
-                    st.info(f"📅 Filtered data for: {TARGET_MONTH}")
-
-                    # Extrai os dados internos para exibição imediata
-                    dados_internos = st.session_state.gas_data.get("data", [])
-                    if dados_internos:
-                        df = pd.DataFrame(dados_internos)
-                        if "valor_final_rs" in df.columns:
-                            df["valor_final_rs"] = df["valor_final_rs"].apply(
-                                lambda x: f"{float(x):.2f}"
-                            )
-                        st.dataframe(df, width="stretch")
-                    else:
-                        st.warning("⚠️ No data found matching the filters.")
+                st.session_state.gas_data_key = (digest, TARGET_MONTH)
+                st.success("✅ File processed successfully!")
+                st.info(f"📅 Filtered data for: {TARGET_MONTH}")
+
+                # Extrai os dados internos para exibição imediata
+                dados_internos = st.session_state.gas_data.get("data", [])
+                if dados_internos:
+                    df = display_frame(st.session_state.gas_data_key, dados_internos)
+                    st.dataframe(df, width="stretch")
                 else:
-                    st.error(f"❌ Error: {response.text}")
+                    st.warning("⚠️ No data found matching the filters.")
+            except RuntimeError as e:
+                st.error(f"❌ Error: {str(e)}")
             except requests.RequestException as e:
                 st.error(f"❌ Network error processing file: {str(e)}")
             except ValueError as e:
@@ -134,28 +255,22 @@ elif page == "👀 Preview Data":
         data_alvo = data.get("target_date", st.session_state.selected_month_str)
         st.info(f"📅 Target Month: {data_alvo}")
 
-        df = pd.DataFrame(data["data"])
-
-        df_display = df.copy()
-        if "valor_final_rs" in df_display.columns:
-            df_display["valor_final_rs"] = df_display["valor_final_rs"].apply(
-                lambda x: f"{float(x):.2f}"
-            )
-
+        # Tabela e totais vêm do cache: trocar de página não refaz os cálculos
+        chave = st.session_state.gas_data_key
+        df_display = display_frame(chave, data["data"])
         st.dataframe(df_display, width="stretch")
 
         # Seção de Métricas Consolidadas (Conversão segura para Float)
         st.subheader("📈 Summary Statistics")
+        resumo = summary_stats(chave, data["data"])
         col1, col2, col3 = st.columns(3)
 
         with col1:
-            st.metric("Total Apartments", len(df))
+            st.metric("Total Apartments", resumo["apartments"])
         with col2:
-            total_consumption = pd.to_numeric(df["consumo_m3"], errors="coerce").sum()
-            st.metric("Total Consumption", f"{total_consumption:.3f} m³")
+            st.metric("Total Consumption", f"{resumo['consumption']:.3f} m³")
         with col3:
-            total_value = pd.to_numeric(df["valor_final_rs"], errors="coerce").sum()
-            st.metric("Total Value", f"R$ {total_value:.2f}")
+            st.metric("Total Value", f"R$ {resumo['value']:.2f}")
     else:
         st.warning("⚠️ Please upload an Excel file first!")
 
@@ -233,25 +348,48 @@ elif page == "📱 Send WhatsApp":
                     if len(phone_clean) == 11:
                         phone_clean = f"55{phone_clean}"
                         
-                    with st.spinner("🚀 Solicitando disparo ao servidor de automação..."):
-                        try:
-                            api_base = "http://127.0.0.1:8000/api/v1"
-                            
-                            send_response = requests.post(
-                                f"{api_base}/send-whatsapp",
-                                json={
-                                    "phone_number": phone_clean,  # Envia o número já formatado com 55
-                                    "message": mensagem_final,
-                                },
-                                timeout=300,  # 5 minutos
-                            )
-
-                            if send_response.status_code == 200:
+                    api_base = "http://127.0.0.1:8000/api/v1"
+                    try:
+                        # O backend responde na hora com o job; o progresso chega via SSE
+                        send_response = get_http_session().post(
+                            f"{api_base}/send-whatsapp/batch",
+                            json={
+                                "recipients": [
+                                    {
+                                        "phone_number": phone_clean,  # Já formatado com 55
+                                        "message": mensagem_final,
+                                        "priority": 1,
+                                    }
+                                ]
+                            },
+                            timeout=30,
+                        )
+                        if send_response.status_code != 200:
+                            st.error(f"❌ Falha no servidor de automação: {send_response.text}")
+                        else:
+                            job_id = send_response.json()["job_id"]
+                            resultado = None
+                            with st.status("🚀 Disparo em andamento...", expanded=True) as painel:
+                                for step, event in stream_progress(api_base, job_id):
+                                    if step == "job_completed":
+                                        break
+                                    hora = datetime.fromtimestamp(event["timestamp"])
+                                    rotulo = PROGRESS_LABELS.get(step, step)
+                                    detalhe = event["detail"].get("error", "")
+                                    st.write(f"`{hora:%H:%M:%S}` {rotulo} {detalhe}")
+                                    if step in ("confirmed", "failed"):
+                                        resultado = step
+                                painel.update(
+                                    label="Disparo finalizado",
+                                    state="complete" if resultado == "confirmed" else "error",
+                                )
+
+                            if resultado == "confirmed":
                                 st.success("🎉 Processo concluído com sucesso! Relatório transmitido.")
                             else:
-                                st.error(f"❌ Falha no servidor de automação: {send_response.text}")
-                        except requests.RequestException as req_err:
-                            st.error(f"❌ Erro de conexão com o backend: {str(req_err)}")
+                                st.error("❌ A automação não concluiu o envio.")
+                    except requests.RequestException as req_err:
+                        st.error(f"❌ Erro de conexão com o backend: {str(req_err)}")
                 else:
                     st.error("❌ Please enter a phone number.")
         except (KeyError, TypeError, ValueError) as e:
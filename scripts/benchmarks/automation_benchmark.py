@@ -0,0 +1,189 @@
+"""
+Throughput benchmark of the WhatsApp automation against the local mock.
+
+Starts scripts/benchmarks/mock_whatsapp.py in-process, points the automation
+at it (WHATSAPP_WEB_URL) and drives ``--concurrency`` warm browser pools, as
+the API does with several accounts, through ``--messages`` full dialogues.
+Reports messages per minute, p50/p95 latency of every dialogue step and of
+the whole send, and the Chromium memory of the pools. With
+``--mismatch-rate`` the mock opens the wrong chat on a share of the in-app
+searches; the report counts how each chat was opened and every send that
+ended in a chat other than its recipient's (which must stay at zero).
+
+    python scripts/benchmarks/automation_benchmark.py --messages 20 --concurrency 2
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from mock_whatsapp import create_app  # noqa: E402  pylint: disable=wrong-import-position
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile (None for an empty list)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return round(ordered[rank - 1], 3)
+
+
+def start_mock(port: int, args: argparse.Namespace) -> uvicorn.Server:
+    """Serve the mock WhatsApp Web in a background thread."""
+    app = create_app(
+        args.load_ms,
+        tick_ms=args.tick_ms,
+        reply_ms=args.reply_ms,
+        jitter_ms=args.jitter_ms,
+        search_ms=args.search_ms,
+        mismatch_rate=args.mismatch_rate,
+    )
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="mock-whatsapp", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """Warm the pools, send every message and collect the measurements."""
+    # Importados depois de WHATSAPP_WEB_URL apontar para o mock
+    from app.services.browser_pool import WhatsAppBrowserPool
+    from app.services.progress import STEP_CHAT_OPEN
+    from app.services.session_state import SessionStateManager
+
+    sessions = Path(tempfile.mkdtemp(prefix="whatsapp-bench-"))
+    pools = [
+        WhatsAppBrowserPool(
+            session=SessionStateManager(sessions / f"bench-{i}.json"),
+            health_check_interval=3600,
+            name=f"bench-{i}",
+        )
+        for i in range(args.concurrency)
+    ]
+    await asyncio.gather(*(pool.start() for pool in pools))
+
+    queue: "asyncio.Queue[str]" = asyncio.Queue()
+    for i in range(args.messages):
+        queue.put_nowait(f"5531900{i:06d}")
+
+    message = "Relatório de consumo de gás\n" + "🏠 Apartamento 101 | 12,345 m³ | R$ 98,76\n" * 20
+    send_times: List[float] = []
+    step_times: Dict[str, List[float]] = defaultdict(list)
+    navigation: Dict[str, int] = defaultdict(int)
+    failures = 0
+    wrong_chat = 0
+    peak_rss = 0.0
+
+    def on_progress(step: str, data: Dict[str, Any]) -> None:
+        if step == STEP_CHAT_OPEN:
+            navigation[data["navigation"]] += 1
+
+    async def worker(pool: WhatsAppBrowserPool) -> None:
+        nonlocal failures, wrong_chat
+        while not queue.empty():
+            phone = queue.get_nowait()
+            inicio = time.perf_counter()
+            sucesso = await pool.send(phone, message, on_progress)
+            if not sucesso:
+                failures += 1
+                continue
+            send_times.append(time.perf_counter() - inicio)
+            # O mock marca o chat aberto com o número; o relatório deve ter ido ao destinatário
+            aberto = await pool._page.evaluate(  # pylint: disable=protected-access
+                "() => document.getElementById('main')?.dataset.phone || ''"
+            )
+            if aberto != phone:
+                wrong_chat += 1
+            for timing in pool.last_timings:
+                total = timing.envio_s + timing.confirmacao_s + (timing.resposta_s or 0.0)
+                step_times[timing.passo].append(total)
+
+    async def memory_sampler() -> None:
+        nonlocal peak_rss
+        while True:
+            statuses = await asyncio.gather(*(pool.status() for pool in pools))
+            rss = sum((s.get("resources") or {}).get("rss_mb") or 0.0 for s in statuses)
+            peak_rss = max(peak_rss, rss)
+            await asyncio.sleep(1)
+
+    sampler = asyncio.create_task(memory_sampler())
+    inicio = time.perf_counter()
+    await asyncio.gather(*(worker(pool) for pool in pools))
+    elapsed = time.perf_counter() - inicio
+    sampler.cancel()
+
+    statuses = await asyncio.gather(*(pool.status() for pool in pools))
+    await asyncio.gather(*(pool.close() for pool in pools))
+
+    return {
+        "messages": args.messages,
+        "concurrency": args.concurrency,
+        "navigation": os.environ.get("WHATSAPP_CHAT_NAVIGATION", "inapp"),
+        "sent": len(send_times),
+        "failed": failures,
+        "wrong_chat": wrong_chat,
+        "chat_navigation": dict(navigation),
+        "elapsed_s": round(elapsed, 3),
+        "messages_per_min": round(len(send_times) / elapsed * 60, 2) if elapsed else 0.0,
+        "send_latency_s": {"p50": percentile(send_times, 50), "p95": percentile(send_times, 95)},
+        "step_latency_s": {
+            step: {"p50": percentile(values, 50), "p95": percentile(values, 95)}
+            for step, values in step_times.items()
+        },
+        "browser_rss_mb": {
+            "peak": round(peak_rss, 1),
+            "final_per_pool": [(s.get("resources") or {}).get("rss_mb") for s in statuses],
+        },
+    }
+
+
+def main() -> None:
+    """Parse options, start the mock and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=2, help="warm pools (accounts)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--load-ms", type=int, default=300)
+    parser.add_argument("--search-ms", type=int, default=150)
+    parser.add_argument("--tick-ms", type=int, default=150)
+    parser.add_argument("--reply-ms", type=int, default=500)
+    parser.add_argument("--jitter-ms", type=int, default=100)
+    parser.add_argument("--navigation", choices=["inapp", "goto"], default="inapp")
+    parser.add_argument("--mismatch-rate", type=float, default=0.0, help="share of mock searches opening another chat")
+    parser.add_argument("--json", type=Path, help="also write the report to this file")
+    args = parser.parse_args()
+
+    os.environ["WHATSAPP_WEB_URL"] = f"http://127.0.0.1:{args.port}"
+    os.environ["WHATSAPP_CHAT_NAVIGATION"] = args.navigation
+    os.environ.setdefault("WHATSAPP_BROWSER_PROFILE", "lightweight")
+
+    server = start_mock(args.port, args)
+    try:
+        report = asyncio.run(run_benchmark(args))
+    finally:
+        server.should_exit = True
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Import-time report and startup budget check of the API module.
+
+Runs ``python -X importtime -c "import app.main"`` in fresh interpreters and
+reports the median cumulative import time of app.main, the most expensive
+top-level packages (self time) and the app modules. Exits with status 1 when
+the median exceeds ``--budget-ms`` or when a module that must load lazily
+(pandas, numpy, openpyxl, playwright) is imported at startup, so it can guard
+CI or a pre-commit hook.
+
+    python scripts/benchmarks/import_time.py --runs 5 --budget-ms 800
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Orçamento padrão (ms) para importar app.main
+DEFAULT_BUDGET_MS = float(os.getenv("WHATSAPP_IMPORT_BUDGET_MS", "800"))
+
+# Dependências que só podem carregar no primeiro uso ou no aquecimento
+LAZY_MODULES = ("pandas", "numpy", "openpyxl", "playwright")
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def run_once(module: str) -> Tuple[List[Tuple[str, int, int]], float]:
+    """Import ``module`` in a fresh interpreter; (name, self_us, cumulative_us) rows and wall ms."""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "PYTHONPATH": str(ROOT),
+            # Evita tocar no banco real da outbox durante a medição
+            "WHATSAPP_OUTBOX_DB": str(Path(tmp) / "outbox.sqlite3"),
+        }
+        inicio = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        wall_ms = (time.perf_counter() - inicio) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            rows.append((match.group(4), int(match.group(1)), int(match.group(2))))
+    return rows, wall_ms
+
+
+def build_report(module: str, runs: int, top: int) -> Dict[str, Any]:
+    """Median import time over ``runs`` interpreters plus a breakdown of the last one."""
+    totals: List[float] = []
+    walls: List[float] = []
+    rows: List[Tuple[str, int, int]] = []
+    for _ in range(runs):
+        rows, wall_ms = run_once(module)
+        cumulative = {name: cum for name, _, cum in rows}
+        totals.append(cumulative.get(module, 0) / 1000)
+        walls.append(wall_ms)
+
+    por_pacote: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in rows:
+        por_pacote[name.split(".")[0]] += self_us
+    loaded = {name for name, _, _ in rows}
+
+    return {
+        "module": module,
+        "runs": runs,
+        "import_ms": {"median": round(statistics.median(totals), 1), "max": round(max(totals), 1)},
+        "interpreter_wall_ms": round(statistics.median(walls), 1),
+        "top_packages_ms": {
+            name: round(us / 1000, 1)
+            for name, us in sorted(por_pacote.items(), key=lambda item: -item[1])[:top]
+        },
+        "app_modules_ms": {
+            name: round(cum / 1000, 1)
+            for name, _, cum in sorted(rows, key=lambda row: -row[2])
+            if name == "app" or name.startswith("app.")
+        },
+        "lazy_modules_loaded": sorted(
+            lazy for lazy in LAZY_MODULES if any(n == lazy or n.startswith(f"{lazy}.") for n in loaded)
+        ),
+    }
+
+
+def main() -> None:
+    """Print the report and enforce the budget."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="packages listed in the breakdown")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--json", type=Path, help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = build_report(args.module, max(1, args.runs), args.top)
+    report["budget_ms"] = args.budget_ms
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    falhas = []
+    if report["import_ms"]["median"] > args.budget_ms:
+        falhas.append(f"import of {args.module} took {report['import_ms']['median']} ms > {args.budget_ms} ms")
+    if report["lazy_modules_loaded"]:
+        falhas.append(f"loaded at startup: {', '.join(report['lazy_modules_loaded'])}")
+    for falha in falhas:
+        print(f"❌ {falha}", file=sys.stderr)
+    if falhas:
+        sys.exit(1)
+    print(f"✅ {args.module} within {args.budget_ms} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
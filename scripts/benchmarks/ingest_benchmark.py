@@ -0,0 +1,211 @@
+"""
+Micro-benchmarks of the Excel ingestion pipeline with regression thresholds.
+
+Times ExcelService.process_excel_content (end to end), its _format_dataframe
+and _filter_by_month stages and json_utils.format_message_with_styles on
+synthetic workbooks (synthetic_workbook.py) of every ``--sizes`` row count.
+Each case runs once to warm up and then ``--repeat`` times; the median is
+compared with the stored baseline (baselines/ingest.json) and the run exits
+with status 1 when a case is slower than the baseline by more than its
+threshold (default 25%) and by more than ``--min-delta-ms``, so a pandas or
+openpyxl upgrade that slows ingestion fails the check.
+
+Baselines depend on the machine: record one per host (or CI runner) with
+``--save-baseline`` before comparing. The library versions of the baseline
+are printed next to the current ones.
+
+    python scripts/benchmarks/ingest_benchmark.py --sizes 100,10000,100000 --repeat 3
+    python scripts/benchmarks/ingest_benchmark.py --save-baseline
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# Os logs INFO do ExcelService distorceriam as medições
+os.environ.setdefault("WHATSAPP_LOG_LEVEL", "WARNING")
+
+import numpy as np  # noqa: E402  pylint: disable=wrong-import-position
+import openpyxl  # noqa: E402  pylint: disable=wrong-import-position
+import pandas as pd  # noqa: E402  pylint: disable=wrong-import-position
+
+from app.services.excel_service import ExcelService  # noqa: E402  pylint: disable=wrong-import-position
+from app.services.json_utils import format_message_with_styles  # noqa: E402  pylint: disable=wrong-import-position
+from synthetic_workbook import cached_workbook  # noqa: E402  pylint: disable=wrong-import-position
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baselines" / "ingest.json"
+
+# Tolerância padrão: mais de 25% acima da linha de base é regressão
+DEFAULT_THRESHOLD = 0.25
+
+# Mês filtrado nos casos
+TARGET_MONTH = "03/2026"
+
+
+def environment() -> Dict[str, str]:
+    """Versions that explain a change in the timings."""
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "openpyxl": openpyxl.__version__,
+        "machine": f"{platform.system()} {platform.machine()}",
+    }
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Warm-up call, then ``repeat`` timed calls (seconds)."""
+    fn()
+    tempos: List[float] = []
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        fn()
+        tempos.append(time.perf_counter() - inicio)
+    return {
+        "median_s": round(statistics.median(tempos), 6),
+        "min_s": round(min(tempos), 6),
+        "max_s": round(max(tempos), 6),
+    }
+
+
+def build_cases(rows: int) -> Dict[str, Callable[[], Any]]:
+    """The four benchmarked calls on one workbook size, inputs prepared once."""
+    service = ExcelService()
+    # Um bloco por mês do ano: o mês filtrado traz ~1/12 das linhas em qualquer tamanho
+    content = cached_workbook(rows, apartments=max(4, math.ceil(rows / 12)))
+    raw = pd.read_excel(io.BytesIO(content), sheet_name="Gas_2026", header=0, engine="openpyxl")
+    formatted = service._format_dataframe(raw)  # pylint: disable=protected-access
+    # Mesmo formato que a API recebe em /format-message: os registros do mês filtrado
+    records = service.process_excel_content(content, TARGET_MONTH)["data"]
+    frame = pd.DataFrame(records)
+
+    return {
+        f"process_excel_content[{rows}]": lambda: service.process_excel_content(content, TARGET_MONTH),
+        f"_format_dataframe[{rows}]": lambda: service._format_dataframe(raw),  # pylint: disable=protected-access
+        f"_filter_by_month[{rows}]": lambda: service._filter_by_month(  # pylint: disable=protected-access
+            formatted, TARGET_MONTH
+        ),
+        f"format_message_with_styles[{rows}]": lambda: asyncio.run(
+            format_message_with_styles(frame, TARGET_MONTH)
+        ),
+    }
+
+
+def load_baseline(path: Path) -> Optional[Dict[str, Any]]:
+    """Stored baseline, or None when there is none yet."""
+    if not path.is_file():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Any],
+    threshold: Optional[float],
+    min_delta_s: float,
+) -> List[Dict[str, Any]]:
+    """One row per case: current vs baseline median and the verdict."""
+    linhas: List[Dict[str, Any]] = []
+    padrao = threshold if threshold is not None else baseline.get("threshold", DEFAULT_THRESHOLD)
+    for case, atual in results.items():
+        base = baseline.get("cases", {}).get(case)
+        linha: Dict[str, Any] = {"case": case, "median_s": atual["median_s"], "baseline_s": None}
+        if base is None:
+            linha["status"] = "new"
+        else:
+            limite = threshold if threshold is not None else base.get("threshold", padrao)
+            delta = atual["median_s"] - base["median_s"]
+            linha.update(
+                baseline_s=base["median_s"],
+                change_pct=round(delta / base["median_s"] * 100, 1) if base["median_s"] else None,
+                threshold_pct=round(limite * 100, 1),
+            )
+            regrediu = delta > base["median_s"] * limite and delta > min_delta_s
+            linha["status"] = "REGRESSION" if regrediu else "ok"
+        linhas.append(linha)
+    return linhas
+
+
+def print_report(linhas: List[Dict[str, Any]], baseline: Optional[Dict[str, Any]]) -> None:
+    """Aligned table of the comparison."""
+    if baseline is not None:
+        print(f"baseline: {json.dumps(baseline.get('environment', {}), ensure_ascii=False)}")
+    print(f"current:  {json.dumps(environment(), ensure_ascii=False)}\n")
+    largura = max(len(linha["case"]) for linha in linhas)
+    print(f"{'case':<{largura}}  {'median ms':>10}  {'baseline':>10}  {'change':>8}  status")
+    for linha in linhas:
+        base = f"{linha['baseline_s'] * 1000:10.2f}" if linha["baseline_s"] is not None else f"{'-':>10}"
+        change = f"{linha['change_pct']:+7.1f}%" if linha.get("change_pct") is not None else f"{'-':>8}"
+        print(f"{linha['case']:<{largura}}  {linha['median_s'] * 1000:10.2f}  {base}  {change}  {linha['status']}")
+
+
+def main() -> None:
+    """Run the cases, compare with (or save) the baseline and set the exit status."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="100,1000,10000", help="comma-separated row counts (up to 1000000)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--threshold", type=float, help="allowed slowdown as a fraction (overrides the baseline's)")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore slowdowns smaller than this")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args()
+
+    results: Dict[str, Dict[str, float]] = {}
+    for rows in (int(size) for size in args.sizes.split(",") if size.strip()):
+        for case, fn in build_cases(rows).items():
+            results[case] = measure(fn, args.repeat)
+            print(f"  {case}: {results[case]['median_s'] * 1000:.2f} ms", file=sys.stderr)
+
+    if args.json:
+        args.json.write_text(
+            json.dumps({"environment": environment(), "cases": results}, indent=2), encoding="utf-8"
+        )
+
+    if args.save_baseline:
+        anterior = load_baseline(args.baseline) or {}
+        casos = anterior.get("cases", {})
+        for case, atual in results.items():
+            # Mantém limites específicos já ajustados para o caso
+            casos[case] = {**casos.get(case, {}), "median_s": atual["median_s"]}
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(
+            json.dumps(
+                {
+                    "environment": environment(),
+                    "threshold": anterior.get("threshold", DEFAULT_THRESHOLD),
+                    "cases": casos,
+                },
+                indent=2,
+            )
+            + "\n",
+            encoding="utf-8",
+        )
+        print(f"Baseline salva em {args.baseline}")
+        return
+
+    baseline = load_baseline(args.baseline)
+    linhas = compare(results, baseline or {}, args.threshold, args.min_delta_ms / 1000)
+    print_report(linhas, baseline)
+    regressoes = [linha["case"] for linha in linhas if linha["status"] == "REGRESSION"]
+    if regressoes:
+        print(f"\n❌ {len(regressoes)} regressão(ões): {', '.join(regressoes)}")
+        sys.exit(1)
+    print("\n✅ Nenhuma regressão" if baseline else "\nℹ️ Sem baseline: rode com --save-baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+"""
+HTTP load test of one backend node.
+
+Starts the API locally through stub_server.py (browser automation replaced
+by a configurable-latency stub; ``--target`` uses a running server instead)
+and drives it with an async client. Every scenario runs at each
+``--concurrency`` level for ``--duration`` seconds: that many clients in a
+closed loop, each sending its next request as soon as the previous answers.
+
+Scenarios:
+
+- ``upload``: POST /upload-excel with a month filter
+- ``months``: POST /get-available-months
+- ``format``: POST /format-message with one month of records
+- ``send``: POST /send-whatsapp, a new recipient per request, followed on its
+  events stream until the first attempt is confirmed or fails
+- ``mixed``: all of the above, weighted by ``--mix``
+
+Workbooks come from synthetic_workbook.py, several variants (different
+seeds), so identical concurrent uploads do not all coalesce into one parse.
+For each scenario and level the report gives throughput, p50/p95/p99
+latency, the error rate and the peak RSS of the server process, and marks a
+level as saturated when throughput grew less than 10% over the previous one.
+
+    python scripts/benchmarks/load_test.py --scenarios upload,format,mixed --concurrency 1,4,16
+    python scripts/benchmarks/load_test.py --scenarios send --send-ms 2000 --concurrency 1,8,32
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from synthetic_workbook import cached_workbook  # noqa: E402  pylint: disable=wrong-import-position
+
+HERE = Path(__file__).resolve().parent
+API = "/api/v1"
+XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+SCENARIOS = ("upload", "months", "format", "send", "mixed")
+
+# Peso de cada tipo de requisição no cenário "mixed"
+DEFAULT_MIX = "upload:2,months:2,format:5,send:1"
+
+Request = Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile (None for an empty list)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return round(ordered[rank - 1], 4)
+
+
+def rss_mb(pid: int) -> Optional[float]:
+    """Resident memory of a process in MB, read from /proc (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        return None
+    return None
+
+
+def start_server(args: argparse.Namespace) -> subprocess.Popen:
+    """Launch stub_server.py and wait for /health."""
+    cmd = [
+        sys.executable,
+        str(HERE / "stub_server.py"),
+        "--port", str(args.port),
+        "--send-ms", str(args.send_ms),
+        "--jitter-ms", str(args.send_jitter_ms),
+        "--fail-rate", str(args.send_fail_rate),
+    ]
+    if args.production_rates:
+        cmd.append("--production-rates")
+    proc = subprocess.Popen(cmd)  # pylint: disable=consider-using-with
+    url = f"http://127.0.0.1:{args.port}{API}/health"
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        if proc.poll() is not None:
+            raise RuntimeError(f"stub_server.py saiu com código {proc.returncode}")
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("stub_server.py não respondeu /health em 60 s")
+
+
+class Workload:
+    """Request builders over the synthetic workbooks and their records."""
+
+    def __init__(self, rows: int, variants: int, month: str) -> None:
+        self.month = month
+        self.workbooks = [cached_workbook(rows, seed=seed) for seed in range(variants)]
+        # Registros por mês, preenchidos por prepare() a partir do próprio servidor
+        self.records: List[Tuple[str, list]] = []
+        self._phones = itertools.count()
+        self._run = f"{int(time.time()) % 100000:05d}"
+
+    async def prepare(self, client: httpx.AsyncClient) -> None:
+        """Parse every variant once through the API to get /format-message payloads."""
+        for content in self.workbooks:
+            response = await client.post(
+                f"{API}/upload-excel", files={"file": ("gas.xlsx", content, XLSX)}
+            )
+            response.raise_for_status()
+            por_mes: Dict[str, list] = defaultdict(list)
+            for record in response.json()["data"]:
+                por_mes[record["data_leitura"][3:]].append(record)
+            self.records.extend(
+                (records[0]["data_leitura"], records) for records in por_mes.values()
+            )
+
+    def upload(self, client: httpx.AsyncClient) -> Awaitable[httpx.Response]:
+        content = random.choice(self.workbooks)
+        return client.post(
+            f"{API}/upload-excel",
+            params={"target_month": self.month},
+            files={"file": ("gas.xlsx", content, XLSX)},
+        )
+
+    def months(self, client: httpx.AsyncClient) -> Awaitable[httpx.Response]:
+        content = random.choice(self.workbooks)
+        return client.post(f"{API}/get-available-months", files={"file": ("gas.xlsx", content, XLSX)})
+
+    def format(self, client: httpx.AsyncClient) -> Awaitable[httpx.Response]:
+        target_date, records = random.choice(self.records)
+        return client.post(f"{API}/format-message", json={"target_date": target_date, "data": records})
+
+    async def send(self, client: httpx.AsyncClient) -> httpx.Response:
+        # Destinatário novo a cada envio: o outbox não descarta como duplicata
+        phone = f"5531{self._run}{next(self._phones):06d}"
+        message = f"Consumo de gás {self.month}\n🏠 Apartamento 101 | 12,345 m³ | R$ 98,76"
+        response = await client.post(f"{API}/send-whatsapp", json={"phone_number": phone, "message": message})
+        if response.status_code != 202:
+            return response
+        # O POST só enfileira: a latência vai até o resultado da primeira tentativa
+        async with client.stream("GET", response.json()["events_url"]) as eventos:
+            async for line in eventos.aiter_lines():
+                if line == "event: confirmed":
+                    return response
+                if line in ("event: failed", "event: retry_scheduled"):
+                    return httpx.Response(500, request=response.request)
+        return httpx.Response(500, request=response.request)
+
+    def builder(self, scenario: str, mix: Dict[str, int]) -> Request:
+        """The request of a scenario (a weighted draw for "mixed")."""
+        if scenario != "mixed":
+            return getattr(self, scenario)
+        nomes = [nome for nome, peso in mix.items() if peso > 0]
+        pesos = [mix[nome] for nome in nomes]
+
+        def sortear(client: httpx.AsyncClient) -> Awaitable[httpx.Response]:
+            return getattr(self, random.choices(nomes, pesos)[0])(client)
+
+        return sortear
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    request: Request,
+    concurrency: int,
+    duration: float,
+    pid: Optional[int],
+) -> Dict[str, Any]:
+    """``concurrency`` closed-loop clients for ``duration`` seconds."""
+    latencias: List[float] = []
+    erros: Dict[str, int] = defaultdict(int)
+    pico_rss = rss_mb(pid) if pid else None
+    fim = time.perf_counter() + duration
+
+    async def cliente() -> None:
+        while time.perf_counter() < fim:
+            inicio = time.perf_counter()
+            try:
+                response = await request(client)
+                if response.status_code >= 400:
+                    erros[str(response.status_code)] += 1
+                    continue
+            except httpx.HTTPError as err:
+                erros[type(err).__name__] += 1
+                continue
+            latencias.append(time.perf_counter() - inicio)
+
+    async def amostrar_rss() -> None:
+        nonlocal pico_rss
+        while pid:
+            atual = rss_mb(pid)
+            if atual is not None:
+                pico_rss = max(pico_rss or 0.0, atual)
+            await asyncio.sleep(0.1)
+
+    amostrador = asyncio.create_task(amostrar_rss())
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - inicio
+    amostrador.cancel()
+
+    total = len(latencias) + sum(erros.values())
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(latencias) / elapsed, 2) if elapsed else 0.0,
+        "latency_s": {
+            "p50": percentile(latencias, 50),
+            "p95": percentile(latencias, 95),
+            "p99": percentile(latencias, 99),
+        },
+        "error_rate": round(sum(erros.values()) / total, 4) if total else 0.0,
+        "errors": dict(erros),
+        "peak_rss_mb": round(pico_rss, 1) if pico_rss is not None else None,
+    }
+
+
+async def run_load_test(args: argparse.Namespace, base_url: str, pid: Optional[int]) -> Dict[str, Any]:
+    """Every scenario at every concurrency level."""
+    mix = {nome: int(peso) for nome, peso in (item.split(":") for item in args.mix.split(","))}
+    niveis = [int(level) for level in args.concurrency.split(",")]
+    workload = Workload(args.rows, args.variants, args.month)
+    limits = httpx.Limits(max_connections=max(niveis), max_keepalive_connections=max(niveis))
+    resultados: Dict[str, List[Dict[str, Any]]] = {}
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        await workload.prepare(client)
+        for scenario in args.scenarios.split(","):
+            request = workload.builder(scenario, mix)
+            resultados[scenario] = []
+            anterior: Optional[float] = None
+            for nivel in niveis:
+                resultado = await run_level(client, request, nivel, args.duration, pid)
+                rps = resultado["throughput_rps"]
+                resultado["saturated"] = anterior is not None and rps < anterior * 1.1
+                anterior = rps
+                resultados[scenario].append(resultado)
+                print(
+                    f"  {scenario} x{nivel}: {rps} req/s, p95 {resultado['latency_s']['p95']} s, "
+                    f"erros {resultado['error_rate']:.1%}",
+                    file=sys.stderr,
+                )
+    return {
+        "target": base_url,
+        "rows": args.rows,
+        "variants": args.variants,
+        "duration_s": args.duration,
+        "send_stub": None if args.target else {
+            "send_ms": args.send_ms,
+            "jitter_ms": args.send_jitter_ms,
+            "fail_rate": args.send_fail_rate,
+            "production_rates": args.production_rates,
+        },
+        "mix": mix,
+        "scenarios": resultados,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """One line per scenario and concurrency level."""
+    print(f"\n{'scenario':<8} {'conc':>5} {'req/s':>8} {'p50 s':>8} {'p95 s':>8} {'p99 s':>8} {'errors':>7} {'rss MB':>8}")
+    for scenario, niveis in report["scenarios"].items():
+        for nivel in niveis:
+            lat = nivel["latency_s"]
+            cols = [lat["p50"], lat["p95"], lat["p99"]]
+            fmt = " ".join(f"{v:8.3f}" if v is not None else f"{'-':>8}" for v in cols)
+            rss = f"{nivel['peak_rss_mb']:8.1f}" if nivel["peak_rss_mb"] is not None else f"{'-':>8}"
+            marca = "  ← saturado" if nivel["saturated"] else ""
+            print(
+                f"{scenario:<8} {nivel['concurrency']:>5} {nivel['throughput_rps']:>8.2f} {fmt} "
+                f"{nivel['error_rate']:>6.1%} {rss}{marca}"
+            )
+
+
+def main() -> None:
+    """Start the stub server (unless --target), run the scenarios and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--scenarios", default="upload,months,format,send,mixed", help=f"any of {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,4,16,32", help="comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario and level")
+    parser.add_argument("--rows", type=int, default=720, help="rows of each synthetic workbook")
+    parser.add_argument("--variants", type=int, default=8, help="distinct workbooks (seeds)")
+    parser.add_argument("--month", default="03/2026", help="target_month of the uploads")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weights of the mixed scenario")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--target", help="base URL of a running server (no stub, no RSS)")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--send-ms", type=float, default=2000)
+    parser.add_argument("--send-jitter-ms", type=float, default=500)
+    parser.add_argument("--send-fail-rate", type=float, default=0.0)
+    parser.add_argument("--production-rates", action="store_true", help="keep the WhatsApp rate limits")
+    parser.add_argument("--json", type=Path, help="also write the report to this file")
+    args = parser.parse_args()
+
+    invalidos = set(args.scenarios.split(",")) - set(SCENARIOS)
+    if invalidos:
+        parser.error(f"unknown scenarios: {', '.join(sorted(invalidos))}")
+    if args.target and "send" in args.scenarios:
+        print("⚠️ --target com o cenário send dispara envios reais no servidor alvo", file=sys.stderr)
+
+    server = None if args.target else start_server(args)
+    try:
+        base_url = args.target or f"http://127.0.0.1:{args.port}"
+        report = asyncio.run(run_load_test(args, base_url, server.pid if server else None))
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
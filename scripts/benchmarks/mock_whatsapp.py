@@ -0,0 +1,245 @@
+"""
+Local stand-in for WhatsApp Web, for benchmarking the automation offline.
+
+Reproduces only the DOM the automation relies on: the ``#side`` panel with
+its search box (a ``role='textbox'`` contenteditable, as on the real page)
+and result list, the ``#main`` chat with the contenteditable
+composer, the ``span[data-icon='send']`` button shown while there is text,
+outgoing/incoming bubbles inside ``[data-id]`` rows, the sent tick and an
+automatic bot reply. App load, search, tick and reply latencies are
+configurable; until a search answers, the previous result list and chat stay
+on screen, as on the real page.
+With ``--mismatch-rate`` a share of the searches returns a single result for
+a different number, which the automation must reject (its title is not
+the recipient's number) and recover from with a full navigation.
+
+Run standalone and point the backend at it:
+
+    python scripts/benchmarks/mock_whatsapp.py --port 8765 --reply-ms 500
+    WHATSAPP_WEB_URL=http://127.0.0.1:8765 python start.py
+"""
+
+import argparse
+import json
+from typing import Any, Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse
+
+PAGE = """<!doctype html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>WhatsApp (mock)</title>
+<style>
+  body { display: flex; margin: 0; font-family: sans-serif; }
+  #side { width: 30%; border-right: 1px solid #ccc; }
+  #main-container { flex: 1; }
+  [contenteditable] { border: 1px solid #999; min-height: 1.5em; padding: 4px; }
+  .message-out { text-align: right; background: #dcf8c6; margin: 4px; }
+  .message-in { text-align: left; background: #eee; margin: 4px; }
+</style>
+</head>
+<body>
+<div id="boot">Carregando...</div>
+<script>
+const CONFIG = __CONFIG__;
+const chats = {};
+let seq = 0;
+
+function latency(base) {
+  return base + Math.random() * CONFIG.jitter_ms;
+}
+
+function renderMessage(main, msg) {
+  const row = document.createElement("div");
+  row.setAttribute("data-id", msg.id);
+  const bubble = document.createElement("div");
+  bubble.className = msg.dir === "out" ? "message-out" : "message-in";
+  const text = document.createElement("span");
+  text.textContent = msg.text;
+  bubble.appendChild(text);
+  if (msg.ticked) {
+    const tick = document.createElement("span");
+    tick.setAttribute("data-icon", "msg-check");
+    bubble.appendChild(tick);
+  }
+  row.appendChild(bubble);
+  main.querySelector(".messages").appendChild(row);
+}
+
+function currentMain(phone) {
+  const main = document.getElementById("main");
+  return main && main.dataset.phone === phone ? main : null;
+}
+
+function addMessage(phone, msg) {
+  (chats[phone] = chats[phone] || []).push(msg);
+  const main = currentMain(phone);
+  if (main) renderMessage(main, msg);
+}
+
+function send(phone, box, button) {
+  const text = box.innerText.trim();
+  if (!text) return;
+  const msg = { id: "true_" + phone + "_" + (++seq), dir: "out", text: text, ticked: false };
+  addMessage(phone, msg);
+  box.textContent = "";
+  button.hidden = true;
+
+  setTimeout(() => {
+    msg.ticked = true;
+    const main = currentMain(phone);
+    const row = main && main.querySelector('[data-id="' + msg.id + '"] .message-out');
+    if (row) {
+      const tick = document.createElement("span");
+      tick.setAttribute("data-icon", "msg-check");
+      row.appendChild(tick);
+    }
+  }, latency(CONFIG.tick_ms));
+
+  if (CONFIG.reply_ms >= 0) {
+    setTimeout(() => {
+      addMessage(phone, { id: "false_" + phone + "_" + (++seq), dir: "in", text: CONFIG.reply_text });
+    }, latency(CONFIG.reply_ms));
+  }
+}
+
+function openChat(phone) {
+  const container = document.getElementById("main-container");
+  container.innerHTML = "";
+  const main = document.createElement("div");
+  main.id = "main";
+  main.dataset.phone = phone;
+  main.innerHTML =
+    '<header><span title="' + phone + '">' + phone + '</span></header>' +
+    '<div class="messages"></div>' +
+    '<footer><div contenteditable="true" role="textbox" data-tab="10"></div>' +
+    '<button hidden><span data-icon="send">Enviar</span></button></footer>';
+  container.appendChild(main);
+  (chats[phone] || []).forEach((msg) => renderMessage(main, msg));
+
+  const box = main.querySelector("footer [contenteditable]");
+  const button = main.querySelector("footer button");
+  box.addEventListener("input", () => { button.hidden = !box.innerText.trim(); });
+  box.addEventListener("keydown", (event) => {
+    if (event.key === "Enter") {
+      event.preventDefault();
+      send(phone, box, button);
+    }
+  });
+  button.addEventListener("click", () => send(phone, box, button));
+}
+
+function boot() {
+  document.getElementById("boot").remove();
+  const side = document.createElement("div");
+  side.id = "side";
+  side.innerHTML =
+    '<div contenteditable="true" role="textbox" data-tab="3"></div><div id="pane-side"></div>';
+  const container = document.createElement("div");
+  container.id = "main-container";
+  document.body.appendChild(side);
+  document.body.appendChild(container);
+
+  const search = side.querySelector("[contenteditable]");
+  const results = side.querySelector("#pane-side");
+  let searchSeq = 0;
+  search.addEventListener("input", () => {
+    const digits = search.innerText.replace(/\\D/g, "");
+    const seq = ++searchSeq;
+    // Como no app real, a lista anterior continua na tela até a busca responder
+    setTimeout(() => {
+      if (seq !== searchSeq) return;
+      results.innerHTML = "";
+      if (digits.length < 8) return;
+      // Resultado único de outro contato: último dígito trocado
+      const shown = Math.random() < CONFIG.mismatch_rate
+        ? digits.slice(0, -1) + ((Number(digits.slice(-1)) + 1) % 10)
+        : digits;
+      const item = document.createElement("div");
+      item.setAttribute("role", "listitem");
+      item.innerHTML = '<span title="+' + shown + '">+' + shown + "</span>";
+      // O chat anterior (e seu composer) fica aberto até a troca terminar
+      item.addEventListener("click", () => setTimeout(() => openChat(shown), latency(CONFIG.search_ms)));
+      results.appendChild(item);
+    }, latency(CONFIG.search_ms));
+  });
+
+  if (CONFIG.phone) openChat(CONFIG.phone);
+}
+
+setTimeout(boot, latency(CONFIG.load_ms));
+</script>
+</body>
+</html>
+"""
+
+
+def create_app(
+    load_ms: int = 300,
+    search_ms: int = 150,
+    tick_ms: int = 150,
+    reply_ms: int = 500,
+    jitter_ms: int = 100,
+    reply_text: str = "Escolha uma opção: 1 - Consumo | 3 - Relatório",
+    mismatch_rate: float = 0.0,
+) -> FastAPI:
+    """
+    Build the mock app. ``reply_ms`` < 0 disables the bot reply; every
+    latency gets up to ``jitter_ms`` of random extra delay. A share
+    ``mismatch_rate`` of the searches opens the chat of another number.
+    """
+    app = FastAPI(title="WhatsApp Web mock")
+    base_config: Dict[str, Any] = {
+        "load_ms": load_ms,
+        "search_ms": search_ms,
+        "tick_ms": tick_ms,
+        "reply_ms": reply_ms,
+        "jitter_ms": jitter_ms,
+        "reply_text": reply_text,
+        "mismatch_rate": mismatch_rate,
+    }
+
+    def render(phone: Optional[str]) -> HTMLResponse:
+        config = {**base_config, "phone": "".join(filter(str.isdigit, phone or ""))}
+        return HTMLResponse(PAGE.replace("__CONFIG__", json.dumps(config)))
+
+    @app.get("/")
+    async def home() -> HTMLResponse:
+        return render(None)
+
+    @app.get("/send")
+    async def send(phone: str = "") -> HTMLResponse:
+        return render(phone)
+
+    return app
+
+
+def main() -> None:
+    """Serve the mock until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--load-ms", type=int, default=300)
+    parser.add_argument("--search-ms", type=int, default=150)
+    parser.add_argument("--tick-ms", type=int, default=150)
+    parser.add_argument("--reply-ms", type=int, default=500)
+    parser.add_argument("--jitter-ms", type=int, default=100)
+    parser.add_argument("--mismatch-rate", type=float, default=0.0, help="share of searches opening another chat")
+    args = parser.parse_args()
+
+    app = create_app(
+        args.load_ms,
+        tick_ms=args.tick_ms,
+        reply_ms=args.reply_ms,
+        jitter_ms=args.jitter_ms,
+        search_ms=args.search_ms,
+        mismatch_rate=args.mismatch_rate,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+The real API with the browser automation replaced by a latency stub.
+
+Everything up to the browser is the production code path: routes, outbox,
+rate scheduler, account sharding and the automation loop with its
+concurrency limit. Only the account pools are swapped: no Chromium is
+launched and every send sleeps ``--send-ms`` (plus up to ``--jitter-ms``)
+and fails with probability ``--fail-rate``. Used by load_test.py; can also
+run standalone to exercise the frontend without WhatsApp:
+
+    python scripts/benchmarks/stub_server.py --port 8001 --send-ms 3000
+
+The per-account and per-recipient send rates are lifted unless
+``--production-rates`` is given, so the load test measures the node rather
+than the WhatsApp throttling (WHATSAPP_* variables already set still win).
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import uvicorn
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+# Limites de envio sem efeito prático durante a carga
+UNTHROTTLED_ENV = {
+    "WHATSAPP_ACCOUNT_RATE_PER_MIN": "1000000",
+    "WHATSAPP_ACCOUNT_BURST": "1000000",
+    "WHATSAPP_DESTINATION_RATE_PER_MIN": "1000000",
+    "WHATSAPP_DESTINATION_BURST": "1000000",
+    "WHATSAPP_MIN_SPACING_S": "0",
+    "WHATSAPP_SPACING_JITTER_S": "0",
+}
+
+
+def install_stub(send_ms: float, jitter_ms: float, fail_rate: float) -> None:
+    """Replace the account pools before app.main registers their hooks."""
+    from app.services.accounts import account_router  # pylint: disable=import-outside-toplevel
+    from app.services.progress import ProgressCallback  # pylint: disable=import-outside-toplevel
+
+    async def start() -> None:
+        return None
+
+    async def close() -> None:
+        return None
+
+    async def send(
+        account: str, phone: str, message: str, progress: Optional[ProgressCallback] = None
+    ) -> bool:
+        del account, phone, message, progress
+        await asyncio.sleep((send_ms + random.uniform(0, jitter_ms)) / 1000)
+        return random.random() >= fail_rate
+
+    # Atributos da instância: app.main registra account_router.start/close como hooks
+    account_router.start = start  # type: ignore[method-assign]
+    account_router.close = close  # type: ignore[method-assign]
+    account_router.send = send  # type: ignore[method-assign]
+
+
+def main() -> None:
+    """Configure the environment, install the stub and serve the API."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--send-ms", type=float, default=2000, help="latency of one stubbed send")
+    parser.add_argument("--jitter-ms", type=float, default=500)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of sends reported as failed")
+    parser.add_argument("--production-rates", action="store_true", help="keep the WhatsApp rate limits")
+    args = parser.parse_args()
+
+    os.environ["WHATSAPP_ENGINE"] = "thread"
+    os.environ.setdefault("WHATSAPP_LOG_LEVEL", "WARNING")
+    # Outbox e sessões descartáveis: não tocam nos dados reais
+    scratch = Path(tempfile.mkdtemp(prefix="whatsapp-stub-"))
+    os.environ.setdefault("WHATSAPP_OUTBOX_DB", str(scratch / "outbox.sqlite3"))
+    os.environ.setdefault("WHATSAPP_SESSIONS_DIR", str(scratch / "sessions"))
+    if not args.production_rates:
+        for name, value in UNTHROTTLED_ENV.items():
+            os.environ.setdefault(name, value)
+
+    install_stub(args.send_ms, args.jitter_ms, args.fail_rate)
+    from app.main import app  # pylint: disable=import-outside-toplevel
+
+    try:
+        uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Synthetic gas consumption workbooks for benchmarks and load tests.
+
+Builds .xlsx files shaped like the ones the condominium sends: one
+``Gas_<year>`` sheet per year with the exact headers ExcelService expects,
+one block of readings per month with the header repeated at the top of each
+block, blank rows between blocks, a notes column without a header (read as
+``Unnamed: 6``) and values typed the way people type them in pt-BR: dates as
+``dd/mm/aaaa`` text, decimals with a comma ("12,345"), money as "R$ 98,76"
+next to plain numeric cells. Output is deterministic for a given seed.
+
+Sheets are written in openpyxl's write-only mode, so 1M rows stay within a
+few hundred MB of memory.
+
+    python scripts/benchmarks/synthetic_workbook.py --rows 100000 --out /tmp/gas_100k.xlsx
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence
+
+from openpyxl import Workbook
+
+# Cabeçalhos exatos lidos pelo ExcelService
+HEADERS: List[str] = [
+    "Data Leitura",
+    "Apartamento",
+    "Leitura atual",
+    "Consumo(m³)",
+    "Cálculo",
+    "Valor final(R$)",
+]
+
+# Limite de linhas de uma aba do Excel (menos cabeçalhos e linhas em branco)
+MAX_ROWS = 1_000_000
+
+# Preço do m³ usado no cálculo do valor final
+PRICE_PER_M3 = 7.85
+
+# Pasta onde workbooks gerados ficam em cache entre execuções
+CACHE_DIR = Path(os.getenv("WHATSAPP_BENCH_CACHE", str(Path(tempfile.gettempdir()) / "whatsapp-bench-workbooks")))
+
+
+def _pt_br(value: float, decimals: int) -> str:
+    """1234.5 -> '1.234,50'."""
+    return f"{value:,.{decimals}f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def _apartments(count: int) -> List[str]:
+    """Apartment numbers floor by floor, four per floor: 101, 102, 103, 104, 201, ..."""
+    apartments: List[str] = []
+    andar = 1
+    while len(apartments) < count:
+        for unidade in range(1, 5):
+            apartments.append(f"{andar}{unidade:02d}")
+        andar += 1
+    return apartments[:count]
+
+
+def _rows(
+    rows: int, year: int, apartments: int, rng: random.Random, text_ratio: float
+) -> Iterator[Sequence[object]]:
+    """
+    Monthly blocks (blank row, repeated header, one reading per apartment),
+    cycling through the months of ``year``.
+    """
+    unidades = _apartments(apartments)
+    leituras = {apt: rng.uniform(50, 800) for apt in unidades}
+    escritas = 0
+    mes = 0
+    while escritas < rows:
+        data = f"{rng.randint(3, 9):02d}/{mes % 12 + 1:02d}/{year}"
+        if mes:
+            yield [None] * (len(HEADERS) + 1)
+            yield [*HEADERS, None]
+        for apt in unidades:
+            if escritas >= rows:
+                return
+            consumo = round(rng.uniform(0.2, 9.5), 3)
+            leituras[apt] += consumo
+            calculo = round(consumo * PRICE_PER_M3, 4)
+            valor = round(calculo + 4.5, 2)
+            observacao = "Leitura estimada" if rng.random() < 0.02 else None
+            if rng.random() < text_ratio:
+                # Como digitado à mão: vírgula decimal e moeda formatada
+                yield [
+                    data,
+                    apt,
+                    _pt_br(leituras[apt], 3),
+                    _pt_br(consumo, 3),
+                    _pt_br(calculo, 4),
+                    f"R$ {_pt_br(valor, 2)}",
+                    observacao,
+                ]
+            else:
+                yield [data, int(apt), round(leituras[apt], 3), consumo, calculo, valor, observacao]
+            escritas += 1
+        mes += 1
+
+
+def build_workbook(
+    rows: int,
+    year: int = 2026,
+    apartments: int = 60,
+    seed: int = 42,
+    text_ratio: float = 0.3,
+    previous_year_rows: Optional[int] = None,
+) -> bytes:
+    """
+    A workbook with ``rows`` readings in ``Gas_<year>`` and a smaller
+    ``Gas_<year - 1>`` sheet before it (the fallback ExcelService skips).
+    """
+    if not 0 < rows <= MAX_ROWS:
+        raise ValueError(f"rows must be between 1 and {MAX_ROWS}")
+    rng = random.Random(seed)
+    wb = Workbook(write_only=True)
+    anterior = previous_year_rows if previous_year_rows is not None else min(rows, apartments * 12)
+    for ano, total in ((year - 1, anterior), (year, rows)):
+        if total <= 0:
+            continue
+        sheet = wb.create_sheet(f"Gas_{ano}")
+        sheet.append([*HEADERS, None])
+        for row in _rows(total, ano, apartments, rng, text_ratio):
+            sheet.append(list(row))
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def cached_workbook(rows: int, year: int = 2026, seed: int = 42, **kwargs: object) -> bytes:
+    """build_workbook() memoized on disk (CACHE_DIR), keyed by every parameter."""
+    chave = hashlib.sha256(repr((rows, year, seed, sorted(kwargs.items()))).encode()).hexdigest()[:16]
+    destino = CACHE_DIR / f"gas_{rows}_{year}_{chave}.xlsx"
+    if destino.is_file():
+        return destino.read_bytes()
+    content = build_workbook(rows, year=year, seed=seed, **kwargs)  # type: ignore[arg-type]
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = destino.with_suffix(".tmp")
+    tmp.write_bytes(content)
+    tmp.replace(destino)
+    return content
+
+
+def main() -> None:
+    """Write one synthetic workbook to --out."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=1000, help=f"readings in Gas_<year> (1-{MAX_ROWS})")
+    parser.add_argument("--year", type=int, default=2026)
+    parser.add_argument("--apartments", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--text-ratio", type=float, default=0.3, help="share of rows typed as pt-BR text")
+    parser.add_argument("--out", type=Path, required=True)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    content = build_workbook(
+        args.rows, year=args.year, apartments=args.apartments, seed=args.seed, text_ratio=args.text_ratio
+    )
+    args.out.write_bytes(content)
+    print(f"{args.out}: {args.rows} linhas, {len(content) / 1e6:.1f} MB em {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
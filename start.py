@@ -1,12 +1,28 @@
 """
 Start both FastAPI backend and Streamlit frontend for WhatsApp Gas Consumption Automation.
+
+    python start.py                       # desenvolvimento (--reload)
+    python start.py --prod [--workers N]  # produção (sem reload, prontidão, reinício)
 """
 
+import argparse
+import os
 import subprocess
 import sys
 import time
 from typing import Optional
 
+from start_template import DEFAULT_CONFIG, ServiceLauncher
+
+# Workers da API no modo produção ("auto" = núcleos de CPU). O padrão é 1:
+# cada worker é um processo com seu próprio navegador, sessão do WhatsApp,
+# agendador e jobs em memória. Para usar mais núcleos nos envios prefira
+# WHATSAPP_ENGINE=process.
+API_WORKERS = os.getenv("WHATSAPP_API_WORKERS", "1")
+
+# Segundos para requisições e envios em andamento terminarem no desligamento
+DRAIN_TIMEOUT_S = int(os.getenv("WHATSAPP_DRAIN_TIMEOUT_S", "30"))
+
 
 def start_services() -> None:
     """
@@ -67,5 +83,31 @@ def start_services() -> None:
                 except subprocess.TimeoutExpired:
                     proc.kill()
 
+
+def start_production(workers: str) -> None:
+    """
+    Launch both services without reload: Streamlit started once
+    /api/v1/health answers, crashed children restarted and a drain timeout
+    on shutdown. The API keeps one worker unless --workers asks for more
+    (the launcher warns about what that duplicates).
+    """
+    launcher = ServiceLauncher(
+        {
+            **DEFAULT_CONFIG,
+            "mode": "prod",
+            "workers": workers,
+            "graceful_timeout": DRAIN_TIMEOUT_S,
+        }
+    )
+    launcher.start_services()
+
+
 if __name__ == "__main__":
-    start_services()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--prod", action="store_true", help="modo produção")
+    parser.add_argument("--workers", default=API_WORKERS, help='workers da API (número ou "auto")')
+    args = parser.parse_args()
+    if args.prod:
+        start_production(args.workers)
+    else:
+        start_services()
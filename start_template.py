@@ -1,17 +1,40 @@
 # start_template.py - Generic FastAPI + Streamlit Launcher
 
+import os
+import signal
 import subprocess
 import sys
 import time
-from typing import Optional, Dict, Any
+import urllib.error
+import urllib.request
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
 
 
 
+def _raise_keyboard_interrupt(signum: int, frame: Any) -> None:
+    """SIGTERM handler: stop the services like Ctrl+C does."""
+    del signum, frame
+    raise KeyboardInterrupt
+
+
 class ServiceLauncher:
     def __init__(self, config: Optional[Dict[str, Any]] = None) -> None:
         """
         Generic launcher for FastAPI + Streamlit applications.
 
+        In "dev" mode uvicorn runs with --reload. In "prod" mode it runs
+        without reload, the launcher restarts a child that crashes and
+        shutdown drains requests for up to ``graceful_timeout`` seconds. In
+        both modes Streamlit only starts once the API answers on
+        ``health_path``.
+
+        The API runs one worker unless ``workers`` says otherwise (a number
+        or "auto" = CPU cores). Every uvicorn worker runs its own lifespan:
+        its own browser on the same WhatsApp session, its own rate limits and
+        its own outbox recovery, which requeues the other workers' in-flight
+        sends. Only raise it for apps without such process-wide state.
+
         Args:
             config: Optional dictionary of configuration options.
         """
@@ -20,11 +43,154 @@ class ServiceLauncher:
             "fastapi_port": 8000,
             "streamlit_file": "frontend/streamlit_app.py",
             "streamlit_port": 8501,
-            "startup_delay": 3,
+            "startup_delay": 3,  # usado apenas quando não há health_path
             "auto_reload": True,
+            "mode": "dev",  # "dev" ou "prod"
+            "workers": 1,  # apenas no modo prod; ver aviso em start_services
+            "health_path": "/api/v1/health",
+            "readiness_timeout": 60,
+            "graceful_timeout": 20,
+            "restart_on_crash": None,  # None = somente no modo prod
+            "max_restarts": 5,
+            "restart_window": 60,
         }
         if config:
             self.config.update(config)
+        self.api_process: Optional[subprocess.Popen] = None
+        self.frontend_process: Optional[subprocess.Popen] = None
+        self._stopping = False
+        self._restarts: Dict[str, Deque[float]] = {"api": deque(), "frontend": deque()}
+
+
+    @property
+    def production(self) -> bool:
+        """Whether the launcher runs in production mode."""
+        return self.config["mode"] == "prod"
+
+
+    def worker_count(self) -> int:
+        """Uvicorn workers: an explicit number or the CPU core count for "auto"."""
+        workers = self.config["workers"]
+        if workers == "auto":
+            return os.cpu_count() or 1
+        return max(1, int(workers))
+
+
+    def _fastapi_cmd(self) -> List[str]:
+        cmd = [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            self.config["fastapi_module"],
+            "--port",
+            str(self.config["fastapi_port"]),
+        ]
+        if self.production:
+            cmd += [
+                "--workers",
+                str(self.worker_count()),
+                "--timeout-graceful-shutdown",
+                str(self.config["graceful_timeout"]),
+                "--no-access-log",
+            ]
+        elif self.config["auto_reload"]:
+            cmd.append("--reload")
+        return cmd
+
+
+    def _streamlit_cmd(self) -> List[str]:
+        cmd = [
+            sys.executable,
+            "-m",
+            "streamlit",
+            "run",
+            self.config["streamlit_file"],
+            "--server.port",
+            str(self.config["streamlit_port"]),
+        ]
+        if self.production:
+            cmd += ["--server.headless", "true", "--server.runOnSave", "false"]
+        return cmd
+
+
+    def _start_api(self) -> None:
+        print(f"🚀 Starting {self.config['fastapi_module']} on port {self.config['fastapi_port']}...")
+        self.api_process = subprocess.Popen(self._fastapi_cmd())
+        if self.wait_until_ready():
+            print(f"✅ FastAPI ready on http://localhost:{self.config['fastapi_port']}")
+
+
+    def _start_frontend(self) -> None:
+        print(f"🎨 Starting Streamlit from {self.config['streamlit_file']}...")
+        self.frontend_process = subprocess.Popen(self._streamlit_cmd())
+        print(f"✅ Streamlit started on http://localhost:{self.config['streamlit_port']}")
+
+
+    def wait_until_ready(self) -> bool:
+        """
+        Poll the API health endpoint until it answers 200. Falls back to the
+        fixed ``startup_delay`` when no ``health_path`` is configured.
+        """
+        if not self.config["health_path"]:
+            time.sleep(self.config["startup_delay"])
+            return True
+
+        url = f"http://127.0.0.1:{self.config['fastapi_port']}{self.config['health_path']}"
+        inicio = time.monotonic()
+        deadline = inicio + self.config["readiness_timeout"]
+        while time.monotonic() < deadline:
+            if self.api_process is not None and self.api_process.poll() is not None:
+                print(f"❌ FastAPI exited during startup (code {self.api_process.returncode})")
+                return False
+            try:
+                with urllib.request.urlopen(url, timeout=2) as response:
+                    if response.status == 200:
+                        print(f"⏱️ API ready in {time.monotonic() - inicio:.1f}s")
+                        return True
+            except (urllib.error.URLError, OSError):
+                pass
+            time.sleep(0.2)
+        print(f"⚠️ API not ready after {self.config['readiness_timeout']}s; continuing anyway")
+        return False
+
+
+    def _may_restart(self, name: str) -> bool:
+        """Restart policy: enabled in prod, at most max_restarts per window."""
+        enabled = self.config["restart_on_crash"]
+        if enabled is None:
+            enabled = self.production
+        if not enabled:
+            return False
+        now = time.monotonic()
+        history = self._restarts[name]
+        while history and now - history[0] > self.config["restart_window"]:
+            history.popleft()
+        if len(history) >= self.config["max_restarts"]:
+            print(f"❌ {name} crashed {len(history)} times in {self.config['restart_window']}s; giving up")
+            return False
+        history.append(now)
+        return True
+
+
+    def _supervise(self) -> None:
+        """Watch both children and restart the one that crashes."""
+        while not self._stopping:
+            for name in ("api", "frontend"):
+                proc = self.api_process if name == "api" else self.frontend_process
+                if proc is None or proc.poll() is None:
+                    continue
+                print(f"💥 {name} exited with code {proc.returncode}")
+                if not self._may_restart(name):
+                    return
+                # Espera crescente entre reinícios seguidos
+                atraso = len(self._restarts[name])
+                print(f"🔁 Restarting {name} in {atraso}s...")
+                time.sleep(atraso)
+                if name == "api":
+                    self._start_api()
+                else:
+                    self._start_frontend()
+            time.sleep(0.5)
 
 
     def start_services(self) -> None:
@@ -32,69 +198,60 @@ class ServiceLauncher:
         Start both FastAPI and Streamlit services as subprocesses.
         Handles graceful shutdown and error reporting.
         """
-        self.api_process: Optional[subprocess.Popen] = None
-        self.frontend_process: Optional[subprocess.Popen] = None
+        # SIGTERM (systemd, docker stop) encerra como Ctrl+C
+        signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
         try:
-            print(f"🚀 Starting {self.config['fastapi_module']} on port {self.config['fastapi_port']}...")
-
-            fastapi_cmd = [
-                sys.executable,
-                "-m",
-                "uvicorn",
-                self.config["fastapi_module"],
-                "--port",
-                str(self.config["fastapi_port"]),
-            ]
-            if self.config["auto_reload"]:
-                fastapi_cmd.append("--reload")
-
-            self.api_process = subprocess.Popen(fastapi_cmd)
-            print(f"✅ FastAPI started on http://localhost:{self.config['fastapi_port']}")
+            if self.production:
+                print(f"🏭 Production mode: {self.worker_count()} API worker(s), no reload")
+                if self.worker_count() > 1:
+                    print(
+                        f"⚠️ {self.worker_count()} API workers: each one runs its own lifespan "
+                        "(browser on the same WhatsApp session, rate limits, outbox recovery). "
+                        "Sends can be duplicated; prefer 1 worker and WHATSAPP_ENGINE=process."
+                    )
+            self._start_api()
+            self._start_frontend()
 
-            time.sleep(self.config["startup_delay"])
-
-            print(f"🎨 Starting Streamlit from {self.config['streamlit_file']}...")
-            self.frontend_process = subprocess.Popen([
-                sys.executable,
-                "-m",
-                "streamlit",
-                "run",
-                self.config["streamlit_file"],
-                "--server.port",
-                str(self.config["streamlit_port"]),
-            ])
-
-            print(f"✅ Streamlit started on http://localhost:{self.config['streamlit_port']}")
             print("\n🎉 Both services are running!")
             print("📖 Press Ctrl+C to stop all services")
 
-            self.api_process.wait()
-            self.frontend_process.wait()
+            self._supervise()
 
         except KeyboardInterrupt:
-            self.shutdown_services()
+            pass
         except Exception as e:
             print(f"❌ Error starting services: {e}")
+        finally:
             self.shutdown_services()
 
 
     def shutdown_services(self) -> None:
         """
-        Gracefully shutdown both FastAPI and Streamlit services.
+        Gracefully shutdown both FastAPI and Streamlit services: ask them to
+        stop, let them drain for up to ``graceful_timeout`` seconds, then kill.
         """
+        if self._stopping:
+            return
+        self._stopping = True
         print("\n🛑 Shutting down services...")
-        try:
-            if hasattr(self, "api_process") and self.api_process:
-                self.api_process.terminate()
-                print("✅ FastAPI stopped")
-        except Exception:
-            pass
-        try:
-            if hasattr(self, "frontend_process") and self.frontend_process:
-                self.frontend_process.terminate()
-                print("✅ Streamlit stopped")
-        except Exception:
-            pass
+        procs = [
+            (label, proc)
+            for label, proc in (("Streamlit", self.frontend_process), ("FastAPI", self.api_process))
+            if proc is not None and proc.poll() is None
+        ]
+        for _, proc in procs:
+            try:
+                proc.terminate()
+            except OSError:
+                pass
+        deadline = time.monotonic() + self.config["graceful_timeout"]
+        for label, proc in procs:
+            try:
+                proc.wait(timeout=max(0.1, deadline - time.monotonic()))
+                print(f"✅ {label} stopped")
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                print(f"⚠️ {label} did not stop in time and was killed")
         print("👋 All services stopped successfully!")
 
 
@@ -123,6 +280,14 @@ SIMPLE_CONFIG: Dict[str, Any] = {
     "streamlit_port": 3001,
     "startup_delay": 2,
     "auto_reload": False,
+    "health_path": None,
+}
+
+PRODUCTION_CONFIG: Dict[str, Any] = {
+    **DEFAULT_CONFIG,
+    "mode": "prod",
+    "workers": 1,
+    "graceful_timeout": 30,
 }
 
 
@@ -131,7 +296,7 @@ def main() -> None:
     """
     Main function to launch services. Customize as needed.
     """
-    launcher = ServiceLauncher(DEFAULT_CONFIG)
+    launcher = ServiceLauncher(PRODUCTION_CONFIG if "--prod" in sys.argv else DEFAULT_CONFIG)
     launcher.start_services()
 
 
@@ -0,0 +1,77 @@
+"""Sharding of recipients across WhatsApp accounts."""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+from app.services.accounts import AccountRouter
+
+ACCOUNTS = ("comercial", "financeiro", "suporte")
+PHONES = [f"55319{n:08d}" for n in range(200)]
+
+
+@dataclass
+class FakePool:
+    ready: bool = True
+
+
+def make_router(tmp_path: Path, policy: str = "hash") -> AccountRouter:
+    for name in ACCOUNTS:
+        (tmp_path / f"{name}.json").write_text("{}", encoding="utf-8")
+    router = AccountRouter(sessions_dir=tmp_path, policy=policy)
+    router.pools = {name: FakePool() for name in ACCOUNTS}  # type: ignore[misc]
+    return router
+
+
+def assignment(router: AccountRouter) -> Dict[str, str]:
+    return {phone: router.choose(phone) for phone in PHONES}
+
+
+def test_hash_is_stable_and_uses_every_account(tmp_path: Path):
+    router = make_router(tmp_path)
+    antes = assignment(router)
+    assert set(antes.values()) == set(ACCOUNTS)
+    # Formatação do número não muda a conta
+    assert router.choose("+55 (31) 9000-00001") == router.choose("5531900000001")
+    assert assignment(make_router(tmp_path)) == antes
+
+
+def test_only_recipients_of_an_unavailable_account_move(tmp_path: Path):
+    router = make_router(tmp_path)
+    antes = assignment(router)
+
+    router.pools["financeiro"].ready = False
+    durante = assignment(router)
+    for phone, conta in antes.items():
+        if conta == "financeiro":
+            assert durante[phone] != "financeiro"
+        else:
+            assert durante[phone] == conta
+
+    # A conta volta: cada destinatário retorna à sua conversa original
+    router.pools["financeiro"].ready = True
+    assert assignment(router) == antes
+
+
+def test_no_ready_pool_keeps_the_full_hash(tmp_path: Path):
+    router = make_router(tmp_path)
+    antes = assignment(router)
+    for pool in router.pools.values():
+        pool.ready = False
+    assert assignment(router) == antes
+
+
+def test_least_loaded_balances_assignments(tmp_path: Path):
+    router = make_router(tmp_path, policy="least_loaded")
+    contas = [router.acquire(phone) for phone in PHONES[:6]]
+    assert sorted(contas) == sorted(ACCOUNTS * 2)
+
+    router.release("suporte")
+    assert router.choose(PHONES[7]) == "suporte"
+
+
+def test_unknown_policy_is_rejected(tmp_path: Path):
+    with pytest.raises(ValueError, match="sharding policy"):
+        AccountRouter(sessions_dir=tmp_path, policy="round_robin")
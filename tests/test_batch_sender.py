@@ -0,0 +1,139 @@
+"""Job completion of BatchSendManager and its link to outbox retries."""
+
+import asyncio
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import pytest
+
+from app.services.batch_sender import BatchJob, BatchSendManager
+from app.services.outbox import Outbox, OutboxEntry
+from app.services.progress import (
+    STEP_CONFIRMED,
+    STEP_FAILED,
+    STEP_JOB_COMPLETED,
+    STEP_QUEUED,
+    STEP_RETRY_SCHEDULED,
+    ProgressHub,
+)
+
+MESSAGE = "Relatório de consumo de gás - 03/2026"
+
+
+@pytest.fixture
+def outbox(tmp_path: Path) -> Iterator[Outbox]:
+    store = Outbox(tmp_path / "outbox.sqlite3", max_attempts=2)
+    yield store
+    store.close()
+
+
+def make_send(outbox: Outbox, falhas: Dict[str, int]):
+    """Send through the outbox; each phone fails its first ``falhas[phone]`` attempts."""
+
+    async def send(phone: str, message: str, priority: int, progress=None) -> OutboxEntry:
+        del progress
+        entry, claimed = outbox.begin(phone, message, priority)
+        assert claimed
+        if falhas.get(phone, 0) > 0:
+            falhas[phone] -= 1
+            updated = outbox.mark_failed(entry.id, "Chat não abriu")
+        else:
+            updated = outbox.mark_sent(entry.id)
+        assert updated is not None
+        return updated
+
+    return send
+
+
+async def run_job(manager: BatchSendManager, phones: List[str]) -> BatchJob:
+    """Submit one report per phone and wait until every worker is idle."""
+    await manager.start()
+    job = manager.submit([(phone, MESSAGE, 5) for phone in phones])
+    assert manager._queue is not None
+    await manager._queue.join()
+    return job
+
+
+def steps(hub: ProgressHub, job: BatchJob) -> List[str]:
+    async def collect() -> List[str]:
+        return [event.step async for event in hub.stream(job.job_id, keepalive_s=0.05) if event is not None]
+
+    return asyncio.run(collect())
+
+
+def test_job_completes_after_every_recipient(outbox: Outbox):
+    hub = ProgressHub()
+    phones = ["5531900000001", "5531900000002", "5531900000003"]
+    manager = BatchSendManager(workers=2, send=make_send(outbox, {}), progress=hub)
+
+    async def scenario() -> BatchJob:
+        try:
+            return await run_job(manager, phones)
+        finally:
+            await manager.stop()
+
+    job = asyncio.run(scenario())
+    snapshot = job.snapshot()
+    assert snapshot["status"] == "completed" and snapshot["progress"] == 1.0
+    assert snapshot["counts"]["sent"] == 3 and job.remaining == 0
+    assert all(r["outbox_id"] is not None for r in snapshot["recipients"])
+
+    eventos = steps(hub, job)
+    assert eventos.count(STEP_QUEUED) == 3 and eventos.count(STEP_CONFIRMED) == 3
+    assert eventos[-1] == STEP_JOB_COMPLETED
+
+
+def test_retried_recipient_settles_when_the_outbox_delivers_it(outbox: Outbox):
+    hub = ProgressHub()
+    ok, retried = "5531900000001", "5531900000002"
+    manager = BatchSendManager(workers=1, send=make_send(outbox, {retried: 1}), progress=hub)
+
+    async def scenario() -> BatchJob:
+        try:
+            return await run_job(manager, [ok, retried])
+        finally:
+            await manager.stop()
+
+    job = asyncio.run(scenario())
+    # A falha tem nova tentativa agendada: não é definitiva e o job não termina
+    pendente = job.recipients[1]
+    assert pendente.status == "retrying" and pendente.error == "Chat não abriu"
+    assert job.status == "running" and job.snapshot()["counts"]["retrying"] == 1
+
+    # O dispatcher do outbox reenvia a linha e avisa o gerenciador
+    assert pendente.outbox_id is not None and outbox.claim(pendente.outbox_id) is not None
+    manager.on_outbox_outcome(outbox.mark_sent(pendente.outbox_id))
+    assert pendente.status == "sent" and pendente.error is None
+    assert job.status == "completed" and job.snapshot()["counts"]["sent"] == 2
+
+    eventos = steps(hub, job)
+    assert STEP_FAILED not in eventos
+    assert eventos.index(STEP_RETRY_SCHEDULED) < eventos.index(STEP_JOB_COMPLETED)
+    assert eventos[-2:] == [STEP_CONFIRMED, STEP_JOB_COMPLETED]
+
+
+def test_recipient_fails_only_when_retries_are_exhausted(outbox: Outbox):
+    hub = ProgressHub()
+    phone = "5531900000001"
+    manager = BatchSendManager(workers=1, send=make_send(outbox, {phone: 2}), progress=hub)
+
+    async def scenario() -> BatchJob:
+        try:
+            return await run_job(manager, [phone])
+        finally:
+            await manager.stop()
+
+    job = asyncio.run(scenario())
+    recipient = job.recipients[0]
+    assert recipient.status == "retrying"
+
+    outbox.claim(recipient.outbox_id)
+    manager.on_outbox_outcome(outbox.mark_failed(recipient.outbox_id, "Chat não abriu"))
+    assert recipient.status == "failed" and job.status == "completed"
+    assert job.snapshot()["failures"][0]["error"] == "Chat não abriu"
+    # Um aviso repetido da mesma linha não conta duas vezes
+    manager.on_outbox_outcome(outbox.get(recipient.outbox_id))
+    assert job.remaining == 0
+
+    eventos = steps(hub, job)
+    assert eventos[-3:] == [STEP_RETRY_SCHEDULED, STEP_FAILED, STEP_JOB_COMPLETED]
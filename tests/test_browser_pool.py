@@ -0,0 +1,44 @@
+"""Resilience of the warm pool's background health check."""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from app.services.browser_pool import WhatsAppBrowserPool
+
+
+class FakeSession:
+    """Session manager stand-in counting the periodic flushes."""
+
+    def __init__(self) -> None:
+        self.flushes = 0
+
+    def flush_if_due(self) -> None:
+        self.flushes += 1
+
+
+def test_health_loop_survives_unexpected_errors_until_cancelled():
+    async def scenario() -> None:
+        session = FakeSession()
+        pool = WhatsAppBrowserPool(session=session, health_check_interval=0.01)  # type: ignore[arg-type]
+        pool._lock = asyncio.Lock()
+        verificacoes: List[int] = []
+
+        async def ensure_ready() -> bool:
+            verificacoes.append(len(verificacoes))
+            if len(verificacoes) == 1:
+                raise KeyError("estado inesperado da página")
+            return True
+
+        pool._ensure_ready = ensure_ready  # type: ignore[method-assign]
+        task = asyncio.create_task(pool._health_loop())
+        while session.flushes < 2:
+            await asyncio.sleep(0.01)
+        assert not task.done()
+
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=5))
@@ -0,0 +1,78 @@
+"""What deliver_whatsapp reports for each outcome of an attempt."""
+
+import asyncio
+from pathlib import Path
+from typing import Iterator, List
+
+import pytest
+
+from app.services import delivery
+from app.services.outbox import STATE_FAILED, STATE_SENT, Outbox, OutboxEntry
+
+PHONE = "5531900000001"
+MESSAGE = "Relatório de consumo de gás - 03/2026"
+
+
+@pytest.fixture
+def outbox(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[Outbox]:
+    store = Outbox(tmp_path / "outbox.sqlite3", max_attempts=2)
+    monkeypatch.setattr(delivery, "outbox", store)
+    yield store
+    store.close()
+
+
+def stub_send(monkeypatch: pytest.MonkeyPatch, *outcomes: object) -> List[str]:
+    """Replace the browser send with the given results (an exception is raised)."""
+    chamadas: List[str] = []
+    pendentes = list(outcomes)
+
+    async def send_now(phone: str, message: str, priority: int, progress: object = None) -> bool:
+        del message, priority, progress
+        chamadas.append(phone)
+        outcome = pendentes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return bool(outcome)
+
+    monkeypatch.setattr(delivery, "_send_now", send_now)
+    return chamadas
+
+
+def deliver() -> OutboxEntry:
+    return asyncio.run(delivery.deliver_whatsapp(PHONE, MESSAGE))
+
+
+def test_confirmed_send_is_not_repeated(outbox: Outbox, monkeypatch: pytest.MonkeyPatch):
+    chamadas = stub_send(monkeypatch, True)
+    assert deliver().state == STATE_SENT
+    # Mesmo conteúdo: devolve a linha enviada sem tocar no navegador
+    assert deliver().state == STATE_SENT
+    assert chamadas == [PHONE]
+
+
+def test_failed_attempt_reports_the_scheduled_retry(outbox: Outbox, monkeypatch: pytest.MonkeyPatch):
+    stub_send(monkeypatch, RuntimeError("Worker encerrado"), False)
+
+    primeira = deliver()
+    assert primeira.state == STATE_FAILED and primeira.retry_scheduled
+    assert primeira.last_error == "Worker encerrado"
+
+    # A segunda falha esgota as tentativas: aí sim é definitiva
+    segunda = deliver()
+    assert segunda.id == primeira.id and segunda.state == STATE_FAILED and not segunda.retry_scheduled
+
+
+def test_unconfirmed_row_is_not_resent(outbox: Outbox, monkeypatch: pytest.MonkeyPatch):
+    chamadas = stub_send(monkeypatch)
+    outbox.begin(PHONE, MESSAGE)
+    outbox.recover()
+    with pytest.raises(RuntimeError, match="revisão"):
+        deliver()
+    assert chamadas == []
+
+
+def test_report_in_flight_is_rejected(outbox: Outbox, monkeypatch: pytest.MonkeyPatch):
+    stub_send(monkeypatch)
+    outbox.begin(PHONE, MESSAGE)
+    with pytest.raises(RuntimeError, match="já está em envio"):
+        deliver()
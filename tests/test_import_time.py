@@ -0,0 +1,55 @@
+"""Startup budget of the API module: import time and lazily loaded dependencies."""
+
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+from scripts.benchmarks.import_time import DEFAULT_BUDGET_MS, LAZY_MODULES, ROOT
+
+RUNS = 3
+
+_CUMULATIVE = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \| +app\.main$", re.MULTILINE)
+
+# Importa a API e informa quais dependências pesadas ficaram em sys.modules
+_PROBE = (
+    "import json, sys; import app.main; "
+    f"print(json.dumps([m for m in {list(LAZY_MODULES)!r} if m in sys.modules]))"
+)
+
+
+def import_app(tmp_path: Path) -> Tuple[float, List[str]]:
+    """Import app.main in a fresh interpreter; cumulative import ms and lazy modules loaded."""
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(ROOT),
+        "WHATSAPP_OUTBOX_DB": str(tmp_path / "outbox.sqlite3"),
+    }
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+        timeout=120,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    match = _CUMULATIVE.search(proc.stderr)
+    assert match is not None, "app.main missing from the -X importtime report"
+    return int(match.group(1)) / 1000, json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def test_app_main_imports_within_budget_without_heavy_dependencies(tmp_path: Path):
+    tempos = []
+    for _ in range(RUNS):
+        import_ms, carregados = import_app(tmp_path)
+        assert carregados == [], f"loaded at import: {carregados}"
+        tempos.append(import_ms)
+
+    mediana = statistics.median(tempos)
+    assert mediana <= DEFAULT_BUDGET_MS, f"import app.main took {mediana:.1f} ms (budget {DEFAULT_BUDGET_MS} ms)"
@@ -0,0 +1,104 @@
+"""Reuse and TTL of background workbook ingest jobs."""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from app.services import ingest_jobs as ingest_module
+from app.services.ingest_jobs import (
+    STATUS_DONE,
+    STATUS_FAILED,
+    IngestJob,
+    IngestJobManager,
+    ingest_key,
+)
+from app.services.progress import ProgressHub
+
+WORKBOOK = b"PK\x03\x04 planilha de consumo"
+
+
+@pytest.fixture
+def parses(monkeypatch: pytest.MonkeyPatch) -> List[Optional[str]]:
+    """Replace the pandas parse; records the month of every parse that ran."""
+    chamadas: List[Optional[str]] = []
+
+    def process_excel(content: bytes, target_month: Optional[str]) -> Dict[str, Any]:
+        chamadas.append(target_month)
+        if content.startswith(b"corrompida"):
+            raise ValueError("Arquivo não é uma planilha válida")
+        return {"success": True, "data": [{"apartamento": "101"}, {"apartamento": "102"}]}
+
+    monkeypatch.setattr(ingest_module, "_process_excel", process_excel)
+    return chamadas
+
+
+async def finished(manager: IngestJobManager, job: IngestJob) -> IngestJob:
+    """Wait for every running job of ``manager`` and return ``job``."""
+    await asyncio.gather(*manager._tasks)
+    return job
+
+
+def test_same_upload_reuses_the_job(parses: List[Optional[str]]):
+    async def scenario() -> None:
+        manager = IngestJobManager(ttl=60, progress=ProgressHub())
+        primeiro = manager.submit(WORKBOOK, "gas.xlsx", "03/2026")
+        # Enquanto processa e depois de pronto: o mesmo job, sem novo parse
+        assert manager.submit(WORKBOOK, "gas (1).xlsx", " 03/2026 ") is primeiro
+        await finished(manager, primeiro)
+        assert primeiro.status == STATUS_DONE and primeiro.snapshot()["records"] == 2
+        assert manager.submit(WORKBOOK, "gas.xlsx", "03/2026") is primeiro
+
+        outro_mes = manager.submit(WORKBOOK, "gas.xlsx", "04/2026")
+        await finished(manager, outro_mes)
+        assert outro_mes is not primeiro
+        assert manager.stats()["reused"] == 2 and manager.stats()["submitted"] == 2
+
+    asyncio.run(scenario())
+    assert parses == ["03/2026", "04/2026"]
+
+
+def test_failed_job_is_not_reused(parses: List[Optional[str]]):
+    async def scenario() -> None:
+        manager = IngestJobManager(ttl=60, progress=ProgressHub())
+        falhou = await finished(manager, manager.submit(b"corrompida", "gas.xlsx", None))
+        assert falhou.status == STATUS_FAILED and falhou.error == "Arquivo não é uma planilha válida"
+
+        novo = manager.submit(b"corrompida", "gas.xlsx", None)
+        assert novo is not falhou
+        await finished(manager, novo)
+
+    asyncio.run(scenario())
+    assert len(parses) == 2
+
+
+def test_finished_job_expires_after_the_ttl(parses: List[Optional[str]], monkeypatch: pytest.MonkeyPatch):
+    async def scenario() -> None:
+        manager = IngestJobManager(ttl=60, progress=ProgressHub())
+        job = await finished(manager, manager.submit(WORKBOOK, "gas.xlsx", None))
+        assert job.finished_at is not None
+
+        monkeypatch.setattr(ingest_module.time, "time", lambda: job.finished_at + 59)
+        assert manager.get(job.job_id) is job
+
+        monkeypatch.setattr(ingest_module.time, "time", lambda: job.finished_at + 61)
+        assert manager.get(job.job_id) is None
+        assert ingest_key(WORKBOOK, None) not in manager._by_key
+        novo = manager.submit(WORKBOOK, "gas.xlsx", None)
+        assert novo is not job
+        await finished(manager, novo)
+
+    asyncio.run(scenario())
+    assert len(parses) == 2
+
+
+def test_job_progress_events(parses: List[Optional[str]]):
+    hub = ProgressHub()
+
+    async def scenario() -> List[str]:
+        manager = IngestJobManager(ttl=60, progress=hub)
+        job = await finished(manager, manager.submit(WORKBOOK, "gas.xlsx", None))
+        return [event.step async for event in hub.stream(job.job_id) if event is not None]
+
+    assert asyncio.run(scenario()) == ["queued", "running", "done"]
+    assert parses == [None]
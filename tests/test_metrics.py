@@ -0,0 +1,110 @@
+"""Prometheus text exposition of the metrics registry and the request middleware."""
+
+import math
+
+import pytest
+from fastapi import APIRouter, FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.services.metrics import (
+    HTTP_LATENCY,
+    HTTP_REQUESTS,
+    MetricsRegistry,
+    RequestMetricsMiddleware,
+    metrics,
+)
+
+
+def test_counter_renders_help_type_and_sorted_label_sets():
+    registry = MetricsRegistry()
+    envios = registry.counter("test_sends_total", "Sends by outcome.", ("outcome",))
+    envios.inc(outcome="failed")
+    envios.inc(2, outcome="confirmed")
+    envios.inc(outcome="failed")
+
+    assert registry.render().splitlines() == [
+        "# HELP test_sends_total Sends by outcome.",
+        "# TYPE test_sends_total counter",
+        'test_sends_total{outcome="confirmed"} 2.0',
+        'test_sends_total{outcome="failed"} 2.0',
+    ]
+
+
+def test_histogram_buckets_are_cumulative_with_sum_and_count():
+    registry = MetricsRegistry()
+    latencia = registry.histogram("test_latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for valor in (0.05, 0.5, 0.7, 3.0):
+        latencia.observe(valor)
+
+    linhas = registry.render().splitlines()
+    assert linhas[1] == "# TYPE test_latency_seconds histogram"
+    assert linhas[2:] == [
+        'test_latency_seconds_bucket{le="0.1"} 1',
+        'test_latency_seconds_bucket{le="1.0"} 3',
+        'test_latency_seconds_bucket{le="+Inf"} 4',
+        f"test_latency_seconds_sum {4.25!r}",
+        "test_latency_seconds_count 4",
+    ]
+
+
+def test_histogram_time_observes_even_when_the_block_raises():
+    registry = MetricsRegistry()
+    etapa = registry.histogram("test_stage_seconds", "Stage.", ("stage",))
+    with pytest.raises(ValueError):
+        with etapa.time(stage="read"):
+            raise ValueError("planilha inválida")
+    assert 'test_stage_seconds_count{stage="read"} 1' in registry.render()
+
+
+def test_labels_are_validated_and_escaped():
+    registry = MetricsRegistry()
+    erros = registry.counter("test_errors_total", "Errors.", ("error",))
+    with pytest.raises(ValueError, match="expects labels"):
+        erros.inc(reason="timeout")
+    erros.inc(error='linha "1"\nC:\\planilha')
+    assert 'test_errors_total{error="linha \\"1\\"\\nC:\\\\planilha"} 1.0' in registry.render()
+
+    with pytest.raises(ValueError, match="already registered"):
+        registry.counter("test_errors_total", "Again.")
+
+
+def test_extra_families_are_rendered_after_the_registry():
+    registry = MetricsRegistry()
+    texto = registry.render(
+        [("test_queue_depth", "gauge", "Queued items.", [({"queue": "batch"}, 3), ({"queue": "outbox"}, math.inf)])]
+    )
+    assert texto.endswith(
+        "# HELP test_queue_depth Queued items.\n"
+        "# TYPE test_queue_depth gauge\n"
+        'test_queue_depth{queue="batch"} 3.0\n'
+        'test_queue_depth{queue="outbox"} +Inf\n'
+    )
+
+
+def test_middleware_labels_requests_by_route_template():
+    router = APIRouter()
+
+    @router.get("/itens/{item_id}")
+    async def item(item_id: int) -> dict:
+        if item_id == 0:
+            raise HTTPException(status_code=404, detail="não existe")
+        return {"id": item_id}
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v9")
+    app.add_middleware(RequestMetricsMiddleware)
+    client = TestClient(app)
+
+    route = "/api/v9/itens/{item_id}"
+    antes = metrics.render()
+    assert client.get("/api/v9/itens/1").status_code == 200
+    assert client.get("/api/v9/itens/2").status_code == 200
+    assert client.get("/api/v9/itens/0").status_code == 404
+    assert client.get("/nao/existe").status_code == 404
+
+    depois = metrics.render()
+    assert f'route="{route}"' not in antes
+    assert f'{HTTP_REQUESTS.name}{{method="GET",route="{route}",status="200"}} 2.0' in depois
+    assert f'{HTTP_REQUESTS.name}{{method="GET",route="{route}",status="404"}} 1.0' in depois
+    assert f'{HTTP_REQUESTS.name}{{method="GET",route="unmatched",status="404"}}' in depois
+    assert f'{HTTP_LATENCY.name}_count{{method="GET",route="{route}"}} 3' in depois
@@ -0,0 +1,239 @@
+"""Idempotency, claiming, retries and crash recovery of the SQLite outbox."""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import pytest
+
+from app.services import outbox as outbox_module
+from app.services.outbox import (
+    STATE_FAILED,
+    STATE_QUEUED,
+    STATE_SENDING,
+    STATE_SENT,
+    STATE_UNKNOWN,
+    Outbox,
+    OutboxDispatcher,
+    OutboxEntry,
+)
+
+PHONE = "5531900000001"
+MESSAGE = "Relatório de consumo de gás - 03/2026"
+
+
+@pytest.fixture
+def db_path(tmp_path: Path) -> Path:
+    return tmp_path / "outbox.sqlite3"
+
+
+@pytest.fixture
+def outbox(db_path: Path) -> Iterator[Outbox]:
+    store = Outbox(db_path, max_attempts=3)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def no_jitter(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Backoff without the random factor, so delays are exact."""
+    monkeypatch.setattr(outbox_module.random, "uniform", lambda a, b: 1.0)
+
+
+def row(store: Outbox, entry_id: int) -> OutboxEntry:
+    """Current state of a row, read without claiming it."""
+    entry = store.get(entry_id)
+    assert entry is not None
+    return entry
+
+
+def failed_entry(store: Outbox) -> OutboxEntry:
+    """A row that failed once and is waiting for its retry."""
+    entry, _ = store.begin(PHONE, MESSAGE)
+    store.mark_failed(entry.id, "timeout")
+    return row(store, entry.id)
+
+
+def test_same_content_reuses_the_row(outbox: Outbox):
+    entry, claimed = outbox.begin(PHONE, MESSAGE)
+    assert claimed and entry.state == STATE_SENDING
+
+    # Em andamento: a segunda chamada recebe a mesma linha, sem reivindicá-la
+    again, claimed_again = outbox.begin(PHONE, MESSAGE)
+    assert again.id == entry.id and not claimed_again
+
+    outbox.mark_sent(entry.id)
+    sent, claimed_sent = outbox.begin(PHONE, MESSAGE)
+    assert sent.id == entry.id and sent.state == STATE_SENT and not claimed_sent
+
+    assert outbox.stats()["counts"][STATE_SENT] == 1
+
+
+def test_different_content_or_phone_is_a_new_delivery(outbox: Outbox):
+    entry, _ = outbox.begin(PHONE, MESSAGE)
+    other_message, claimed_message = outbox.begin(PHONE, MESSAGE + " (corrigido)")
+    other_phone, claimed_phone = outbox.begin("5531900000002", MESSAGE)
+    assert claimed_message and claimed_phone
+    assert len({entry.id, other_message.id, other_phone.id}) == 3
+
+
+def test_explicit_send_reclaims_a_failed_row(outbox: Outbox):
+    entry = failed_entry(outbox)
+    again, claimed = outbox.begin(PHONE, MESSAGE)
+    assert claimed and again.id == entry.id and again.state == STATE_SENDING
+
+
+def test_claim_is_exclusive(outbox: Outbox):
+    entry = failed_entry(outbox)
+    barrier = threading.Barrier(8)
+
+    def claim() -> Optional[OutboxEntry]:
+        barrier.wait()
+        return outbox.claim(entry.id)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: claim(), range(8)))
+
+    winners = [r for r in results if r is not None]
+    assert len(winners) == 1 and winners[0].state == STATE_SENDING
+    # Linhas em envio ou já enviadas não são reivindicadas de novo
+    assert outbox.claim(entry.id) is None
+    outbox.mark_sent(entry.id)
+    assert outbox.claim(entry.id) is None
+
+
+def test_mark_failed_backs_off_exponentially(outbox: Outbox, no_jitter: None):
+    entry, _ = outbox.begin(PHONE, MESSAGE)
+
+    before = time.time()
+    outbox.mark_failed(entry.id, "timeout")
+    first = row(outbox, entry.id)
+    assert first.state == STATE_FAILED and first.attempts == 1 and first.last_error == "timeout"
+    assert first.next_attempt_at == pytest.approx(before + outbox_module.BACKOFF_BASE_S, abs=1)
+
+    outbox.claim(entry.id)
+    before = time.time()
+    outbox.mark_failed(entry.id, "timeout")
+    second = row(outbox, entry.id)
+    assert second.attempts == 2
+    assert second.next_attempt_at == pytest.approx(before + 2 * outbox_module.BACKOFF_BASE_S, abs=1)
+
+
+def test_backoff_is_capped(monkeypatch: pytest.MonkeyPatch, no_jitter: None):
+    monkeypatch.setattr(outbox_module, "BACKOFF_MAX_S", 100.0)
+    assert outbox_module.backoff_delay(20) == 100.0
+
+
+def test_last_attempt_is_not_retried(outbox: Outbox):
+    entry, _ = outbox.begin(PHONE, MESSAGE)
+    for _ in range(outbox.max_attempts):
+        outbox.mark_failed(entry.id, "timeout")
+
+    final = row(outbox, entry.id)
+    assert final.attempts == outbox.max_attempts and final.next_attempt_at is None
+    assert outbox.due() == []
+
+
+def test_due_waits_for_the_backoff(outbox: Outbox, monkeypatch: pytest.MonkeyPatch):
+    entry = failed_entry(outbox)
+    assert outbox.due() == []
+
+    later = entry.next_attempt_at + 1
+    monkeypatch.setattr(outbox_module.time, "time", lambda: later)
+    assert outbox.due() == [entry.id]
+    assert outbox.stats()["due"] == 1
+
+
+def test_due_orders_by_priority(outbox: Outbox, monkeypatch: pytest.MonkeyPatch):
+    normal, _ = outbox.begin(PHONE, MESSAGE, priority=5)
+    vencida, _ = outbox.begin("5531900000002", MESSAGE, priority=0)
+    outbox.mark_failed(normal.id, "timeout")
+    outbox.mark_failed(vencida.id, "timeout")
+
+    later = time.time() + 10 * outbox_module.BACKOFF_MAX_S
+    monkeypatch.setattr(outbox_module.time, "time", lambda: later)
+    assert outbox.due() == [vencida.id, normal.id]
+    assert outbox.due(limit=1) == [vencida.id]
+
+
+def test_recover_parks_rows_left_sending_for_review(db_path: Path):
+    # Processo anterior: um envio confirmado e outro interrompido no meio
+    crashed = Outbox(db_path)
+    sent, _ = crashed.begin(PHONE, MESSAGE)
+    crashed.mark_sent(sent.id)
+    in_flight, _ = crashed.begin("5531900000002", MESSAGE)
+    crashed.close()
+
+    restarted = Outbox(db_path)
+    try:
+        assert restarted.recover() == 1
+        parked = restarted.get(in_flight.id)
+        assert parked is not None and parked.state == STATE_UNKNOWN and not parked.retry_scheduled
+        # Pode ter chegado ao chat: não é reenviado sozinho nem por um novo pedido
+        assert restarted.due() == []
+        assert restarted.begin("5531900000002", MESSAGE) == (parked, False)
+        assert [e.id for e in restarted.unknown()] == [in_flight.id]
+        assert restarted.get(sent.id).state == STATE_SENT
+        assert restarted.stats()["counts"][STATE_UNKNOWN] == 1
+        # Nada mais a recuperar
+        assert restarted.recover() == 0
+    finally:
+        restarted.close()
+
+
+def test_resolve_settles_only_unknown_rows(outbox: Outbox):
+    entregue, _ = outbox.begin(PHONE, MESSAGE)
+    perdido, _ = outbox.begin("5531900000002", MESSAGE)
+    assert outbox.resolve(entregue.id, delivered=True) is None
+    outbox.recover()
+
+    sent = outbox.resolve(entregue.id, delivered=True)
+    assert sent is not None and sent.state == STATE_SENT
+    requeued = outbox.resolve(perdido.id, delivered=False)
+    assert requeued is not None and requeued.state == STATE_QUEUED and requeued.retry_scheduled
+    assert outbox.due() == [perdido.id]
+    assert outbox.resolve(perdido.id, delivered=True) is None
+
+
+def test_mark_calls_return_the_updated_row(outbox: Outbox):
+    entry, _ = outbox.begin(PHONE, MESSAGE)
+    failed = outbox.mark_failed(entry.id, "timeout")
+    assert failed is not None and failed.state == STATE_FAILED and failed.retry_scheduled
+    outbox.claim(entry.id)
+    sent = outbox.mark_sent(entry.id)
+    assert sent is not None and sent.state == STATE_SENT and not sent.retry_scheduled
+    assert sent.to_dict()["attempts"] == 2 and "message" not in sent.to_dict()
+
+
+def test_dispatcher_reports_each_retry_outcome(outbox: Outbox, monkeypatch: pytest.MonkeyPatch):
+    sucesso, _ = outbox.begin(PHONE, MESSAGE)
+    falha, _ = outbox.begin("5531900000002", MESSAGE)
+    outbox.mark_failed(sucesso.id, "timeout")
+    outbox.mark_failed(falha.id, "timeout")
+    later = time.time() + 10 * outbox_module.BACKOFF_MAX_S
+    monkeypatch.setattr(outbox_module.time, "time", lambda: later)
+
+    async def send_entry(entry: OutboxEntry) -> bool:
+        if entry.id == falha.id:
+            raise RuntimeError("Worker encerrado")
+        return True
+
+    async def scenario() -> List[OutboxEntry]:
+        resultados: List[OutboxEntry] = []
+        dispatcher = OutboxDispatcher(outbox, send_entry, poll_interval=0.01)
+        dispatcher.add_listener(resultados.append)
+        await dispatcher.start()
+        try:
+            while len(resultados) < 2:
+                await asyncio.sleep(0.01)
+        finally:
+            await dispatcher.stop()
+        return resultados
+
+    resultados = {entry.id: entry for entry in asyncio.run(scenario())}
+    assert resultados[sucesso.id].state == STATE_SENT
+    assert resultados[falha.id].state == STATE_FAILED
+    assert resultados[falha.id].attempts == 2 and resultados[falha.id].last_error == "Worker encerrado"
@@ -0,0 +1,166 @@
+"""Token buckets, grant spacing and priorities of the WhatsApp rate scheduler."""
+
+import asyncio
+import time
+from typing import List, Tuple
+
+import pytest
+
+from app.services.rate_scheduler import (
+    PRIORITY_NORMAL,
+    PRIORITY_OVERDUE,
+    RateScheduler,
+    TokenBucket,
+)
+
+
+def make_scheduler(**overrides: float) -> RateScheduler:
+    """Scheduler without limits unless a test sets them."""
+    limits = {
+        "account_rate_per_min": 60000.0,
+        "account_burst": 1000.0,
+        "destination_rate_per_min": 60000.0,
+        "destination_burst": 1000.0,
+        "min_spacing_s": 0.0,
+        "spacing_jitter_s": 0.0,
+    }
+    limits.update(overrides)
+    return RateScheduler(**limits)
+
+
+async def granted_within(scheduler: RateScheduler, timeout: float, *destinations: str) -> int:
+    """How many of the acquires (one per destination) are granted before ``timeout``."""
+    tasks = [asyncio.create_task(scheduler.acquire(d)) for d in destinations]
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    return len(done)
+
+
+def test_bucket_starts_full_and_refills_at_its_rate():
+    bucket = TokenBucket(rate_per_s=2.0, capacity=3)
+    inicio = bucket.updated
+
+    for _ in range(3):
+        assert bucket.wait_time(inicio) == 0.0
+        bucket.consume(inicio)
+
+    assert bucket.wait_time(inicio) == pytest.approx(0.5)
+    assert bucket.wait_time(inicio + 0.25) == pytest.approx(0.25)
+    assert bucket.wait_time(inicio + 0.5) == 0.0
+    # Nunca acumula além da capacidade
+    assert bucket.available(inicio + 100) == 3
+    assert bucket.is_full(inicio + 100)
+
+
+def test_bucket_without_rate_never_refills():
+    bucket = TokenBucket(rate_per_s=0.0, capacity=1)
+    bucket.consume(bucket.updated)
+    assert bucket.wait_time(bucket.updated + 3600) == float("inf")
+
+
+def test_account_burst_limits_grants():
+    async def scenario() -> int:
+        scheduler = make_scheduler(account_rate_per_min=0.001, account_burst=2)
+        await scheduler.start()
+        try:
+            return await granted_within(scheduler, 0.2, "5531900000001", "5531900000002", "5531900000003")
+        finally:
+            await scheduler.stop()
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_destination_bucket_only_limits_its_own_phone():
+    async def scenario() -> Tuple[int, int]:
+        scheduler = make_scheduler(destination_rate_per_min=0.001, destination_burst=1)
+        await scheduler.start()
+        try:
+            repetido = await granted_within(scheduler, 0.2, "5531900000001", "5531900000001")
+            outro = await granted_within(scheduler, 0.2, "5531900000002")
+            return repetido, outro
+        finally:
+            await scheduler.stop()
+
+    assert asyncio.run(scenario()) == (1, 1)
+
+
+def test_grants_of_an_account_are_spaced():
+    async def scenario() -> List[float]:
+        scheduler = make_scheduler(min_spacing_s=0.1)
+        await scheduler.start()
+        try:
+            concedidos: List[float] = []
+
+            async def enviar(phone: str) -> None:
+                await scheduler.acquire(phone)
+                concedidos.append(time.monotonic())
+
+            await asyncio.gather(*(enviar(f"553190000000{i}") for i in range(3)))
+            return concedidos
+        finally:
+            await scheduler.stop()
+
+    concedidos = asyncio.run(scenario())
+    intervalos = [b - a for a, b in zip(concedidos, concedidos[1:])]
+    assert all(intervalo >= 0.09 for intervalo in intervalos)
+
+
+def test_spacing_is_per_account():
+    async def scenario() -> float:
+        scheduler = make_scheduler(min_spacing_s=10)
+        await scheduler.start()
+        try:
+            inicio = time.monotonic()
+            await asyncio.wait_for(
+                asyncio.gather(
+                    scheduler.acquire("5531900000001", account="a"),
+                    scheduler.acquire("5531900000002", account="b"),
+                ),
+                timeout=1,
+            )
+            return time.monotonic() - inicio
+        finally:
+            await scheduler.stop()
+
+    assert asyncio.run(scenario()) < 1
+
+
+def test_lower_priority_value_is_granted_first():
+    async def scenario() -> List[str]:
+        scheduler = make_scheduler(account_rate_per_min=600, account_burst=1)
+        await scheduler.start()
+        try:
+            ordem: List[str] = []
+
+            async def enviar(nome: str, priority: int) -> None:
+                await scheduler.acquire(f"phone-{nome}", priority=priority)
+                ordem.append(nome)
+
+            # Ambos entram na fila antes da primeira rodada do dispatcher
+            await asyncio.gather(enviar("normal", PRIORITY_NORMAL), enviar("vencida", PRIORITY_OVERDUE))
+            return ordem
+        finally:
+            await scheduler.stop()
+
+    assert asyncio.run(scenario()) == ["vencida", "normal"]
+
+
+def test_stop_fails_pending_waiters():
+    async def scenario() -> None:
+        scheduler = make_scheduler(account_rate_per_min=0.001, account_burst=1)
+        await scheduler.start()
+        await scheduler.acquire("5531900000001")
+        pendente = asyncio.create_task(scheduler.acquire("5531900000002"))
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+        with pytest.raises(RuntimeError, match="stopped"):
+            await pendente
+
+    asyncio.run(scenario())
+
+
+def test_acquire_requires_a_running_scheduler():
+    with pytest.raises(RuntimeError, match="not running"):
+        asyncio.run(make_scheduler().acquire("5531900000001"))
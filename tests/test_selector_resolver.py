@@ -0,0 +1,154 @@
+"""Selector learning of SelectorResolver against a WhatsApp-shaped DOM."""
+
+import asyncio
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from app.services.selector_resolver import (
+    DEFAULT_CANDIDATES,
+    ROLE_CHAT_READY,
+    ROLE_TEXT_BOX,
+    SelectorResolver,
+)
+
+_COMPOUND = re.compile(r"^(?P<tag>[a-z]+)?(?:#(?P<id>[\w-]+))?(?P<attrs>(?:\[[^\]]+\])*)$")
+_ATTR = re.compile(r"\[([\w-]+)='([^']*)'\]")
+
+
+@dataclass
+class FakeElement:
+    """A node of the fake DOM; only what the candidate selectors look at."""
+
+    tag: str
+    attrs: Dict[str, str] = field(default_factory=dict)
+    children: List["FakeElement"] = field(default_factory=list)
+    parent: Optional["FakeElement"] = None
+
+    def add(self, child: "FakeElement") -> "FakeElement":
+        child.parent = self
+        self.children.append(child)
+        return child
+
+    def walk(self) -> List["FakeElement"]:
+        nodes = [self]
+        for child in self.children:
+            nodes += child.walk()
+        return nodes
+
+    def inside(self, element_id: str) -> bool:
+        node: Optional[FakeElement] = self
+        while node is not None:
+            if node.attrs.get("id") == element_id:
+                return True
+            node = node.parent
+        return False
+
+    def matches(self, compound: str) -> bool:
+        parts = _COMPOUND.match(compound)
+        assert parts is not None, f"unsupported selector part: {compound}"
+        if parts["tag"] and parts["tag"] != self.tag:
+            return False
+        if parts["id"] and parts["id"] != self.attrs.get("id"):
+            return False
+        return all(self.attrs.get(k) == v for k, v in _ATTR.findall(parts["attrs"]))
+
+    async def is_visible(self) -> bool:
+        return True
+
+
+def select(root: FakeElement, selector: str) -> Optional[FakeElement]:
+    """First element, in document order, matching a descendant-combinator selector."""
+    *ancestors, target = selector.split()
+    for node in root.walk():
+        if not node.matches(target):
+            continue
+        pendentes = list(ancestors)
+        ancestral = node.parent
+        while pendentes and ancestral is not None:
+            if ancestral.matches(pendentes[-1]):
+                pendentes.pop()
+            ancestral = ancestral.parent
+        if not pendentes:
+            return node
+    return None
+
+
+class FakePage:
+    """wait_for_selector/query_selector over the fake DOM."""
+
+    def __init__(self, root: FakeElement) -> None:
+        self.root = root
+
+    async def query_selector(self, selector: str) -> Optional[FakeElement]:
+        return select(self.root, selector)
+
+    async def wait_for_selector(self, selector: str, timeout: float = 0, state: str = "visible") -> FakeElement:
+        del state
+        element = select(self.root, selector)
+        if element is None:
+            await asyncio.sleep(timeout / 1000)
+            raise asyncio.TimeoutError(selector)
+        return element
+
+
+def whatsapp_dom(chat_open: bool = True) -> FakeElement:
+    """#side (with the search textbox, first in the document) and, optionally, an open chat."""
+    body = FakeElement("body")
+    side = body.add(FakeElement("div", {"id": "side"}))
+    side.add(FakeElement("div", {"contenteditable": "true", "role": "textbox", "data-tab": "3"}))
+    if chat_open:
+        main = body.add(FakeElement("div", {"id": "main"}))
+        footer = main.add(FakeElement("footer"))
+        footer.add(FakeElement("div", {"contenteditable": "true", "role": "textbox", "data-tab": "10"}))
+    return body
+
+
+def test_candidates_are_scoped_to_the_chat_footer():
+    for role in (ROLE_TEXT_BOX, ROLE_CHAT_READY):
+        assert all(sel.startswith("#main footer ") for sel in DEFAULT_CANDIDATES[role])
+
+
+def test_never_resolves_to_the_search_box():
+    async def scenario() -> None:
+        resolver = SelectorResolver()
+        page = FakePage(whatsapp_dom())
+        # A primeira resolução disputa todos os candidatos; as seguintes usam o aprendido
+        for _ in range(3):
+            for role in (ROLE_TEXT_BOX, ROLE_CHAT_READY):
+                resolvido = await resolver.resolve(page, role, timeout_ms=100)
+                assert resolvido is not None
+                element, _ = resolvido
+                assert element.inside("main") and not element.inside("side")
+
+        assert resolver.stats()[ROLE_TEXT_BOX]["preferred"] == DEFAULT_CANDIDATES[ROLE_TEXT_BOX][0]
+
+    asyncio.run(scenario())
+
+
+def test_search_box_alone_does_not_count_as_an_open_chat():
+    async def scenario() -> None:
+        resolver = SelectorResolver()
+        page = FakePage(whatsapp_dom(chat_open=False))
+        assert await resolver.resolve(page, ROLE_CHAT_READY, timeout_ms=50) is None
+        assert await resolver.resolve(page, ROLE_TEXT_BOX, timeout_ms=50) is None
+
+    asyncio.run(scenario())
+
+
+def test_learned_selector_is_retried_after_the_chat_changes():
+    async def scenario() -> None:
+        resolver = SelectorResolver(fast_path_timeout_ms=20)
+        root = whatsapp_dom()
+        page = FakePage(root)
+        await resolver.resolve(page, ROLE_TEXT_BOX, timeout_ms=100)
+
+        # Um layout sem role no composer: o aprendido falha e outro candidato do rodapé vence
+        composer = select(root, "#main footer div[contenteditable='true']")
+        assert composer is not None
+        del composer.attrs["role"]
+        element, selector = await resolver.resolve(page, ROLE_TEXT_BOX, timeout_ms=100)
+        assert element is composer and selector == DEFAULT_CANDIDATES[ROLE_TEXT_BOX][1]
+        assert resolver.stats()[ROLE_TEXT_BOX]["selectors"][DEFAULT_CANDIDATES[ROLE_TEXT_BOX][0]]["misses"] == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,118 @@
+"""/send-whatsapp enqueues a job whose progress streams as Server-Sent Events."""
+
+import json
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from app.services.batch_sender import BatchSendManager
+from app.services.outbox import Outbox, OutboxEntry
+from app.services.progress import (
+    STEP_CHAT_OPEN,
+    STEP_CONFIRMED,
+    STEP_JOB_COMPLETED,
+    STEP_QUEUED,
+    STEP_SCHEDULED,
+    ProgressCallback,
+    ProgressHub,
+)
+from app.services.rate_scheduler import PRIORITY_INTERACTIVE
+
+PHONE = "5531900000001"
+MESSAGE = "Relatório de consumo de gás - 03/2026"
+
+
+@pytest.fixture
+def priorities() -> List[int]:
+    """Priority of every send the fake engine received."""
+    return []
+
+
+@pytest.fixture
+def client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, priorities: List[int]) -> Iterator[TestClient]:
+    store = Outbox(tmp_path / "outbox.sqlite3")
+
+    async def send(
+        phone: str, message: str, priority: int, progress: Optional[ProgressCallback] = None
+    ) -> OutboxEntry:
+        priorities.append(priority)
+        entry, _ = store.begin(phone, message, priority)
+        assert progress is not None
+        progress(STEP_SCHEDULED, {"account": "default"})
+        progress(STEP_CHAT_OPEN, {"elapsed_ms": 12.0})
+        sent = store.mark_sent(entry.id)
+        assert sent is not None
+        return sent
+
+    hub = ProgressHub()
+    manager = BatchSendManager(workers=1, send=send, progress=hub)
+    monkeypatch.setattr(routes, "batch_manager", manager)
+    monkeypatch.setattr(routes, "progress_hub", hub)
+
+    @asynccontextmanager
+    async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+        await manager.start()
+        yield
+        await manager.stop()
+
+    app = FastAPI(lifespan=lifespan)
+    app.include_router(routes.router, prefix="/api/v1")
+    with TestClient(app) as test_client:
+        yield test_client
+    store.close()
+
+
+def read_events(client: TestClient, url: str, last_event_id: Optional[str] = None) -> List[Tuple[int, str, dict]]:
+    """(id, event, data) of every SSE event until the stream closes."""
+    headers = {"Last-Event-ID": last_event_id} if last_event_id else {}
+    eventos: List[Tuple[int, str, dict]] = []
+    with client.stream("GET", url, headers=headers) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        for bloco in response.read().decode("utf-8").split("\n\n"):
+            campos = dict(line.split(": ", 1) for line in bloco.splitlines() if not line.startswith(":"))
+            if campos:
+                eventos.append((int(campos["id"]), campos["event"], json.loads(campos["data"])))
+    return eventos
+
+
+def test_send_returns_202_with_the_job_to_follow(client: TestClient, priorities: List[int]):
+    response = client.post("/api/v1/send-whatsapp", json={"phone_number": PHONE, "message": MESSAGE})
+    assert response.status_code == 202
+    body = response.json()
+    assert body["total"] == 1
+    assert body["status_url"] == f"/api/v1/send-whatsapp/batch/{body['job_id']}"
+    assert body["events_url"] == body["status_url"] + "/events"
+
+    eventos = read_events(client, body["events_url"])
+    assert [step for _, step, _ in eventos] == [
+        STEP_QUEUED,
+        STEP_SCHEDULED,
+        STEP_CHAT_OPEN,
+        STEP_CONFIRMED,
+        STEP_JOB_COMPLETED,
+    ]
+    assert [seq for seq, _, _ in eventos] == [1, 2, 3, 4, 5]
+    assert all(data["detail"]["phone_number"] == PHONE for _, _, data in eventos[:-1])
+    assert eventos[-1][2]["detail"]["sent"] == 1
+
+    snapshot = client.get(body["status_url"]).json()
+    assert snapshot["status"] == "completed" and snapshot["recipients"][0]["status"] == "sent"
+    # Envio avulso passa à frente dos lotes
+    assert priorities == [PRIORITY_INTERACTIVE]
+
+
+def test_events_resume_after_last_event_id(client: TestClient):
+    body = client.post("/api/v1/send-whatsapp", json={"phone_number": PHONE, "message": MESSAGE}).json()
+    todos = read_events(client, body["events_url"])
+    retomados = read_events(client, body["events_url"], last_event_id="3")
+    assert retomados == todos[3:]
+
+
+def test_unknown_job_has_no_stream(client: TestClient):
+    assert client.get("/api/v1/send-whatsapp/batch/nao-existe/events").status_code == 404
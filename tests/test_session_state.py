@@ -0,0 +1,87 @@
+"""Changed-only, rate-limited and atomic writes of the WhatsApp session file."""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from app.services import session_state as session_module
+from app.services.session_state import SessionStateManager
+
+STATE: Dict[str, Any] = {
+    "cookies": [{"name": "wa_lang", "value": "pt-BR", "domain": ".web.whatsapp.com"}],
+    "origins": [{"origin": "https://web.whatsapp.com", "localStorage": [{"name": "WABrowserId", "value": "abc"}]}],
+}
+
+
+def with_token(value: str) -> Dict[str, Any]:
+    return {**STATE, "origins": [{"origin": "https://web.whatsapp.com", "localStorage": [{"name": "token", "value": value}]}]}
+
+
+@pytest.fixture
+def path(tmp_path: Path) -> Path:
+    caminho = tmp_path / "sessions" / "default.json"
+    caminho.parent.mkdir()
+    caminho.write_text(json.dumps(STATE), encoding="utf-8")
+    return caminho
+
+
+def test_unchanged_state_is_not_written(path: Path):
+    manager = SessionStateManager(path, flush_interval=0)
+    mtime = path.stat().st_mtime_ns
+    assert manager.load() == STATE
+
+    # Mesmo conteúdo em outra ordem de chaves: nada a gravar
+    reordenado = {"origins": STATE["origins"], "cookies": STATE["cookies"]}
+    assert manager.update(reordenado) is False
+    assert manager.update(reordenado, force=True) is False
+    assert path.stat().st_mtime_ns == mtime
+    assert manager.stats()["writes"] == 0 and manager.stats()["skipped_unchanged"] == 2
+
+
+def test_changes_are_rate_limited_until_flushed(path: Path):
+    manager = SessionStateManager(path, flush_interval=3600)
+    manager.load()
+    manager._last_flush = session_module.time.monotonic()
+
+    assert manager.update(with_token("1")) is False
+    assert manager.stats()["dirty"] and json.loads(path.read_text(encoding="utf-8")) == STATE
+    assert manager.flush_if_due() is False
+
+    assert manager.flush() is True
+    assert json.loads(path.read_text(encoding="utf-8")) == with_token("1")
+    assert not manager.stats()["dirty"] and manager.flush() is False
+
+    # force ignora o intervalo
+    assert manager.update(with_token("2"), force=True) is True
+    assert manager.stats()["writes"] == 2
+
+
+def test_failed_write_keeps_the_old_file_and_no_temp_files(path: Path, monkeypatch: pytest.MonkeyPatch):
+    manager = SessionStateManager(path, flush_interval=0)
+    manager.load()
+
+    def crash(src: str, dst: str) -> None:
+        raise OSError("disco cheio")
+
+    monkeypatch.setattr(session_module.os, "replace", crash)
+    with pytest.raises(OSError, match="disco cheio"):
+        manager.update(with_token("novo"))
+
+    assert json.loads(path.read_text(encoding="utf-8")) == STATE
+    assert os.listdir(path.parent) == [path.name]
+    # A alteração continua pendente para a próxima gravação
+    monkeypatch.undo()
+    assert manager.stats()["dirty"] and manager.flush() is True
+    assert json.loads(path.read_text(encoding="utf-8")) == with_token("novo")
+    assert os.listdir(path.parent) == [path.name]
+
+
+def test_unreadable_file_counts_as_missing(tmp_path: Path):
+    corrompido = tmp_path / "default.json"
+    corrompido.write_text('{"cookies": [', encoding="utf-8")
+    manager = SessionStateManager(corrompido)
+    assert manager.exists() and manager.load() is None
+    assert SessionStateManager(tmp_path / "nenhum.json").load() is None
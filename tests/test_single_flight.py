@@ -0,0 +1,104 @@
+"""Coalescing and error propagation of SingleFlight."""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from app.services.single_flight import SingleFlight, payload_key
+
+
+def test_concurrent_calls_share_one_computation():
+    async def scenario() -> None:
+        flight = SingleFlight("test")
+        liberar = asyncio.Event()
+        chamadas = 0
+
+        async def compute() -> List[int]:
+            nonlocal chamadas
+            chamadas += 1
+            await liberar.wait()
+            return [1, 2, 3]
+
+        tasks = [asyncio.create_task(flight.run("k", compute)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert flight.stats() == {"calls": 5, "coalesced": 4, "in_flight": 1}
+
+        liberar.set()
+        results = await asyncio.gather(*tasks)
+        assert chamadas == 1
+        assert all(result is results[0] for result in results)
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_different_keys_and_finished_runs_are_not_shared():
+    async def scenario() -> None:
+        flight = SingleFlight("test")
+        chamadas: List[str] = []
+
+        async def compute(key: str) -> str:
+            chamadas.append(key)
+            await asyncio.sleep(0.01)
+            return key
+
+        assert await asyncio.gather(
+            flight.run("a", lambda: compute("a")), flight.run("b", lambda: compute("b"))
+        ) == ["a", "b"]
+        # Nada fica em cache depois que a execução termina
+        assert await flight.run("a", lambda: compute("a")) == "a"
+        assert chamadas == ["a", "b", "a"]
+
+    asyncio.run(scenario())
+
+
+def test_error_reaches_every_waiter_and_frees_the_key():
+    async def scenario() -> None:
+        flight = SingleFlight("test")
+        chamadas = 0
+
+        async def compute() -> str:
+            nonlocal chamadas
+            chamadas += 1
+            await asyncio.sleep(0.01)
+            raise ValueError("planilha inválida")
+
+        results = await asyncio.gather(
+            *(flight.run("k", compute) for _ in range(3)), return_exceptions=True
+        )
+        assert chamadas == 1
+        assert all(isinstance(r, ValueError) and str(r) == "planilha inválida" for r in results)
+
+        # A chave é liberada: a próxima chamada computa de novo
+        with pytest.raises(ValueError):
+            await flight.run("k", compute)
+        assert chamadas == 2
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    async def scenario() -> None:
+        flight = SingleFlight("test")
+        liberar = asyncio.Event()
+
+        async def compute() -> str:
+            await liberar.wait()
+            return "ok"
+
+        desistente = asyncio.create_task(flight.run("k", compute))
+        paciente = asyncio.create_task(flight.run("k", compute))
+        await asyncio.sleep(0)
+        desistente.cancel()
+        await asyncio.gather(desistente, return_exceptions=True)
+
+        liberar.set()
+        assert await paciente == "ok"
+
+    asyncio.run(scenario())
+
+
+def test_payload_key_ignores_dict_order():
+    assert payload_key({"a": 1, "b": [1, 2]}, "03/2026") == payload_key({"b": [1, 2], "a": 1}, "03/2026")
+    assert payload_key({"a": 1}, "03/2026") != payload_key({"a": 1}, "04/2026")
@@ -0,0 +1,73 @@
+"""Spans, percentiles and the off-loop JSON export of automation timelines."""
+
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+from app.services import timeline as timeline_module
+from app.services.timeline import TimelineRecorder, span
+
+
+def test_spans_feed_percentiles_and_recent_timelines():
+    recorder = TimelineRecorder(export_dir="")
+    for _ in range(3):
+        with recorder.timeline("send", phone="5531900000001"):
+            with span("navigation"):
+                with span("chat_ready", selector="#main footer"):
+                    pass
+    # Fora de uma timeline os spans não registram nada
+    with span("orphan"):
+        pass
+
+    ultima = recorder.recent(1)[0]
+    assert {s["name"]: s["depth"] for s in ultima["spans"]} == {"navigation": 0, "chat_ready": 1}
+    percentis = recorder.percentiles()
+    assert set(percentis) == {"navigation", "chat_ready", "total:send"}
+    assert percentis["navigation"]["count"] == 3
+
+
+def test_export_is_written_by_the_writer_thread(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    recorder = TimelineRecorder(export_dir=str(tmp_path / "timelines"))
+    threads = []
+    write_text = Path.write_text
+
+    def gravar(self: Path, *args, **kwargs):
+        threads.append(threading.current_thread().name)
+        return write_text(self, *args, **kwargs)
+
+    monkeypatch.setattr(timeline_module.Path, "write_text", gravar)
+    with recorder.timeline("send", phone="5531900000001"):
+        with span("dialogue"):
+            pass
+
+    assert recorder.flush(timeout=5)
+    arquivos = list((tmp_path / "timelines").glob("*_send.json"))
+    assert len(arquivos) == 1
+    assert json.loads(arquivos[0].read_text(encoding="utf-8"))["spans"][0]["name"] == "dialogue"
+    assert threads == ["whatsapp-timeline-writer"]
+
+
+def test_export_never_blocks_when_the_writer_falls_behind(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    recorder = TimelineRecorder(export_dir=str(tmp_path), export_queue_size=1)
+    liberar = threading.Event()
+    write_text = Path.write_text
+
+    def disco_lento(self: Path, *args, **kwargs):
+        liberar.wait(5)
+        return write_text(self, *args, **kwargs)
+
+    monkeypatch.setattr(timeline_module.Path, "write_text", disco_lento)
+    for i in range(5):
+        recorder.record({"label": f"send{i}", "started_at": 1.0 + i, "duration_ms": 1.0, "spans": []})
+
+    # Um em escrita, um na fila, o resto descartado sem esperar
+    assert recorder.dropped_exports >= 3
+    liberar.set()
+    assert recorder.flush(timeout=5)
+    assert len(list(tmp_path.glob("*.json"))) == 5 - recorder.dropped_exports
+
+
+def test_flush_without_exports_returns_at_once():
+    assert TimelineRecorder(export_dir="").flush(timeout=0.01)
@@ -0,0 +1,80 @@
+"""Watchdog of the worker supervisor: hung workers and stuck sends."""
+
+import asyncio
+import time
+from typing import List, Optional
+
+import pytest
+
+from app.services.whatsapp_service import WorkerSupervisor, _Slot, _Task
+
+
+class FakeProcess:
+    """Worker process stand-in that records kill()."""
+
+    pid = 4242
+    exitcode: Optional[int] = None
+
+    def __init__(self) -> None:
+        self.killed = False
+
+    def is_alive(self) -> bool:
+        return not self.killed
+
+    def kill(self) -> None:
+        self.killed = True
+
+    def join(self, timeout: float) -> None:
+        del timeout
+
+
+def supervise(started_ago: Optional[float], heartbeat_ago: float = 0.0):
+    """Check one slot whose only task started ``started_ago`` seconds ago (None: not started)."""
+
+    async def scenario():
+        supervisor = WorkerSupervisor(hang_timeout=90, send_timeout=300)
+        respawns: List[str] = []
+        supervisor._spawn = lambda slot, fresh_queue: respawns.append(slot.slot_id)  # type: ignore[method-assign]
+
+        process = FakeProcess()
+        slot = _Slot(slot_id="default", session_path="sessions/default.json", process=process)
+        slot.last_heartbeat = time.monotonic() - heartbeat_ago
+        future = asyncio.get_running_loop().create_future()
+        task = _Task(phone="5531900000001", message="oi", future=future)
+        if started_ago is not None:
+            task.started = True
+            task.started_at = time.monotonic() - started_ago
+        slot.tasks[1] = task
+        supervisor._slots[slot.slot_id] = slot
+
+        await supervisor._check_slot(slot)
+        return supervisor, slot, process, future, respawns
+
+    return asyncio.run(scenario())
+
+
+def test_stuck_send_restarts_a_worker_that_still_heartbeats():
+    supervisor, slot, process, future, respawns = supervise(started_ago=301)
+    assert process.killed and respawns == ["default"] and slot.restarts == 1
+    with pytest.raises(RuntimeError, match="prazo"):
+        future.result()
+    assert supervisor.stats()["default"]["oldest_send_age_s"] is None
+
+
+def test_send_within_its_deadline_is_left_alone():
+    supervisor, slot, process, future, respawns = supervise(started_ago=30)
+    assert not process.killed and respawns == [] and not future.done()
+    assert supervisor.stats()["default"]["oldest_send_age_s"] == pytest.approx(30, abs=1)
+    assert slot.restarts == 0
+
+
+def test_queued_task_has_no_deadline_yet():
+    _, _, process, future, _ = supervise(started_ago=None)
+    assert not process.killed and not future.done()
+
+
+def test_missing_heartbeat_still_restarts():
+    _, slot, process, future, _ = supervise(started_ago=None, heartbeat_ago=91)
+    assert process.killed and slot.restarts == 1
+    # Tarefas ainda não iniciadas sobrevivem ao reinício
+    assert not future.done()